@@ -31,15 +31,89 @@ class Config:
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
     
     # LLM Configuration
-    LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq")
+    LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").lower()  # groq | openai | ollama | stub
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama2")
+    OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1")
+    OPENAI_COMPAT_BASE_URL = os.getenv("OPENAI_COMPAT_BASE_URL", "http://localhost:8000/v1")
+    OPENAI_COMPAT_API_KEY = os.getenv("OPENAI_COMPAT_API_KEY")
+    OPENAI_COMPAT_MODEL = os.getenv("OPENAI_COMPAT_MODEL", "default")
+    STUB_LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0"))  # seconds before the first token
+    STUB_LLM_TOKEN_DELAY = float(os.getenv("STUB_LLM_TOKEN_DELAY", "0"))  # seconds between tokens
+    STUB_LLM_ANSWER_WORDS = int(os.getenv("STUB_LLM_ANSWER_WORDS", "48"))
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")
     GROQ_MODEL = os.getenv("GROQ_MODEL", "llama2-70b-4096")
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2048"))  # Estimated LLM tokens; 0 = send every retrieved chunk
+    CONTEXT_MIN_CHUNK_TOKENS = int(os.getenv("CONTEXT_MIN_CHUNK_TOKENS", "64"))
+    LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "30"))  # per attempt
+    LLM_TOTAL_TIMEOUT = float(os.getenv("LLM_TOTAL_TIMEOUT", "90"))  # across retries
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+    LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))  # 0 = observed p95 latency
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    # Unset = the backend's default (30 for groq, unlimited for self-hosted servers); 0 = unlimited
+    LLM_RPM_LIMIT = float(os.getenv("LLM_RPM_LIMIT")) if os.getenv("LLM_RPM_LIMIT") else None
+    LLM_TPM_LIMIT = float(os.getenv("LLM_TPM_LIMIT", "0"))  # 0 = unlimited
+    LLM_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "512"))
+    LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "60"))
     
     # Document Processing
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+    CHUNKING_MODE = os.getenv("CHUNKING_MODE", "characters").lower()  # characters | tokens | semantic
+    TOKEN_CHUNK_SIZE = int(os.getenv("TOKEN_CHUNK_SIZE", "0"))  # 0 = embedding model window
+    TOKEN_CHUNK_OVERLAP = int(os.getenv("TOKEN_CHUNK_OVERLAP", "32"))
+    SEMANTIC_BREAKPOINT_PERCENTILE = float(os.getenv("SEMANTIC_BREAKPOINT_PERCENTILE", "95"))
+    SEMANTIC_REUSE_VECTORS = os.getenv("SEMANTIC_REUSE_VECTORS", "false").lower() == "true"  # Approximate chunk vectors
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))  # Background ingestion threads
+    INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "100"))
+    DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "false").lower() == "true"  # Dedups across documents too
+    DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "3"))  # SimHash Hamming distance
+    DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "4"))  # words per shingle
+    PDF_PARALLEL_WORKERS = int(os.getenv("PDF_PARALLEL_WORKERS", "1"))
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "200"))
+    PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "32"))
+    
+    # Async pipeline: threads for CPU-bound chunking/embedding
+    ASYNC_EMBED_WORKERS = int(os.getenv("ASYNC_EMBED_WORKERS", "2"))
     
     # Search Configuration
     MAX_RETRIEVED_DOCS = int(os.getenv("MAX_RETRIEVED_DOCS", "5"))
-    SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.7"))
\ No newline at end of file
+    SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.7"))
+    
+    # Answer Cache
+    ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory").lower()  # memory | sqlite | none
+    ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+    ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "./data/answer_cache.db")
+    # Opt-in: paraphrases differing only in an entity or number ("2022" vs "2023") can match
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+    QUERY_COALESCING_ENABLED = os.getenv("QUERY_COALESCING_ENABLED", "true").lower() == "true"
+    DEFERRED_GENERATION_WORKERS = int(os.getenv("DEFERRED_GENERATION_WORKERS", "4"))
+    STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))  # 0 disables
+    
+    # Admission control: concurrent queries per stage (0 = unlimited) and their wait queues
+    EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+    SEARCH_MAX_CONCURRENCY = int(os.getenv("SEARCH_MAX_CONCURRENCY", "16"))
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))  # Waiters per stage before rejecting
+    ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "10"))
+    
+    # Web UI (streamlit_app.py)
+    ADMIN_MODE = os.getenv("ADMIN_MODE", "false").lower() == "true"  # Shows the shared-pipeline "Reinitialize" button
+    
+    # HTTP API (src/api.py)
+    API_HOST = os.getenv("API_HOST", "0.0.0.0")
+    API_PORT = int(os.getenv("API_PORT", "8000"))
+    API_WORKERS = int(os.getenv("API_WORKERS", "1"))  # Processes; each loads its own model
+    API_MAX_BATCH = int(os.getenv("API_MAX_BATCH", "32"))
+    
+    # OpenTelemetry traces and metrics (off by default; nothing is imported while disabled)
+    OTEL_ENABLED = os.getenv("OTEL_ENABLED", "false").lower() == "true"
+    OTEL_EXPORTER = os.getenv("OTEL_EXPORTER", "console")  # "console" or "otlp"
+    OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
+    OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "rag-system")
\ No newline at end of file
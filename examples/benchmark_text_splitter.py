@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark the native TextSplitter against LangChain's RecursiveCharacterTextSplitter
+"""
+
+import argparse
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from src.document_processor import DocumentProcessor
+from src.text_splitter import TextSplitter
+from config import Config
+
+
+def load_corpus(directory_path):
+    """Load every page of every supported document in a directory"""
+    processor = DocumentProcessor()
+    texts = []
+    for file_path in processor.iter_directory_files(directory_path):
+        texts.extend(page.page_content for page in processor.iter_pages(file_path))
+    return texts
+
+
+def run(name, split, texts, repeats):
+    """Time a split function over the corpus and return its chunks"""
+    chunks = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        chunks = [chunk for text in texts for chunk in split(text)]
+    elapsed = time.perf_counter() - start
+    rate = len(chunks) * repeats / elapsed if elapsed else float("inf")
+    print(f"{name:<12} {len(chunks):>8} chunks  {elapsed:8.3f}s  {rate:12,.0f} chunks/sec")
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text splitter benchmark")
+    parser.add_argument("corpus", nargs="?", default="data/documents", help="Directory of documents to split")
+    parser.add_argument("--repeats", type=int, default=5, help="Passes over the corpus per splitter")
+    args = parser.parse_args()
+    
+    texts = load_corpus(args.corpus)
+    print(f"=== Splitting {len(texts)} pages ({sum(map(len, texts)):,} chars), "
+          f"chunk_size={Config.CHUNK_SIZE}, overlap={Config.CHUNK_OVERLAP} ===")
+    
+    langchain_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=Config.CHUNK_SIZE,
+        chunk_overlap=Config.CHUNK_OVERLAP,
+        length_function=len,
+    )
+    native_splitter = TextSplitter()
+    
+    expected = run("langchain", langchain_splitter.split_text, texts, args.repeats)
+    actual = run("native", native_splitter.split_text, texts, args.repeats)
+    run("spans", native_splitter.split_spans, texts, args.repeats)
+    
+    if actual == expected:
+        print("✅ Native output is identical to LangChain")
+    else:
+        mismatch = next(i for i, (a, b) in enumerate(zip(actual, expected)) if a != b) if len(actual) == len(expected) else None
+        print(f"❌ Output differs (native={len(actual)}, langchain={len(expected)}, first mismatch={mismatch})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
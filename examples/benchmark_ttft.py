@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Measure time-to-first-token of streamed answers against blocking query latency
+"""
+
+import argparse
+import statistics
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.rag_pipeline import RAGPipeline
+
+
+DEFAULT_QUESTIONS = [
+    "What is this document about?",
+    "Summarize the main points.",
+    "What are the key requirements?",
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def report(name, values):
+    print(f"{name:<28} mean {statistics.mean(values):6.2f}s  "
+          f"p50 {percentile(values, 50):6.2f}s  p95 {percentile(values, 95):6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-first-token benchmark")
+    parser.add_argument("questions", nargs="*", default=DEFAULT_QUESTIONS, help="Questions to ask")
+    parser.add_argument("--repeats", type=int, default=3, help="Times each question is asked per mode")
+    args = parser.parse_args()
+    
+    rag = RAGPipeline()
+    blocking, first_token, streamed_total = [], [], []
+    
+    for _ in range(args.repeats):
+        for question in args.questions:
+            start = time.perf_counter()
+            rag.query(question)
+            blocking.append(time.perf_counter() - start)
+            
+            for event in rag.query_stream(question):
+                if event["type"] == "done":
+                    first_token.append(event["time_to_first_token"] or event["total_time"])
+                    streamed_total.append(event["total_time"])
+    
+    print(f"=== {len(blocking)} queries per mode ===")
+    report("query() full answer", blocking)
+    report("query_stream() first token", first_token)
+    report("query_stream() full answer", streamed_total)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
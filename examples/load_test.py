@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Load-test the query pipeline, by default against the offline stub LLM
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+DEFAULT_QUESTIONS = [
+    "What is this document about?",
+    "Summarize the main points.",
+    "What are the key requirements?",
+    "Who is the intended audience?",
+    "What are the main risks mentioned?",
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def report(latencies, elapsed, errors):
+    print(f"=== {len(latencies)} queries in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} queries/sec), {errors} errors ===")
+    if latencies:
+        print(f"latency  mean {statistics.mean(latencies):6.3f}s  p50 {percentile(latencies, 50):6.3f}s  "
+              f"p95 {percentile(latencies, 95):6.3f}s  p99 {percentile(latencies, 99):6.3f}s")
+
+
+def run_threads(rag, questions, concurrency):
+    def timed(question):
+        start = time.perf_counter()
+        rag.query(question)
+        return time.perf_counter() - start
+    
+    latencies, errors = [], 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(timed, question) for question in questions]:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                errors += 1
+                print(f"Error: {e}")
+    return latencies, errors
+
+
+async def run_async(rag, questions, concurrency):
+    from src.async_rag_pipeline import AsyncRAGPipeline
+    
+    async_rag = AsyncRAGPipeline(rag)
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def timed(question):
+        async with semaphore:
+            start = time.perf_counter()
+            await async_rag.aquery(question)
+            return time.perf_counter() - start
+    
+    results = await asyncio.gather(*(timed(question) for question in questions), return_exceptions=True)
+    await async_rag.aclose()
+    errors = [result for result in results if isinstance(result, Exception)]
+    for error in errors:
+        print(f"Error: {error}")
+    return [result for result in results if not isinstance(result, Exception)], len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query pipeline load test")
+    parser.add_argument("questions", nargs="*", default=DEFAULT_QUESTIONS, help="Questions to ask, round robin")
+    parser.add_argument("--requests", type=int, default=200, help="Total number of queries")
+    parser.add_argument("--concurrency", type=int, default=16, help="Queries in flight at once")
+    parser.add_argument("--provider", default="stub", help="LLM provider (default: offline stub)")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub LLM seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Stub LLM seconds between tokens")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Use AsyncRAGPipeline instead of threads")
+    parser.add_argument("--cache", action="store_true", help="Keep the answer caches and query coalescing enabled")
+    args = parser.parse_args()
+    
+    # Configuration is read at import time, so the environment is set up first
+    os.environ["LLM_PROVIDER"] = args.provider
+    os.environ["STUB_LLM_LATENCY"] = str(args.latency)
+    os.environ["STUB_LLM_TOKEN_DELAY"] = str(args.token_delay)
+    if not args.cache:
+        os.environ["ANSWER_CACHE_BACKEND"] = "none"
+        os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+        os.environ["QUERY_COALESCING_ENABLED"] = "false"
+    from src.rag_pipeline import RAGPipeline
+    
+    rag = RAGPipeline()
+    questions = [args.questions[i % len(args.questions)] for i in range(args.requests)]
+    print(f"{args.requests} queries, concurrency {args.concurrency}, provider {args.provider}, "
+          f"{'async' if args.use_async else 'threads'}")
+    
+    start = time.perf_counter()
+    if args.use_async:
+        latencies, errors = asyncio.run(run_async(rag, questions, args.concurrency))
+    else:
+        latencies, errors = run_threads(rag, questions, args.concurrency)
+    report(latencies, time.perf_counter() - start, errors)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,166 @@
+from typing import Dict, Any, Optional, Iterator, AsyncIterator
+from contextlib import contextmanager, asynccontextmanager
+import asyncio
+import threading
+import time
+from config import Config
+
+
+class OverloadedError(Exception):
+    """A pipeline stage is at capacity and its wait queue is full (or the wait timed out)"""
+    
+    def __init__(self, stage: str, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class StageLimiter:
+    """Caps concurrent work in one pipeline stage, with a bounded wait queue.
+    
+    At most max_concurrent callers run at once and at most max_queue wait
+    for a slot; a caller arriving at a full queue is rejected at once, and
+    a waiter gives up after max_wait seconds. max_concurrent 0 means
+    unlimited.
+    """
+    
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0, "wait_seconds": 0.0}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+    
+    def _reject(self, reason: str):
+        self._stats["rejected" if reason == "full" else "timed_out"] += 1
+        detail = "wait queue is full" if reason == "full" else f"no slot within {self.max_wait:g}s"
+        raise OverloadedError(self.name, f"{self.name} stage is overloaded: {detail}", retry_after=max(1.0, self.max_wait))
+    
+    def _try_enter(self) -> bool:
+        if self._active < self.max_concurrent:
+            self._active += 1
+            self._stats["admitted"] += 1
+            return True
+        return False
+    
+    def _enqueue(self):
+        if self._waiting >= self.max_queue:
+            self._reject("full")
+        self._waiting += 1
+        self._stats["queued"] += 1
+    
+    def _leave(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+    
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one slot of the stage for the duration of the block"""
+        if not self.enabled:
+            # Unlimited, but still counted so the stage's activity is visible
+            with self._condition:
+                self._active += 1
+            try:
+                yield
+            finally:
+                self._leave()
+            return
+        started = time.monotonic()
+        with self._condition:
+            if not self._try_enter():
+                self._enqueue()
+                try:
+                    while not self._try_enter():
+                        remaining = self.max_wait - (time.monotonic() - started)
+                        if remaining <= 0:
+                            self._reject("timeout")
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                self._stats["wait_seconds"] += time.monotonic() - started
+        try:
+            yield
+        finally:
+            self._leave()
+    
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        """Async variant of slot; polls instead of blocking the event loop"""
+        if not self.enabled:
+            with self._condition:
+                self._active += 1
+            try:
+                yield
+            finally:
+                self._leave()
+            return
+        started = time.monotonic()
+        with self._condition:
+            entered = self._try_enter()
+            if not entered:
+                self._enqueue()
+        if not entered:
+            try:
+                while True:
+                    with self._condition:
+                        if self._try_enter():
+                            self._stats["wait_seconds"] += time.monotonic() - started
+                            break
+                        if time.monotonic() - started >= self.max_wait:
+                            self._reject("timeout")
+                    await asyncio.sleep(0.01)
+            finally:
+                with self._condition:
+                    self._waiting -= 1
+        try:
+            yield
+        finally:
+            self._leave()
+    
+    def check(self):
+        """Raise OverloadedError if a caller arriving now would be rejected (takes no slot)"""
+        with self._condition:
+            if self.enabled and self._active >= self.max_concurrent and self._waiting >= self.max_queue:
+                self._reject("full")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Slots in use, queue depth and admission counters"""
+        with self._condition:
+            return {
+                **self._stats,
+                "active": self._active,
+                "waiting": self._waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue
+            }
+
+
+class AdmissionController:
+    """Per-stage limiters (embed, search, llm) for the query path"""
+    
+    def __init__(self, limits: Optional[Dict[str, int]] = None, max_queue: Optional[int] = None, max_wait: Optional[float] = None):
+        limits = limits or {
+            "embed": Config.EMBED_MAX_CONCURRENCY,
+            "search": Config.SEARCH_MAX_CONCURRENCY,
+            "llm": Config.LLM_MAX_CONCURRENCY
+        }
+        max_queue = Config.ADMISSION_MAX_QUEUE if max_queue is None else max_queue
+        max_wait = Config.ADMISSION_MAX_WAIT if max_wait is None else max_wait
+        self.stages = {name: StageLimiter(name, limit, max_queue, max_wait) for name, limit in limits.items()}
+    
+    def slot(self, stage: str):
+        return self.stages[stage].slot()
+    
+    def aslot(self, stage: str):
+        return self.stages[stage].aslot()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {name: limiter.get_stats() for name, limiter in self.stages.items()}
\ No newline at end of file
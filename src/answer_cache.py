@@ -0,0 +1,356 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import deque
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from cachetools import TTLCache
+from config import Config
+
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question"""
+    return " ".join(question.lower().split())
+
+
+def make_cache_key(
+    question: str,
+    max_results: int,
+    chunk_ids: List[str],
+    model: str,
+    prompt_version: str,
+    generation: int,
+) -> str:
+    """Key an answer by everything that can change it"""
+    payload = json.dumps(
+        [normalize_question(question), max_results, list(chunk_ids), model, prompt_version, generation],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """Open a SQLite database that several processes read and write"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+class SharedGeneration:
+    """Collection generation counter kept in SQLite, so every process on the host sees it.
+    
+    A process that changes the collection bumps it; every process reads it
+    on each cache lookup, so an ingest or reset in one process invalidates
+    the answers cached by all of them. Processes on other hosts only see
+    their own changes and rely on ANSWER_CACHE_TTL.
+    """
+    
+    def __init__(self, name: str, path: Optional[str] = None):
+        self.name = name
+        self.path = path or Config.ANSWER_CACHE_PATH
+        self._lock = threading.Lock()
+        self._connection = _connect(self.path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS generations (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._connection.execute("INSERT OR IGNORE INTO generations (name, value) VALUES (?, 0)", (name,))
+    
+    def get(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT value FROM generations WHERE name = ?", (self.name,)).fetchone()[0]
+    
+    def bump(self):
+        """Mark the collection as changed for every process"""
+        with self._lock:
+            self._connection.execute("UPDATE generations SET value = value + 1 WHERE name = ?", (self.name,))
+    
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class AnswerCache:
+    """Interface of the exact-match answer caches"""
+    
+    def __init__(self):
+        self._hits = 0
+        self._misses = 0
+    
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+    
+    def set(self, key: str, answer: str, generation: int):
+        raise NotImplementedError
+    
+    def discard_before(self, generation: int):
+        """Drop answers whose sources were retrieved before generation"""
+        raise NotImplementedError
+    
+    def clear(self):
+        raise NotImplementedError
+    
+    def __len__(self) -> int:
+        raise NotImplementedError
+    
+    def _record(self, answer: Optional[str]) -> Optional[str]:
+        if answer is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return answer
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self._hits + self._misses
+        return {
+            "backend": self.backend,
+            "entries": len(self),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0
+        }
+
+
+class MemoryAnswerCache(AnswerCache):
+    """In-process LRU cache with per-entry TTL"""
+    
+    backend = "memory"
+    
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        super().__init__()
+        self._cache = TTLCache(
+            maxsize=max_entries or Config.ANSWER_CACHE_MAX_ENTRIES,
+            ttl=ttl or Config.ANSWER_CACHE_TTL
+        )
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            return self._record(entry[0] if entry is not None else None)
+    
+    def set(self, key: str, answer: str, generation: int):
+        with self._lock:
+            self._cache[key] = (answer, generation)
+    
+    def discard_before(self, generation: int):
+        with self._lock:
+            for key in [key for key, entry in self._cache.items() if entry[1] < generation]:
+                del self._cache[key]
+    
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+
+class SQLiteAnswerCache(AnswerCache):
+    """On-disk cache shared by processes on one host; evicts least recently used entries"""
+    
+    backend = "sqlite"
+    
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        super().__init__()
+        self.path = path or Config.ANSWER_CACHE_PATH
+        self.max_entries = max_entries or Config.ANSWER_CACHE_MAX_ENTRIES
+        self.ttl = ttl or Config.ANSWER_CACHE_TTL
+        self._lock = threading.Lock()
+        
+        self._connection = _connect(self.path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, answer TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL, "
+            "generation INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(answers)")}
+        if "generation" not in columns:
+            # Cache files written before answers recorded their generation
+            self._connection.execute("ALTER TABLE answers ADD COLUMN generation INTEGER NOT NULL DEFAULT 0")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed)")
+    
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT answer FROM answers WHERE key = ? AND created > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is not None:
+                self._connection.execute("UPDATE answers SET accessed = ? WHERE key = ?", (now, key))
+            return self._record(row[0] if row else None)
+    
+    def set(self, key: str, answer: str, generation: int):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, created, accessed, generation) VALUES (?, ?, ?, ?, ?)",
+                (key, answer, now, now, generation)
+            )
+            self._connection.execute("DELETE FROM answers WHERE created <= ?", (now - self.ttl,))
+            self._connection.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+    
+    def discard_before(self, generation: int):
+        # The table is shared; answers of other processes at the current generation stay
+        with self._lock:
+            self._connection.execute("DELETE FROM answers WHERE generation < ?", (generation,))
+    
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM answers")
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+
+class SemanticAnswerCache:
+    """Finds the answer to a paraphrased question by question-embedding similarity.
+    
+    Unit question vectors are kept in a preallocated matrix, so a lookup is a
+    single matrix-vector product. When the cache is full the oldest entry is
+    overwritten. The best similarity of every lookup is sampled so the
+    threshold can be tuned from get_stats(). Each entry records the
+    collection generation its sources were retrieved at, and only matches
+    lookups at that same generation.
+    """
+    
+    def __init__(self, threshold: Optional[float] = None, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        self.threshold = Config.SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+        self.max_entries = max_entries or Config.SEMANTIC_CACHE_MAX_ENTRIES
+        self.ttl = ttl or Config.ANSWER_CACHE_TTL
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._hit_similarities = deque(maxlen=1000)
+        self._miss_similarities = deque(maxlen=1000)
+        self.clear()
+    
+    def clear(self):
+        """Drop every entry; statistics are kept"""
+        with self._lock:
+            self._vectors: Optional[np.ndarray] = None
+            self._entries: List[Optional[Dict[str, Any]]] = [None] * self.max_entries
+            self._max_results = np.zeros(self.max_entries, dtype=np.int64)
+            self._generations = np.full(self.max_entries, -1, dtype=np.int64)
+            self._created = np.full(self.max_entries, -np.inf)
+            self._next = 0
+    
+    def discard_before(self, generation: int):
+        """Drop entries whose sources were retrieved before generation"""
+        with self._lock:
+            older = self._generations < generation
+            self._created[older] = -np.inf
+            for slot in np.flatnonzero(older):
+                self._entries[slot] = None
+    
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def get(self, question_embedding: np.ndarray, max_results: int, generation: int) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return (entry, similarity) of the closest cached question above the threshold"""
+        unit = self._unit(question_embedding)
+        with self._lock:
+            best, similarity = None, None
+            if self._vectors is not None:
+                similarities = self._vectors @ unit
+                # Empty and expired slots, answers built from a different number of sources
+                # and answers from another collection generation never match
+                stale = (
+                    (self._created <= time.time() - self.ttl)
+                    | (self._max_results != max_results)
+                    | (self._generations != generation)
+                )
+                similarities[stale] = -np.inf
+                best = int(np.argmax(similarities))
+                similarity = float(similarities[best])
+            
+            if similarity is not None and similarity >= self.threshold:
+                self._hits += 1
+                self._hit_similarities.append(similarity)
+                return self._entries[best], similarity
+            
+            self._misses += 1
+            if similarity is not None and similarity > -np.inf:
+                self._miss_similarities.append(similarity)
+            return None
+    
+    def set(self, question_embedding: np.ndarray, max_results: int, answer: str, sources: List[Dict[str, Any]], generation: int):
+        """Remember the answer and sources given for a question; generation is when the sources were retrieved"""
+        unit = self._unit(question_embedding)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(unit)), dtype=np.float32)
+            slot = self._next
+            self._vectors[slot] = unit
+            self._entries[slot] = {"answer": answer, "sources": sources}
+            self._max_results[slot] = max_results
+            self._generations[slot] = generation
+            self._created[slot] = time.time()
+            self._next = (slot + 1) % self.max_entries
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return int(np.count_nonzero(self._created > time.time() - self.ttl))
+    
+    @staticmethod
+    def _distribution(values) -> Optional[Dict[str, float]]:
+        if not values:
+            return None
+        values = np.asarray(values)
+        return {
+            "count": len(values),
+            "min": float(values.min()),
+            "p50": float(np.percentile(values, 50)),
+            "p90": float(np.percentile(values, 90)),
+            "max": float(values.max())
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and the similarity distribution of recent lookups"""
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            hit_similarities = list(self._hit_similarities)
+            miss_similarities = list(self._miss_similarities)
+        lookups = hits + misses
+        return {
+            "entries": len(self),
+            "threshold": self.threshold,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "hit_similarity": self._distribution(hit_similarities),
+            "miss_similarity": self._distribution(miss_similarities)
+        }
+
+
+def create_answer_cache() -> Optional[AnswerCache]:
+    """Build the cache selected by ANSWER_CACHE_BACKEND (memory, sqlite or none)"""
+    backend = Config.ANSWER_CACHE_BACKEND
+    if backend == "memory":
+        return MemoryAnswerCache()
+    elif backend == "sqlite":
+        return SQLiteAnswerCache()
+    elif backend in ["none", "off", ""]:
+        return None
+    else:
+        raise ValueError(f"Unsupported answer cache backend: {backend}. Use 'memory', 'sqlite' or 'none'.")
+
+
+def create_semantic_answer_cache() -> Optional[SemanticAnswerCache]:
+    """Build the semantic cache if SEMANTIC_CACHE_ENABLED is set"""
+    return SemanticAnswerCache() if Config.SEMANTIC_CACHE_ENABLED else None
\ No newline at end of file
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+HTTP API for the RAG system
+
+Run with `python -m src.api` (API_WORKERS processes, each loading the model
+before it reports ready) or `uvicorn src.api:app`. Workers share nothing:
+ingest jobs are tracked in the process that accepted them, and each worker
+gets an equal share of the LLM rate limits. Local Milvus (milvus-lite) is a
+single-process file, so it runs with one worker.
+"""
+
+from typing import List, Dict, Any, Optional
+from contextlib import aclosing, asynccontextmanager
+import asyncio
+import json
+import os
+import sys
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rag_pipeline import RAGPipeline
+from src.async_rag_pipeline import AsyncRAGPipeline
+from src.admission import OverloadedError
+from config import Config
+
+
+class QueryRequest(BaseModel):
+    question: str = Field(..., min_length=1)
+    max_results: Optional[int] = Field(None, ge=1)
+    priority: str = "interactive"
+    include_timings: bool = False
+
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+    max_results: Optional[int] = Field(None, ge=1)
+    priority: str = "batch"
+
+
+class TextIngestRequest(BaseModel):
+    text: str = Field(..., min_length=1)
+    metadata: Optional[Dict[str, Any]] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the pipeline (embedding model, Milvus client, LLM backend) before serving"""
+    app.state.rag = None
+    rag = AsyncRAGPipeline(await asyncio.to_thread(RAGPipeline))
+    # Every worker calls the same LLM account, so each gets its share of the quota
+    rag.pipeline.llm.rate_limiter.split(Config.API_WORKERS)
+    # The first encode call initializes the model's kernels; pay for it before reporting ready
+    await asyncio.to_thread(rag.pipeline.embedding_model.encode, ["warmup"])
+    app.state.rag = rag
+    print(f"✅ RAG API ready (pid {os.getpid()})")
+    yield
+    app.state.rag = None
+    await rag.aclose()
+
+
+app = FastAPI(title="RAG API", lifespan=lifespan)
+
+
+def get_rag(request: Request) -> AsyncRAGPipeline:
+    rag = request.app.state.rag
+    if rag is None:
+        raise HTTPException(status_code=503, detail="RAG pipeline is not ready")
+    return rag
+
+
+@app.exception_handler(ValueError)
+async def value_error_handler(request: Request, exc: ValueError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "stage": exc.stage},
+        headers={"Retry-After": str(int(exc.retry_after))}
+    )
+
+
+@app.exception_handler(TimeoutError)
+async def timeout_error_handler(request: Request, exc: TimeoutError):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+@app.get("/health")
+async def health():
+    """Liveness: the process is serving requests"""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready(request: Request):
+    """Readiness: the model is loaded and the vector database answers"""
+    rag = get_rag(request)
+    try:
+        # Not through the stats cache: a cached answer would hide an unreachable database
+        info = await asyncio.to_thread(rag.pipeline.vector_db.get_collection_info)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Vector database unavailable: {e}")
+    return {"status": "ready", "document_count": info["document_count"]}
+
+
+@app.post("/query")
+async def query(body: QueryRequest, request: Request):
+    return await get_rag(request).aquery(body.question, body.max_results, body.priority, include_timings=body.include_timings)
+
+
+@app.post("/retrieve")
+async def retrieve(body: QueryRequest, request: Request):
+    """Ranked sources with timings; never calls the LLM"""
+    return await get_rag(request).aretrieve(body.question, body.max_results)
+
+
+@app.post("/query/batch")
+async def query_batch(body: BatchQueryRequest, request: Request):
+    """Answer many questions concurrently; a failed question carries an error instead of an answer"""
+    if len(body.questions) > Config.API_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {Config.API_MAX_BATCH} questions per batch")
+    rag = get_rag(request)
+    results = await asyncio.gather(
+        *(rag.aquery(question, body.max_results, body.priority) for question in body.questions),
+        return_exceptions=True
+    )
+    return {
+        "results": [
+            {"question": question, "error": str(result)} if isinstance(result, Exception) else result
+            for question, result in zip(body.questions, results)
+        ]
+    }
+
+
+def format_event(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@app.post("/query/stream")
+async def query_stream(body: QueryRequest, request: Request):
+    """Server-sent events: one "sources" event, "token" events, then "done" (or "error")"""
+    rag = get_rag(request)
+    stream = rag.aquery_stream(body.question, body.max_results, body.priority)
+    try:
+        # Retrieval and the LLM capacity check run before the 200 is sent, so overload still maps to 429
+        first = await anext(stream)
+    except BaseException:
+        await stream.aclose()
+        raise
+    
+    async def events():
+        try:
+            # A client that disconnects mid-answer closes the stream, which frees its LLM slot
+            async with aclosing(stream):
+                yield format_event(first)
+                async for event in stream:
+                    yield format_event(event)
+        except Exception as e:
+            yield format_event({"type": "error", "detail": str(e)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/ingest", status_code=202)
+async def ingest(request: Request, name: str = Query(..., description="File name; its extension selects the parser")):
+    """Queue the raw request body as a document; poll /jobs/{job_id} for progress.
+    
+    Jobs live in the worker process that accepted them, so with several
+    workers the poll must reach the same one (e.g. a sticky load balancer).
+    """
+    rag = get_rag(request)
+    data = await request.body()
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty request body")
+    job_id = rag.pipeline.ingest_jobs.submit_uploads([(name, data)])
+    return {"job_id": job_id}
+
+
+@app.post("/ingest/text")
+async def ingest_text(body: TextIngestRequest, request: Request):
+    chunks = await get_rag(request).aingest_text(body.text, body.metadata)
+    return {"chunks": chunks}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    job = get_rag(request).pipeline.ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+
+@app.get("/documents")
+async def list_documents(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=0, le=500),
+    sort: str = "source",
+    descending: bool = False,
+    search: Optional[str] = None,
+):
+    rag = get_rag(request)
+    return await asyncio.to_thread(rag.pipeline.list_documents, offset, limit, sort, descending, search)
+
+
+@app.get("/stats")
+async def stats(request: Request):
+    rag = get_rag(request)
+    return await asyncio.to_thread(rag.get_system_info)
+
+
+def main():
+    import argparse
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description="RAG HTTP API")
+    parser.add_argument("--host", default=Config.API_HOST)
+    parser.add_argument("--port", type=int, default=Config.API_PORT)
+    parser.add_argument("--workers", type=int, default=Config.API_WORKERS,
+                        help="Worker processes; each loads its own copy of the model")
+    args = parser.parse_args()
+    if args.workers > 1 and Config.MILVUS_TYPE == "local":
+        parser.error("local Milvus (milvus-lite) supports a single process; use --workers 1 or a Milvus server")
+    
+    # Workers are spawned and re-read the config, which sizes their rate limit share
+    os.environ["API_WORKERS"] = str(args.workers)
+    Config.API_WORKERS = args.workers
+    uvicorn.run("src.api:app", host=args.host, port=args.port, workers=args.workers, loop="uvloop")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
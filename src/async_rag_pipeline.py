@@ -0,0 +1,291 @@
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import itertools
+import os
+import time
+import numpy as np
+from src.rag_pipeline import RAGPipeline
+from src.answer_cache import normalize_question
+from src.single_flight import AsyncSingleFlight
+from src import telemetry
+from config import Config
+
+
+class AsyncRAGPipeline:
+    """asyncio front end for RAGPipeline.
+    
+    Network-bound stages use AsyncMilvusClient and AsyncGroq, so many questions
+    can be in flight in one process. CPU-bound stages (chunking, embedding) run
+    on a small thread pool. Question embeddings requested concurrently are
+    micro-batched into one encode call.
+    """
+    
+    def __init__(self, pipeline: Optional[RAGPipeline] = None, max_workers: Optional[int] = None):
+        self.pipeline = pipeline or RAGPipeline()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.ASYNC_EMBED_WORKERS,
+            thread_name_prefix="rag-embed"
+        )
+        self._pending_questions: List[Tuple[str, asyncio.Future]] = []
+        self._encode_task: Optional[asyncio.Task] = None
+        self._in_flight = AsyncSingleFlight() if Config.QUERY_COALESCING_ENABLED else None
+    
+    async def _run_blocking(self, func, *args):
+        """Run a CPU-bound callable on the embedding thread pool"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+    
+    async def _encode_question(self, question: str, timings: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Embed a question, batching it with other questions waiting at the same time"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending_questions.append((question, future))
+        if self._encode_task is None or self._encode_task.done():
+            self._encode_task = asyncio.create_task(self._encode_pending())
+        with self.pipeline.metrics.time("embed", timings):
+            return await future
+    
+    async def _encode_pending(self):
+        await asyncio.sleep(0)  # Let questions arriving in the same loop iteration join the batch
+        while self._pending_questions:
+            batch, self._pending_questions = self._pending_questions, []
+            try:
+                # A micro-batch takes one embed slot, however many questions it carries
+                async with self.pipeline.admission.aslot("embed"):
+                    vectors = await self._run_blocking(
+                        self.pipeline.embedding_model.encode, [question for question, _ in batch]
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+    
+    async def _aretrieve(
+        self,
+        question: str,
+        max_results: Optional[int] = None,
+        query_embedding: Optional[np.ndarray] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Async variant of RAGPipeline._retrieve"""
+        if query_embedding is None:
+            query_embedding = await self._encode_question(question, timings)
+        with self.pipeline.metrics.time("search", timings):
+            async with self.pipeline.admission.aslot("search"):
+                search_results = await self.pipeline.vector_db.asearch(query_embedding, max_results)
+        return self.pipeline._format_sources(search_results)
+    
+    async def aretrieve(self, question: str, max_results: Optional[int] = None) -> Dict[str, Any]:
+        """Async variant of RAGPipeline.retrieve"""
+        started = time.perf_counter()
+        timings = {}
+        with telemetry.span("rag.retrieve", {"rag.top_k": max_results or Config.MAX_RETRIEVED_DOCS}) as span:
+            _, sources = await self._aretrieve(question, max_results, timings=timings)
+            span.set_attribute("rag.sources", len(sources))
+        timings["total"] = time.perf_counter() - started
+        
+        return {
+            "question": question,
+            "sources": sources,
+            "timings": timings
+        }
+    
+    async def aquery(
+        self,
+        question: str,
+        max_results: Optional[int] = None,
+        priority: str = "interactive",
+        mode: str = "answer",
+        include_timings: bool = False,
+    ) -> Dict[str, Any]:
+        """Async variant of RAGPipeline.query, coalescing identical concurrent questions.
+        
+        mode is "answer" or "retrieve"; for deferred generation, start aquery()
+        as a task after aretrieve().
+        """
+        attributes = {"rag.mode": mode, "rag.priority": priority, "rag.top_k": max_results or Config.MAX_RETRIEVED_DOCS}
+        with telemetry.span("rag.query", attributes) as span:
+            if mode == "retrieve":
+                return {**await self.aretrieve(question, max_results), "answer": None}
+            elif mode != "answer":
+                raise ValueError(f"Unsupported query mode: {mode}. Use 'answer' or 'retrieve'.")
+        
+            if self._in_flight is None:
+                result = await self._aquery(question, max_results, priority)
+            else:
+                key = (normalize_question(question), max_results or Config.MAX_RETRIEVED_DOCS)
+                result, shared = await self._in_flight.do(key, self._aquery, question, max_results, priority)
+                span.set_attribute("rag.coalesced", shared)
+                if shared:
+                    result = {**result, "question": question}
+            if telemetry.enabled():
+                self.pipeline._trace_answer(span, result)
+        if not include_timings:
+            result = {key: value for key, value in result.items() if key != "timings"}
+        return result
+    
+    async def _aquery(self, question: str, max_results: Optional[int] = None, priority: str = "interactive") -> Dict[str, Any]:
+        started = time.perf_counter()
+        timings = {}
+        result = await self._aanswer(question, max_results, priority, timings)
+        self.pipeline.metrics.record("total", time.perf_counter() - started, timings)
+        result["timings"] = timings
+        return result
+    
+    async def _aanswer(
+        self,
+        question: str,
+        max_results: Optional[int],
+        priority: str,
+        timings: Dict[str, float],
+    ) -> Dict[str, Any]:
+        pipeline = self.pipeline
+        query_embedding = await self._encode_question(question, timings)
+        
+        semantic_hit = pipeline._semantic_cache_lookup(query_embedding, max_results)
+        if semantic_hit is not None:
+            return pipeline._semantic_result(question, semantic_hit)
+        
+        generation = pipeline._sync_cache_generation()
+        context_docs, sources = await self._aretrieve(question, max_results, query_embedding, timings)
+        cache_key, result = pipeline._lookup_answer(question, max_results, context_docs, sources, generation)
+        if result is not None:
+            return result
+        
+        prompt, usage = pipeline._build_prompt(question, context_docs, timings)
+        with pipeline.metrics.time("llm", timings):
+            answer = await pipeline.llm.agenerate_response(prompt, priority=priority)
+        return pipeline._finish_answer(question, max_results, query_embedding, cache_key, answer, sources, usage, generation)
+    
+    async def aquery_stream(
+        self,
+        question: str,
+        max_results: Optional[int] = None,
+        priority: str = "interactive",
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async variant of RAGPipeline.query_stream, yielding the same events.
+        
+        Admission and rate-limit overload is raised before the "sources" event.
+        """
+        started = time.perf_counter()
+        pipeline = self.pipeline
+        metrics = pipeline.metrics
+        timings = {}
+        # Traces the retrieval phase only; a span cannot stay current across the yields below
+        attributes = {"rag.priority": priority, "rag.top_k": max_results or Config.MAX_RETRIEVED_DOCS}
+        with telemetry.span("rag.query_stream", attributes) as span:
+            query_embedding = await self._encode_question(question, timings)
+            semantic_hit = pipeline._semantic_cache_lookup(query_embedding, max_results)
+            if semantic_hit is not None:
+                sources = semantic_hit["sources"]
+                ready = pipeline._semantic_result(question, semantic_hit)
+            else:
+                generation = pipeline._sync_cache_generation()
+                context_docs, sources = await self._aretrieve(question, max_results, query_embedding, timings)
+                cache_key, ready = pipeline._lookup_answer(question, max_results, context_docs, sources, generation)
+            if telemetry.enabled():
+                pipeline._trace_answer(span, ready or {"sources": sources})
+        if ready is None:
+            # Refuse before the first event, while a server can still answer 429
+            pipeline.llm.check_capacity(priority)
+        yield {"type": "sources", "sources": sources}
+        
+        answer_parts = []
+        time_to_first_token = None
+        usage = None
+        if ready is None:
+            prompt, usage = pipeline._build_prompt(question, context_docs, timings)
+            generation_started = time.perf_counter()
+            # The LLM slot is freed when this block exits, also when the consumer closes the stream early
+            async with pipeline.llm.astream_response(prompt, priority=priority) as tokens:
+                async for token in tokens:
+                    if time_to_first_token is None:
+                        time_to_first_token = time.perf_counter() - started
+                        metrics.record("ttft", time.perf_counter() - generation_started, timings)
+                    answer_parts.append(token)
+                    yield {"type": "token", "content": token}
+            metrics.record("llm", time.perf_counter() - generation_started, timings)
+        else:
+            time_to_first_token = time.perf_counter() - started
+            answer_parts.append(ready["answer"])
+            yield {"type": "token", "content": ready["answer"]}
+        
+        answer = "".join(answer_parts)
+        if ready is None:
+            pipeline._store_answer(cache_key, query_embedding, max_results, answer, sources, generation)
+        yield pipeline._done_event(question, answer, ready, usage, time_to_first_token, started, timings)
+    
+    async def _aingest_chunks(self, chunks: List[Dict[str, Any]], inserted: Optional[List[str]] = None) -> int:
+        """Deduplicate and embed on the thread pool, then insert asynchronously"""
+        prepared = await self._run_blocking(self.pipeline._prepare_chunks, chunks)
+        if prepared is None:
+            return 0
+        documents, metadatas, ids, embeddings, fingerprints = prepared
+        with self.pipeline.metrics.time("ingest_insert"):
+            await self.pipeline.vector_db.aadd_documents(documents, metadatas, ids, embeddings)
+        if inserted is not None:
+            inserted.extend(ids)
+        self.pipeline._register_fingerprints(fingerprints)
+        return len(documents)
+    
+    async def _aingest_chunk_stream(self, chunks: Iterator[Dict[str, Any]]) -> int:
+        """Async variant of RAGPipeline._ingest_chunk_stream"""
+        total = 0
+        inserted: List[str] = []
+        try:
+            while True:
+                # Pulling the next batch parses pages, so it runs off the event loop too
+                batch = await self._run_blocking(lambda: list(itertools.islice(chunks, Config.INGEST_BATCH_SIZE)))
+                if not batch:
+                    return total
+                total += await self._aingest_chunks(batch, inserted)
+        except Exception:
+            await self._run_blocking(self.pipeline._rollback, inserted)
+            raise
+    
+    async def aingest_document(self, file_path: str) -> int:
+        """Async variant of RAGPipeline.ingest_document"""
+        with telemetry.span("rag.ingest", {"document.source": os.path.basename(file_path)}) as span:
+            chunks = self.pipeline.document_processor.iter_document_chunks(file_path)
+            count = await self._aingest_chunk_stream(chunks)
+            span.set_attribute("rag.chunks", count)
+        return count
+    
+    async def aingest_text(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+        """Async variant of RAGPipeline.ingest_text"""
+        with telemetry.span("rag.ingest", {"document.source": (metadata or {}).get("source", "Custom Text")}) as span:
+            chunks = await self._run_blocking(self.pipeline.document_processor.process_text, text, metadata)
+            count = await self._aingest_chunks(chunks)
+            span.set_attribute("rag.chunks", count)
+        return count
+    
+    async def aingest_directory(self, directory_path: str) -> int:
+        """Async variant of RAGPipeline.ingest_directory; files are ingested concurrently"""
+        file_paths = list(self.pipeline.document_processor.iter_directory_files(directory_path))
+        counts = await asyncio.gather(
+            *(self.aingest_document(file_path) for file_path in file_paths),
+            return_exceptions=True
+        )
+        total = 0
+        for file_path, count in zip(file_paths, counts):
+            filename = os.path.basename(file_path)
+            if isinstance(count, Exception):
+                print(f"Error processing {filename}: {count}")
+            else:
+                total += count
+                print(f"Processed {filename}: {count} chunks")
+        return total
+    
+    async def aclose(self):
+        """Release the async Milvus client and the thread pool"""
+        await self.pipeline.vector_db.aclose()
+        self._executor.shutdown(wait=False)
+    
+    def get_system_info(self) -> Dict[str, Any]:
+        """RAGPipeline.get_system_info plus the async coalescing counters"""
+        info = self.pipeline.get_system_info()
+        info["async_coalescing"] = self._in_flight.get_stats() if self._in_flight is not None else None
+        return info
\ No newline at end of file
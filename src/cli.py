@@ -2,8 +2,43 @@
 import argparse
 import sys
 import os
+from contextlib import closing
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.rag_pipeline import RAGPipeline
+from src.admission import OverloadedError
+
+
+def stream_answer(rag, question):
+    """Print the answer token by token as it streams from the LLM"""
+    # Closing the stream on Ctrl-C ends the LLM request and frees its slot right away
+    with closing(rag.query_stream(question)) as events:
+        sources = next(events)["sources"]
+    
+        print("\nAnswer: ", end="", flush=True)
+        done = {}
+        for event in events:
+            if event["type"] == "token":
+                print(event["content"], end="", flush=True)
+            elif event["type"] == "done":
+                done = event
+        print()
+    
+    if sources:
+        print(f"\nSources: {len(sources)}")
+    if done.get("time_to_first_token") is not None:
+        print(f"(first token after {done['time_to_first_token']:.2f}s, total {done['total_time']:.2f}s)")
+    if done.get("usage"):
+        print(f"(prompt tokens: {done['usage']['prompt_tokens']})")
+
+
+def print_latency(latency):
+    """Print p50/p95/p99 (milliseconds) of each pipeline stage seen in this process"""
+    if not latency:
+        print("Latency: (no samples yet; run some queries in this session)")
+        return
+    for stage, stats in latency.items():
+        print(f"Latency {stage}: p50 {stats['p50'] * 1000:.0f}ms, p95 {stats['p95'] * 1000:.0f}ms, "
+              f"p99 {stats['p99'] * 1000:.0f}ms ({stats['count']} samples)")
 
 
 def main():
@@ -12,8 +47,11 @@ def main():
     parser.add_argument("--ingest-dir", type=str, help="Ingest all documents from directory")
     parser.add_argument("--ingest-text", type=str, help="Ingest raw text")
     parser.add_argument("--query", type=str, help="Query the RAG system")
+    parser.add_argument("--stream", action="store_true", help="Stream the --query answer token by token")
+    parser.add_argument("--retrieve-only", action="store_true", help="Show the --query sources without generating an answer")
     parser.add_argument("--info", action="store_true", help="Show system information")
     parser.add_argument("--interactive", action="store_true", help="Start interactive mode")
+    parser.add_argument("--truncation-report", action="store_true", help="Report stored chunks longer than the embedding model window")
     
     args = parser.parse_args()
     
@@ -25,6 +63,22 @@ def main():
         print(f"Vector DB: {info['vector_db']['name']} ({info['vector_db']['document_count']} documents)")
         print(f"Embedding Model: {info['embedding_model']['model_name']}")
         print(f"LLM Provider: {info['llm']['provider']} ({info['llm']['model']})")
+        for stage, stats in info['admission'].items():
+            limit = stats['max_concurrent'] or "unlimited"
+            print(f"Admission {stage}: {stats['active']}/{limit} active, {stats['waiting']} waiting, "
+                  f"{stats['rejected']} rejected, {stats['timed_out']} timed out")
+        # Latency percentiles are kept in memory per process, so a fresh --info run has none;
+        # see the interactive 'info' command, GET /stats on the API, or the OTel rag.stage.duration histogram
+        return
+    
+    if args.truncation_report:
+        report = rag.get_truncation_report()
+        print("=== Chunk Truncation Report ===")
+        print(f"Model window: {report['max_seq_length']} tokens")
+        print(f"Truncated chunks: {report['truncated_chunks']} / {report['total_chunks']} ({report['truncated_percent']:.1f}%)")
+        print(f"Tokens dropped: {report['truncated_tokens']}")
+        for source, count in sorted(report['truncated_by_source'].items(), key=lambda item: -item[1]):
+            print(f"  {source}: {count}")
         return
     
     if args.ingest_file:
@@ -56,6 +110,28 @@ def main():
     
     if args.query:
         print(f"Query: {args.query}")
+        if args.retrieve_only:
+            try:
+                result = rag.retrieve(args.query)
+                print(f"\nSources ({len(result['sources'])}):")
+                for i, source in enumerate(result['sources']):
+                    distance = f" (distance {source['distance']:.4f})" if source['distance'] is not None else ""
+                    print(f"  {i+1}. {source['metadata'].get('source_file', 'Unknown')}{distance}")
+                timings = result['timings']
+                print(f"\n(embed {timings['embed']:.3f}s, search {timings['search']:.3f}s, total {timings['total']:.3f}s)")
+            except OverloadedError as e:
+                print(f"System busy: {e}. Retry in {e.retry_after:.0f}s")
+            except Exception as e:
+                print(f"Error querying: {e}")
+            return
+        if args.stream:
+            try:
+                stream_answer(rag, args.query)
+            except OverloadedError as e:
+                print(f"System busy: {e}. Retry in {e.retry_after:.0f}s")
+            except Exception as e:
+                print(f"Error querying: {e}")
+            return
         try:
             result = rag.query(args.query)
             print(f"\nAnswer: {result['answer']}")
@@ -63,6 +139,12 @@ def main():
                 print(f"\nSources ({len(result['sources'])}):")
                 for i, source in enumerate(result['sources']):
                     print(f"  {i+1}. {source['metadata'].get('source_file', 'Unknown')}")
+            if result.get('usage'):
+                usage = result['usage']
+                print(f"\nPrompt tokens: {usage['prompt_tokens']} "
+                      f"({usage['chunks_used']}/{usage['chunks_retrieved']} chunks, {usage['chunks_truncated']} truncated)")
+        except OverloadedError as e:
+            print(f"System busy: {e}. Retry in {e.retry_after:.0f}s")
         except Exception as e:
             print(f"Error querying: {e}")
         return
@@ -87,6 +169,7 @@ def main():
                     print(f"Documents: {info['vector_db']['document_count']}")
                     print(f"Model: {info['embedding_model']['model_name']}")
                     print(f"LLM: {info['llm']['provider']}")
+                    print_latency(info['latency'])
                     continue
                 
                 if user_input.startswith('ingest '):
@@ -113,10 +196,7 @@ def main():
                     question = user_input[6:].strip()
                     print(f"Querying: {question}")
                     try:
-                        result = rag.query(question)
-                        print(f"\nAnswer: {result['answer']}")
-                        if result['sources']:
-                            print(f"\nSources: {len(result['sources'])}")
+                        stream_answer(rag, question)
                     except Exception as e:
                         print(f"Error: {e}")
                     continue
@@ -125,10 +205,7 @@ def main():
                 if user_input:
                     print(f"Querying: {user_input}")
                     try:
-                        result = rag.query(user_input)
-                        print(f"\nAnswer: {result['answer']}")
-                        if result['sources']:
-                            print(f"\nSources: {len(result['sources'])}")
+                        stream_answer(rag, user_input)
                     except Exception as e:
                         print(f"Error: {e}")
                 
@@ -0,0 +1,82 @@
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import math
+from config import Config
+
+TokenCounter = Callable[[List[str]], List[int]]
+
+
+def estimate_tokens(texts: List[str]) -> List[int]:
+    """Rough token counts (about four characters per token) when no tokenizer is available"""
+    # Budgets are in LLM tokens; the embedding model's WordPiece tokenizer counts differently
+    # and adds [CLS]/[SEP] to every chunk, so it is not a stand-in for the LLM's tokenizer
+    return [math.ceil(len(text) / 4) for text in texts]
+
+
+class ContextBuilder:
+    """Packs retrieved chunks into a token budget, most relevant first.
+    
+    Chunks are expected in relevance order, as returned by the vector search.
+    Chunks that fit are kept whole. The first chunk that does not fit is
+    truncated if at least min_chunk_tokens of budget remain, otherwise it is
+    skipped and smaller, less relevant chunks may still fill the gap.
+    All chunks are counted with one batched tokenizer call.
+    """
+    
+    def __init__(
+        self,
+        token_counter: Optional[TokenCounter] = None,
+        max_tokens: Optional[int] = None,
+        min_chunk_tokens: Optional[int] = None,
+    ):
+        self.count_tokens = token_counter or estimate_tokens
+        self.max_tokens = Config.CONTEXT_TOKEN_BUDGET if max_tokens is None else max_tokens
+        self.min_chunk_tokens = Config.CONTEXT_MIN_CHUNK_TOKENS if min_chunk_tokens is None else min_chunk_tokens
+    
+    def build(self, chunks: List[str]) -> Tuple[List[str], Dict[str, Any]]:
+        """Return the chunks to send and a report of what was kept"""
+        counts = self.count_tokens(chunks) if chunks else []
+        report = {
+            "budget": self.max_tokens,
+            "chunks_retrieved": len(chunks),
+            "chunks_used": 0,
+            "chunks_truncated": 0,
+            "chunks_dropped": 0,
+            "context_tokens": 0
+        }
+        
+        if self.max_tokens <= 0:
+            # No budget configured: send everything
+            report["chunks_used"] = len(chunks)
+            report["context_tokens"] = sum(counts)
+            return list(chunks), report
+        
+        packed = []
+        remaining = self.max_tokens
+        for chunk, tokens in zip(chunks, counts):
+            if tokens <= remaining:
+                packed.append(chunk)
+                remaining -= tokens
+                report["chunks_used"] += 1
+            elif not report["chunks_truncated"] and remaining >= self.min_chunk_tokens:
+                truncated, tokens = self._truncate(chunk, tokens, remaining)
+                packed.append(truncated)
+                remaining -= tokens
+                report["chunks_used"] += 1
+                report["chunks_truncated"] += 1
+            else:
+                report["chunks_dropped"] += 1
+        
+        report["context_tokens"] = self.max_tokens - remaining
+        return packed, report
+    
+    def _truncate(self, chunk: str, tokens: int, max_tokens: int) -> Tuple[str, int]:
+        """Cut chunk to at most max_tokens, preferring a word boundary"""
+        end = len(chunk)
+        # Token density is nearly uniform, so a proportional cut lands close and a refinement or two fixes the rest
+        while tokens > max_tokens and end > 1:
+            end = max(1, end * max_tokens // tokens)
+            space = chunk.rfind(" ", 0, end)
+            if space > end // 2:
+                end = space
+            tokens = self.count_tokens([chunk[:end]])[0]
+        return chunk[:end], tokens
\ No newline at end of file
@@ -0,0 +1,155 @@
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+import re
+import threading
+import numpy as np
+import xxhash
+from config import Config
+
+FINGERPRINT_BITS = 64
+_WORD_PATTERN = re.compile(r"\w+")
+
+# (simhash, content_hash) of a kept chunk, registered once the chunk is stored
+Fingerprint = Tuple[int, str]
+
+
+class NearDuplicateDetector:
+    """Detects exact and near-duplicate chunks with 64-bit SimHash fingerprints.
+    
+    Fingerprints are built from word shingles hashed with xxhash. They are
+    indexed in max_distance + 1 bit bands: two fingerprints within
+    max_distance bits of each other must agree exactly on at least one band,
+    so a lookup only compares candidates from matching buckets.
+    
+    filter() does not remember the chunks it keeps; register() them once
+    they are stored, so a failed insert can be retried.
+    """
+    
+    def __init__(self, max_distance: Optional[int] = None, shingle_size: Optional[int] = None):
+        self.max_distance = Config.DEDUP_MAX_DISTANCE if max_distance is None else max_distance
+        self.shingle_size = Config.DEDUP_SHINGLE_SIZE if shingle_size is None else shingle_size
+        
+        band_count = self.max_distance + 1
+        band_width = FINGERPRINT_BITS // band_count
+        self._bands = [
+            (i * band_width, FINGERPRINT_BITS if i == band_count - 1 else (i + 1) * band_width)
+            for i in range(band_count)
+        ]
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """Forget every known fingerprint and zero the statistics"""
+        with self._lock:
+            self._content_hashes = set()
+            self._buckets: Dict[Tuple[int, int], List[int]] = {}
+            self._stats = {
+                "chunks_seen": 0,
+                "exact_duplicates": 0,
+                "near_duplicates": 0
+            }
+    
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """Hash of the whitespace- and case-normalized text"""
+        return xxhash.xxh3_128_hexdigest(" ".join(text.lower().split()).encode("utf-8"))
+    
+    def fingerprint(self, text: str) -> Optional[int]:
+        """Compute the 64-bit SimHash of text's word shingles (None for text without words)"""
+        words = _WORD_PATTERN.findall(text.lower())
+        if not words:
+            return None
+        size = min(self.shingle_size, len(words))
+        hashes = np.fromiter(
+            (xxhash.xxh64_intdigest(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)),
+            dtype=np.uint64
+        )
+        # One row of bits per shingle hash, least significant bit first
+        bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+        votes = 2 * bits.sum(axis=0, dtype=np.int64) - len(hashes)
+        return int(np.packbits(votes > 0, bitorder="little").view(np.uint64)[0])
+    
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        return [
+            (i, (fingerprint >> start) & ((1 << (end - start)) - 1))
+            for i, (start, end) in enumerate(self._bands)
+        ]
+    
+    def _find_near(self, fingerprint: int, buckets: Dict[Tuple[int, int], List[int]]) -> bool:
+        for key in self._band_keys(fingerprint):
+            for candidate in buckets.get(key, ()):
+                if bin(candidate ^ fingerprint).count("1") <= self.max_distance:
+                    return True
+        return False
+    
+    def _index(self, fingerprint: int, buckets: Dict[Tuple[int, int], List[int]]):
+        for key in self._band_keys(fingerprint):
+            buckets.setdefault(key, []).append(fingerprint)
+    
+    def _add(self, fingerprint: int, content_hash: str):
+        self._content_hashes.add(content_hash)
+        self._index(fingerprint, self._buckets)
+    
+    def seed(self, metadatas: Iterable[Dict[str, Any]]):
+        """Register fingerprints already stored in chunk metadata"""
+        with self._lock:
+            for metadata in metadatas:
+                if metadata and "simhash" in metadata and "content_hash" in metadata:
+                    self._add(int(metadata["simhash"], 16), metadata["content_hash"])
+    
+    def register(self, fingerprints: Iterable[Fingerprint]):
+        """Remember the fingerprints filter() returned, once their chunks are stored"""
+        with self._lock:
+            for fingerprint, content_hash in fingerprints:
+                self._add(fingerprint, content_hash)
+        
+    def filter(self, chunks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, int], List[Fingerprint]]:
+        """Drop chunks that duplicate a registered chunk or an earlier chunk of the batch.
+        
+        Returns the kept chunks, the batch statistics and the fingerprints to
+        register() after the kept chunks are stored. Kept chunks get
+        "simhash" and "content_hash" metadata, so a later process can seed
+        its detector from the collection. Chunks without words are kept
+        unfingerprinted, since they would all share one SimHash.
+        """
+        kept = []
+        pending: List[Fingerprint] = []
+        batch_hashes = set()
+        batch_buckets: Dict[Tuple[int, int], List[int]] = {}
+        batch_stats = {"chunks_seen": len(chunks), "exact_duplicates": 0, "near_duplicates": 0}
+        
+        with self._lock:
+            for chunk in chunks:
+                fingerprint = self.fingerprint(chunk["content"])
+                if fingerprint is None:
+                    kept.append(chunk)
+                    continue
+                
+                content_hash = self.content_hash(chunk["content"])
+                if content_hash in self._content_hashes or content_hash in batch_hashes:
+                    batch_stats["exact_duplicates"] += 1
+                    continue
+                
+                if self.max_distance > 0 and (self._find_near(fingerprint, self._buckets) or self._find_near(fingerprint, batch_buckets)):
+                    batch_stats["near_duplicates"] += 1
+                    continue
+                
+                batch_hashes.add(content_hash)
+                self._index(fingerprint, batch_buckets)
+                pending.append((fingerprint, content_hash))
+                chunk["metadata"]["simhash"] = format(fingerprint, "016x")
+                chunk["metadata"]["content_hash"] = content_hash
+                kept.append(chunk)
+            
+            for key, value in batch_stats.items():
+                self._stats[key] += value
+        
+        return kept, batch_stats, pending
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Cumulative deduplication statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+        removed = stats["exact_duplicates"] + stats["near_duplicates"]
+        stats["removed"] = removed
+        stats["removed_percent"] = (100.0 * removed / stats["chunks_seen"]) if stats["chunks_seen"] else 0.0
+        return stats
\ No newline at end of file
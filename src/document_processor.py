@@ -1,52 +1,242 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain_core.documents import Document
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Tuple, Callable, Union, BinaryIO
+import io
+import multiprocessing
 import os
+import time
 from config import Config
+from src.text_splitter import TextSplitter, TokenBudgetSplitter
+from src.semantic_chunker import SemanticChunker
+from src import telemetry
+
+# progress(stage, count): called as pages are parsed and chunks are produced
+ProgressCallback = Callable[[str, int], None]
+
+# In-memory file contents accepted by the *_bytes methods
+FileData = Union[bytes, bytearray, memoryview, BinaryIO]
+
+
+def _as_bytes(data: FileData) -> bytes:
+    """Read FileData into bytes, copying buffers and reading file objects to the end"""
+    if isinstance(data, bytes):
+        return data
+    if isinstance(data, (bytearray, memoryview)):
+        return bytes(data)
+    return data.read()
+
+
+def _extract_pdf_pages(source: Union[str, bytes], start: int, end: int) -> List[Tuple[int, str, str]]:
+    """Extract the text of pages [start, end) from a PDF path or PDF bytes (runs in a worker process)"""
+    from pypdf import PdfReader
+    
+    reader = PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+    labels = reader.page_labels
+    return [
+        (page_number, reader.pages[page_number].extract_text() or "", labels[page_number])
+        for page_number in range(start, end)
+    ]
 
 
 class DocumentProcessor:
-    def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=Config.CHUNK_SIZE,
-            chunk_overlap=Config.CHUNK_OVERLAP,
-            length_function=len,
-        )
+    def __init__(self, embedding_model=None, metrics=None):
+        self.chunking_mode = Config.CHUNKING_MODE
+        self.embedding_model = embedding_model
+        self.metrics = metrics  # Optional StageMetrics receiving parse and chunk latencies
+        
+        if self.chunking_mode == "characters":
+            self.text_splitter = TextSplitter(
+                chunk_size=Config.CHUNK_SIZE,
+                chunk_overlap=Config.CHUNK_OVERLAP,
+            )
+        elif self.chunking_mode == "tokens":
+            # Measure chunks with the embedding model's own tokenizer so they fit its window
+            self._require_embedding_model()
+            token_budget = self.embedding_model.get_token_budget()
+            if Config.TOKEN_CHUNK_SIZE > 0:
+                token_budget = min(token_budget, Config.TOKEN_CHUNK_SIZE)
+            self.text_splitter = TokenBudgetSplitter(
+                self.embedding_model.tokenizer,
+                max_tokens=token_budget,
+                chunk_overlap=Config.TOKEN_CHUNK_OVERLAP,
+            )
+        elif self.chunking_mode == "semantic":
+            self._require_embedding_model()
+            self.text_splitter = SemanticChunker(self.embedding_model)
+        else:
+            raise ValueError(
+                f"Unsupported chunking mode: {self.chunking_mode}. Use 'characters', 'tokens' or 'semantic'."
+            )
     
-    def load_document(self, file_path: str) -> List[Document]:
-        """Load a document from file path"""
+    def _require_embedding_model(self):
+        """Create an embedding model if none was shared with this processor"""
+        if self.embedding_model is None:
+            from src.embeddings import EmbeddingModel
+            self.embedding_model = EmbeddingModel()
+    
+    def _traced_split(self, text: str, source: str) -> List[Tuple[str, Optional[Any]]]:
+        """_split_with_vectors inside a document.chunk span that records the chunk count"""
+        attributes = {"document.source": source, "document.characters": len(text), "rag.chunking_mode": self.chunking_mode}
+        with telemetry.span("document.chunk", attributes) as span:
+            pieces = self._split_with_vectors(text)
+            span.set_attribute("rag.chunks", len(pieces))
+        return pieces
+    
+    def _split_with_vectors(self, text: str) -> List[Tuple[str, Optional[Any]]]:
+        """Split text into (chunk, vector) pairs; only semantic chunking produces vectors"""
+        if self.chunking_mode == "semantic":
+            return self.text_splitter.split(text)
+        return [(chunk, None) for chunk in self.text_splitter.split_text(text)]
+    
+    @staticmethod
+    def _make_chunk(content: str, metadata: Dict[str, Any], vector=None) -> Dict[str, Any]:
+        chunk = {"content": content, "metadata": metadata}
+        if vector is not None:
+            chunk["embedding"] = vector  # Reused by the pipeline instead of re-encoding
+        return chunk
+    
+    def _get_loader(self, file_path: str):
+        """Validate the file and return the matching LangChain loader"""
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
         
         file_extension = os.path.splitext(file_path)[1].lower()
         
         if file_extension == '.pdf':
-            loader = PyPDFLoader(file_path)
+            return PyPDFLoader(file_path)
         elif file_extension in ['.txt', '.md']:
-            loader = TextLoader(file_path)
+            return TextLoader(file_path)
         else:
             raise ValueError(f"Unsupported file format: {file_extension}")
+    
+    def load_document(self, file_path: str) -> List[Document]:
+        """Load a document from file path"""
+        return list(self.iter_pages(file_path))
+    
+    def iter_pages(self, file_path: str) -> Iterator[Document]:
+        """Lazily yield the pages of a document (text files yield a single page)"""
+        loader = self._get_loader(file_path)
+        
+        if isinstance(loader, PyPDFLoader) and Config.PDF_PARALLEL_WORKERS > 1:
+            from pypdf import PdfReader
+            total_pages = len(PdfReader(file_path).pages)
+            if total_pages >= Config.PDF_PARALLEL_MIN_PAGES:
+                yield from self._iter_pdf_pages_parallel(file_path, total_pages)
+                return
         
-        return loader.load()
+        yield from loader.lazy_load()
     
-    def process_document(self, file_path: str) -> List[Dict[str, Any]]:
-        """Load and split a document into chunks"""
-        documents = self.load_document(file_path)
-        chunks = self.text_splitter.split_documents(documents)
+    def iter_pages_from_bytes(self, name: str, data: FileData) -> Iterator[Document]:
+        """Lazily yield the pages of an in-memory document; name only selects the format and labels the source"""
+        file_extension = os.path.splitext(name)[1].lower()
         
-        processed_chunks = []
-        for i, chunk in enumerate(chunks):
-            processed_chunks.append({
-                "content": chunk.page_content,
-                "metadata": {
-                    **chunk.metadata,
+        if file_extension == '.pdf':
+            from pypdf import PdfReader
+            if Config.PDF_PARALLEL_WORKERS > 1:
+                data = _as_bytes(data)  # Worker processes are sent the bytes
+            reader = PdfReader(data if hasattr(data, "read") else io.BytesIO(data))
+            total_pages = len(reader.pages)
+            if Config.PDF_PARALLEL_WORKERS > 1 and total_pages >= Config.PDF_PARALLEL_MIN_PAGES:
+                yield from self._iter_pdf_pages_parallel(data, total_pages, source=name)
+                return
+            
+            labels = reader.page_labels
+            for page_number, page in enumerate(reader.pages):
+                yield Document(
+                    page_content=page.extract_text() or "",
+                    metadata={
+                        "source": name,
+                        "total_pages": total_pages,
+                        "page": page_number,
+                        "page_label": labels[page_number],
+                    }
+                )
+        elif file_extension in ['.txt', '.md']:
+            yield Document(page_content=_as_bytes(data).decode("utf-8"), metadata={"source": name})
+        else:
+            raise ValueError(f"Unsupported file format: {file_extension}")
+    
+    def _iter_pdf_pages_parallel(self, file_path: Union[str, bytes], total_pages: int, source: Optional[str] = None) -> Iterator[Document]:
+        """Extract PDF pages in worker processes, yielding them in page order.
+        
+        file_path may also be the PDF's bytes, in which case source names it.
+        At most two page ranges per worker are in flight, so memory stays bounded
+        no matter how large the PDF is.
+        """
+        pages_per_task = max(1, Config.PDF_PAGES_PER_TASK)
+        ranges = deque(
+            (start, min(start + pages_per_task, total_pages))
+            for start in range(0, total_pages, pages_per_task)
+        )
+        max_in_flight = Config.PDF_PARALLEL_WORKERS * 2
+        
+        # Spawn rather than fork: the parent may already hold torch/Milvus state
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=Config.PDF_PARALLEL_WORKERS, mp_context=context) as executor:
+            in_flight = deque()
+            while ranges or in_flight:
+                while ranges and len(in_flight) < max_in_flight:
+                    start, end = ranges.popleft()
+                    in_flight.append(executor.submit(_extract_pdf_pages, file_path, start, end))
+                
+                for page_number, text, page_label in in_flight.popleft().result():
+                    yield Document(
+                        page_content=text,
+                        metadata={
+                            "source": source or file_path,
+                            "total_pages": total_pages,
+                            "page": page_number,
+                            "page_label": page_label,
+                        }
+                    )
+    
+    def iter_document_chunks(self, file_path: str, progress: Optional[ProgressCallback] = None) -> Iterator[Dict[str, Any]]:
+        """Lazily load and split a document, yielding chunks page by page.
+        
+        Chunk ids are numbered continuously across pages, so they match the ids
+        produced by process_document. The total chunk count is not known while
+        streaming, so streamed chunks carry no "total_chunks" metadata.
+        """
+        return self._iter_page_chunks(self.iter_pages(file_path), file_path, progress)
+    
+    def iter_bytes_chunks(self, name: str, data: FileData, progress: Optional[ProgressCallback] = None) -> Iterator[Dict[str, Any]]:
+        """Like iter_document_chunks, for a document held in memory (e.g. an upload)"""
+        return self._iter_page_chunks(self.iter_pages_from_bytes(name, data), name, progress)
+    
+    def _iter_page_chunks(self, pages: Iterable[Document], file_path: str, progress: Optional[ProgressCallback]) -> Iterator[Dict[str, Any]]:
+        chunk_id = 0
+        pages = iter(pages)
+        while True:
+            started = time.perf_counter()
+            page = next(pages, None)
+            if page is None:
+                break
+            parsed = time.perf_counter()
+            if progress:
+                progress("parsed", 1)
+            pieces = self._traced_split(page.page_content, os.path.basename(file_path))
+            if self.metrics is not None:
+                self.metrics.record("ingest_parse", parsed - started)
+                self.metrics.record("ingest_chunk", time.perf_counter() - parsed)
+            if progress:
+                progress("chunked", len(pieces))
+            for text, vector in pieces:
+                yield self._make_chunk(text, {
+                    **page.metadata,
                     "source_file": file_path,
                     "source": os.path.basename(file_path),  # Add filename as source
-                    "chunk_id": i,
-                    "total_chunks": len(chunks)  # Add total chunk count
-                }
-            })
+                    "chunk_id": chunk_id,
+                }, vector)
+                chunk_id += 1
+    
+    def process_document(self, file_path: str) -> List[Dict[str, Any]]:
+        """Load and split a document into chunks"""
+        processed_chunks = list(self.iter_document_chunks(file_path))
+        
+        for chunk in processed_chunks:
+            chunk["metadata"]["total_chunks"] = len(processed_chunks)  # Add total chunk count
         
         return processed_chunks
     
@@ -55,29 +245,24 @@ class DocumentProcessor:
         if metadata is None:
             metadata = {}
         
-        document = Document(page_content=text, metadata=metadata)
-        chunks = self.text_splitter.split_documents([document])
+        chunks = self._traced_split(text, metadata.get("source", "Custom Text"))
         
         processed_chunks = []
-        for i, chunk in enumerate(chunks):
-            processed_chunks.append({
-                "content": chunk.page_content,
-                "metadata": {
-                    **chunk.metadata,
-                    "chunk_id": i,
-                    "total_chunks": len(chunks),  # Add total chunk count
-                    "source": metadata.get('source', f"Custom Text {i+1}") if metadata else f"Custom Text {i+1}"
-                }
-            })
+        for i, (chunk, vector) in enumerate(chunks):
+            processed_chunks.append(self._make_chunk(chunk, {
+                **metadata,
+                "chunk_id": i,
+                "total_chunks": len(chunks),  # Add total chunk count
+                "source": metadata.get('source', f"Custom Text {i+1}") if metadata else f"Custom Text {i+1}"
+            }, vector))
         
         return processed_chunks
     
-    def process_directory(self, directory_path: str) -> List[Dict[str, Any]]:
-        """Process all supported documents in a directory"""
+    def iter_directory_files(self, directory_path: str) -> Iterator[str]:
+        """Yield the paths of all supported documents in a directory"""
         if not os.path.exists(directory_path):
             raise FileNotFoundError(f"Directory not found: {directory_path}")
         
-        all_chunks = []
         supported_extensions = ['.pdf', '.txt', '.md']
         
         for filename in os.listdir(directory_path):
@@ -85,11 +270,19 @@ class DocumentProcessor:
             if os.path.isfile(file_path):
                 file_extension = os.path.splitext(filename)[1].lower()
                 if file_extension in supported_extensions:
-                    try:
-                        chunks = self.process_document(file_path)
-                        all_chunks.extend(chunks)
-                        print(f"Processed {filename}: {len(chunks)} chunks")
-                    except Exception as e:
-                        print(f"Error processing {filename}: {e}")
+                    yield file_path
+    
+    def process_directory(self, directory_path: str) -> List[Dict[str, Any]]:
+        """Process all supported documents in a directory"""
+        all_chunks = []
+        
+        for file_path in self.iter_directory_files(directory_path):
+            filename = os.path.basename(file_path)
+            try:
+                chunks = self.process_document(file_path)
+                all_chunks.extend(chunks)
+                print(f"Processed {filename}: {len(chunks)} chunks")
+            except Exception as e:
+                print(f"Error processing {filename}: {e}")
         
         return all_chunks
\ No newline at end of file
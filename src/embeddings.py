@@ -1,7 +1,21 @@
 from sentence_transformers import SentenceTransformer
-from typing import List, Optional
+from typing import List, Dict, Optional
+import threading
 import numpy as np
 from config import Config
+from src import telemetry
+
+# Loaded models, shared by every EmbeddingModel in the process
+_MODELS: Dict[str, SentenceTransformer] = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def load_sentence_transformer(model_name: str) -> SentenceTransformer:
+    """Load a model once per process; later calls return the same instance"""
+    with _MODELS_LOCK:
+        if model_name not in _MODELS:
+            _MODELS[model_name] = SentenceTransformer(model_name)
+        return _MODELS[model_name]
 
 
 class EmbeddingModel:
@@ -9,22 +23,48 @@ class EmbeddingModel:
         if model_name is None:
             model_name = Config.EMBEDDING_MODEL
         
-        self.model = SentenceTransformer(model_name)
+        self.model = load_sentence_transformer(model_name)
         self.model_name = model_name
     
     def encode(self, texts: List[str]) -> np.ndarray:
         """Encode texts into embeddings"""
-        embeddings = self.model.encode(
-            texts,
-            batch_size=32,
-            show_progress_bar=False,
-            convert_to_numpy=True
-        )
+        with telemetry.span("embedding.encode", {"embedding.model": self.model_name, "embedding.batch_size": len(texts)}):
+            embeddings = self.model.encode(
+                texts,
+                batch_size=32,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            )
+        telemetry.add("embedded_texts", len(texts))
         return embeddings
     
     def encode_single(self, text: str) -> np.ndarray:
         """Encode a single text into embedding"""
-        return self.model.encode(text, convert_to_numpy=True)
+        with telemetry.span("embedding.encode", {"embedding.model": self.model_name, "embedding.batch_size": 1}):
+            embedding = self.model.encode(text, convert_to_numpy=True)
+        telemetry.add("embedded_texts", 1)
+        return embedding
+    
+    @property
+    def tokenizer(self):
+        """The model's (fast) HuggingFace tokenizer"""
+        return self.model.tokenizer
+    
+    @property
+    def max_seq_length(self) -> int:
+        """Maximum number of tokens the model embeds; longer inputs are truncated"""
+        return int(self.model.max_seq_length)
+    
+    def get_token_budget(self) -> int:
+        """Tokens available for text once the model's special tokens are added"""
+        return self.max_seq_length - self.tokenizer.num_special_tokens_to_add(pair=False)
+    
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Count model tokens (including special tokens) for many texts in one batched call"""
+        if not texts:
+            return []
+        encoding = self.tokenizer(texts, add_special_tokens=True, verbose=False)
+        return [len(ids) for ids in encoding["input_ids"]]
     
     def get_embedding_dimension(self) -> int:
         """Get the dimension of the embeddings"""
@@ -0,0 +1,195 @@
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import copy
+import logging
+import os
+import threading
+import time
+import uuid
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Progress stages, in pipeline order, and the per-file counter each one advances
+STAGE_COUNTERS = {
+    "parsed": "pages",
+    "chunked": "chunks",
+    "embedded": "embedded",
+    "inserted": "inserted",
+    # A failed file's inserted chunks were deleted again
+    "rolled_back": "rolled_back"
+}
+
+
+class IngestJobQueue:
+    """Ingests files on worker threads and tracks per-file progress by job id.
+    
+    A job is a list of files; the files of all jobs share INGEST_WORKERS
+    threads, so a multi-file upload is ingested in parallel. Workers share
+    the pipeline's embedding model and Milvus client. Jobs outlive the
+    request that submitted them and are polled with get(); the most recent
+    INGEST_JOB_HISTORY jobs are kept. Collection resets run on the same
+    workers as "reset" jobs, which carry a result instead of files.
+    """
+    
+    def __init__(self, pipeline, workers: Optional[int] = None, history: Optional[int] = None):
+        self.pipeline = pipeline
+        self.workers = workers or Config.INGEST_WORKERS
+        self.history = history or Config.INGEST_JOB_HISTORY
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rag-ingest")
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def submit_files(self, file_paths: List[str], names: Optional[List[str]] = None, cleanup: bool = False) -> str:
+        """Queue files for ingestion and return the job id; cleanup deletes each file once ingested"""
+        names = names or [os.path.basename(path) for path in file_paths]
+        return self._submit(names, [partial(self._ingest_file, path, cleanup) for path in file_paths])
+    
+    def submit_uploads(self, uploads: List[Tuple[str, Any]]) -> str:
+        """Queue in-memory files as (name, bytes or binary file object) and return the job id"""
+        return self._submit(
+            [name for name, _ in uploads],
+            [partial(self.pipeline.ingest_bytes, name, data) for name, data in uploads]
+        )
+    
+    def submit_reset(self, mode: str = "truncate") -> str:
+        """Queue an in-process reset of the collection (see RAGPipeline.reset) and return the job id"""
+        job = self._new_job("reset", [])
+        self._executor.submit(self._run_reset, job, mode)
+        return job["id"]
+    
+    def _submit(self, names: List[str], tasks: List[Callable[..., int]]) -> str:
+        job = self._new_job("ingest", names)
+        for index, ingest in enumerate(tasks):
+            self._executor.submit(self._run_file, job, index, ingest)
+        return job["id"]
+    
+    def _new_job(self, kind: str, names: List[str]) -> Dict[str, Any]:
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": QUEUED,
+            "created": time.time(),
+            "finished": None,
+            "files": [self._new_file(name) for name in names],
+            "result": None,
+            "error": None
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._trim()
+        return job
+    
+    @staticmethod
+    def _new_file(name: str) -> Dict[str, Any]:
+        return {
+            "name": name,
+            "status": QUEUED,
+            "stage": None,
+            "pages": 0,
+            "chunks": 0,
+            "embedded": 0,
+            "inserted": 0,
+            "rolled_back": 0,
+            "error": None,
+            "seconds": None
+        }
+    
+    def _trim(self):
+        """Forget the oldest finished jobs beyond the history limit (call with the lock held)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in (DONE, FAILED)]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+    
+    def _progress(self, job: Dict[str, Any], index: int):
+        def progress(stage: str, count: int):
+            with self._lock:
+                entry = job["files"][index]
+                entry["stage"] = stage
+                entry[STAGE_COUNTERS[stage]] += count
+                if stage == "rolled_back":
+                    entry["inserted"] -= count
+        
+        return progress
+    
+    def _ingest_file(self, path: str, cleanup: bool, progress=None) -> int:
+        try:
+            return self.pipeline.ingest_document(path, progress=progress)
+        finally:
+            if cleanup and os.path.exists(path):
+                os.remove(path)
+    
+    def _run_file(self, job: Dict[str, Any], index: int, ingest: Callable[..., int]):
+        entry = job["files"][index]
+        with self._lock:
+            entry["status"] = RUNNING
+            job["status"] = RUNNING
+        started = time.perf_counter()
+        try:
+            ingest(progress=self._progress(job, index))
+            status, error = DONE, None
+        except Exception as e:
+            status, error = FAILED, str(e)
+        
+        with self._lock:
+            if status == FAILED:
+                error = self._failure_message(entry, error)
+                logger.error("Ingest of %s failed: %s", entry["name"], error)
+            entry["status"] = status
+            entry["error"] = error
+            entry["seconds"] = round(time.perf_counter() - started, 3)
+            statuses = [file["status"] for file in job["files"]]
+            if all(s in (DONE, FAILED) for s in statuses):
+                # A job fails only if none of its files made it in
+                job["status"] = DONE if DONE in statuses else FAILED
+                job["finished"] = time.time()
+    
+    @staticmethod
+    def _failure_message(entry: Dict[str, Any], error: str) -> str:
+        """The error plus what happened to the chunks inserted before it (call with the lock held)"""
+        if entry["inserted"]:
+            return f"{error} ({entry['inserted']} inserted chunks could not be rolled back)"
+        if entry["rolled_back"]:
+            return f"{error} (rolled back {entry['rolled_back']} inserted chunks)"
+        return error
+    
+    def _run_reset(self, job: Dict[str, Any], mode: str):
+        with self._lock:
+            job["status"] = RUNNING
+        try:
+            result, status, error = self.pipeline.reset(mode), DONE, None
+        except Exception as e:
+            logger.error("Reset of the collection failed: %s", e)
+            result, status, error = None, FAILED, str(e)
+        with self._lock:
+            job["status"] = status
+            job["result"] = result
+            job["error"] = error
+            job["finished"] = time.time()
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job's state, or None for unknown (or forgotten) ids"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job is not None else None
+    
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Snapshots of all remembered jobs, oldest first"""
+        with self._lock:
+            return copy.deepcopy(list(self._jobs.values()))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Worker count and jobs by status"""
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            **{status: statuses.count(status) for status in (QUEUED, RUNNING, DONE, FAILED)}
+        }
+    
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
\ No newline at end of file
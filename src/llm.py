@@ -1,23 +1,55 @@
-from groq import Groq
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, AsyncIterator, Optional, Tuple
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager, nullcontext
 from config import Config
+from src.admission import OverloadedError, StageLimiter
+from src.context_builder import ContextBuilder, TokenCounter, estimate_tokens
+from src.llm_resilience import ResilientCaller
+from src.rate_limiter import LLMRateLimiter
+from src.llm_backends import LLMBackend, create_backend
+from src import telemetry
+
+# Bump whenever _build_prompt changes, so cached answers built from the old prompt are not reused
+PROMPT_TEMPLATE_VERSION = "2"
 
 
 class LLMProvider:
-    def __init__(self, provider: str = None):
+    def __init__(
+        self,
+        provider: str = None,
+        token_counter: Optional[TokenCounter] = None,
+        backend: Optional[LLMBackend] = None,
+    ):
         if provider is None:
-            provider = Config.LLM_PROVIDER
+            provider = backend.provider if backend is not None else Config.LLM_PROVIDER
         
         self.provider = provider
-        
-        if provider == "groq":
-            self.model = Config.GROQ_MODEL
-            self.client = Groq(api_key=Config.GROQ_API_KEY)
+        self.backend = backend or create_backend(provider)
+        self.model = self.backend.model
+        self.context_builder = ContextBuilder(token_counter)
+        self.resilience = ResilientCaller()
+        if self.backend.type == "local":
+            # The stub has no quota to protect, so it runs at full throughput
+            self.rate_limiter = LLMRateLimiter(rpm=0, tpm=0)
         else:
-            raise ValueError(f"Unsupported LLM provider: {provider}. Only 'groq' is supported.")
+            rpm = self.backend.rpm_limit if Config.LLM_RPM_LIMIT is None else Config.LLM_RPM_LIMIT
+            self.rate_limiter = LLMRateLimiter(rpm=rpm)
+        # Concurrency cap (RAGPipeline sets its "llm" admission stage); a slot is taken only
+        # once rate-limit capacity is granted, so requests waiting on the quota hold none
+        self.stage_limiter: Optional[StageLimiter] = None
+    
+    def build_prompt(self, prompt: str, context: List[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """Combine the question with as much context as fits CONTEXT_TOKEN_BUDGET.
+        
+        Returns the prompt and a usage report with its token count. The prompt
+        can be passed to the generate_* methods without context.
+        """
+        context, usage = self.context_builder.build(context or [])
+        full_prompt = self._build_prompt(prompt, context)
+        usage["prompt_tokens"] = self.context_builder.count_tokens([full_prompt])[0]
+        return full_prompt, usage
     
-    def generate_response(self, prompt: str, context: List[str] = None) -> str:
-        """Generate a response from the LLM"""
+    def _build_prompt(self, prompt: str, context: List[str] = None) -> str:
+        """Combine the question with its retrieved context"""
         if context:
             context_str = "\n".join(context)
             full_prompt = f"""Context:
@@ -29,25 +61,156 @@ Answer based on the context provided above. If the context doesn't contain enoug
         else:
             full_prompt = prompt
         
-        return self._generate_groq(full_prompt)
-    
-    def _generate_groq(self, prompt: str) -> str:
-        """Generate response using Groq"""
-        chat_completion = self.client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model=self.model,
-        )
-        return chat_completion.choices[0].message.content
+        return full_prompt
+    
+    def _prompt_text(self, prompt: str, context: Optional[List[str]]) -> str:
+        """Prompt to send; a prompt already built by build_prompt passes through untouched"""
+        return self.build_prompt(prompt, context)[0] if context else prompt
+    
+    def generate_response(self, prompt: str, context: List[str] = None, priority: str = "interactive") -> str:
+        """Generate a response from the LLM.
+    
+        priority ("interactive" or "batch") orders the request in the rate
+        limiter queue when RPM/TPM capacity is exhausted.
+        """
+        return self._generate(self._prompt_text(prompt, context), priority)
+    
+    def generate_response_stream(self, prompt: str, context: List[str] = None, priority: str = "interactive") -> Iterator[str]:
+        """Generate a response from the LLM, yielding tokens as they arrive.
+        
+        The request holds its concurrency slot until the generator is exhausted
+        or closed; stream_response releases it when its block exits.
+        """
+        with self.stream_response(prompt, context, priority) as tokens:
+            yield from tokens
+    
+    @contextmanager
+    def stream_response(self, prompt: str, context: List[str] = None, priority: str = "interactive") -> Iterator[Iterator[str]]:
+        """Open a response stream for the with block; leaving the block closes it and frees its slot.
+        
+        Rate-limit capacity is acquired before the concurrency slot, so a
+        request waiting on the quota does not hold a slot.
+        """
+        prompt = self._prompt_text(prompt, context)
+        estimated_tokens = self._estimate_request_tokens(prompt)
+        with ExitStack() as stack:
+            # The span covers opening the stream; it must not stay current while the caller consumes it
+            with telemetry.span("llm.open_stream", self._span_attributes(priority, estimated_tokens)):
+                self.rate_limiter.acquire(estimated_tokens, priority)
+                stack.enter_context(self._slot())
+                # Only opening the stream is retried; tokens already yielded cannot be taken back
+                tokens = self.resilience.call(lambda timeout: self.backend.open_stream(prompt, timeout), hedge=False)
+            stack.callback(tokens.close)
+            yield tokens
+    
+    async def agenerate_response(self, prompt: str, context: List[str] = None, priority: str = "interactive") -> str:
+        """Async variant of generate_response"""
+        return await self._agenerate(self._prompt_text(prompt, context), priority)
+    
+    async def agenerate_response_stream(self, prompt: str, context: List[str] = None, priority: str = "interactive") -> AsyncIterator[str]:
+        """Async variant of generate_response_stream"""
+        async with self.astream_response(prompt, context, priority) as tokens:
+            async for token in tokens:
+                yield token
+    
+    @asynccontextmanager
+    async def astream_response(self, prompt: str, context: List[str] = None, priority: str = "interactive") -> AsyncIterator[AsyncIterator[str]]:
+        """Async variant of stream_response"""
+        prompt = self._prompt_text(prompt, context)
+        estimated_tokens = self._estimate_request_tokens(prompt)
+        async with AsyncExitStack() as stack:
+            with telemetry.span("llm.open_stream", self._span_attributes(priority, estimated_tokens)):
+                await self.rate_limiter.aacquire(estimated_tokens, priority)
+                await stack.enter_async_context(self._aslot())
+                tokens = await self.resilience.acall(lambda timeout: self.backend.aopen_stream(prompt, timeout), hedge=False)
+            stack.push_async_callback(tokens.aclose)
+            yield tokens
+    
+    @staticmethod
+    def _estimate_request_tokens(prompt: str) -> int:
+        """Tokens a request is charged against TPM before its real usage is known"""
+        return estimate_tokens([prompt])[0] + Config.LLM_EXPECTED_COMPLETION_TOKENS
+    
+    def get_queue_status(self, priority: str = "interactive") -> Dict[str, Any]:
+        """Requests waiting for rate-limit capacity and the expected wait of a new request"""
+        stats = self.rate_limiter.get_stats()
+        return {
+            "queue_depth": stats["queue_depth"],
+            "expected_wait": self.rate_limiter.expected_wait(Config.LLM_EXPECTED_COMPLETION_TOKENS, priority)
+        }
+    
+    def check_capacity(self, priority: str = "interactive"):
+        """Raise OverloadedError if a new request would be refused a slot or outwait the rate-limit queue.
+        
+        Lets a streaming caller fail with a status code before its response has started.
+        """
+        if self.stage_limiter is not None:
+            self.stage_limiter.check()
+        wait = self.rate_limiter.expected_wait(Config.LLM_EXPECTED_COMPLETION_TOKENS, priority)
+        if wait > self.rate_limiter.max_wait:
+            raise OverloadedError("llm", f"LLM rate limit is saturated: expected wait {wait:.0f}s", retry_after=wait)
+    
+    def _span_attributes(self, priority: str, estimated_tokens: int) -> Dict[str, Any]:
+        return {
+            "llm.provider": self.provider,
+            "llm.model": self.model,
+            "llm.priority": priority,
+            "llm.estimated_tokens": estimated_tokens
+        }
+    
+    def _record_usage(self, span, total_tokens: Optional[int]):
+        if total_tokens:
+            span.set_attribute("llm.total_tokens", total_tokens)
+            telemetry.add("llm_tokens", total_tokens, {"llm.model": self.model})
+    
+    def _slot(self):
+        return self.stage_limiter.slot() if self.stage_limiter is not None else nullcontext()
+    
+    def _aslot(self):
+        return self.stage_limiter.aslot() if self.stage_limiter is not None else nullcontext()
+    
+    def _generate(self, prompt: str, priority: str = "interactive") -> str:
+        """Generate a complete response through the rate limiter, concurrency slot and retry policy"""
+        estimated_tokens = self._estimate_request_tokens(prompt)
+        with telemetry.span("llm.generate", self._span_attributes(priority, estimated_tokens)) as span:
+            self.rate_limiter.acquire(estimated_tokens, priority)
+            with self._slot():
+                answer, total_tokens = self.resilience.call(
+                    lambda timeout: self.backend.complete(prompt, timeout),
+                    # A hedge is a second billed request; send it only if the quota has room now
+                    hedge_permit=lambda: self.rate_limiter.try_acquire(estimated_tokens)
+                )
+            self._record_usage(span, total_tokens)
+        if total_tokens:
+            self.rate_limiter.adjust(estimated_tokens, total_tokens)
+        return answer
+    
+    async def _agenerate(self, prompt: str, priority: str = "interactive") -> str:
+        """Async variant of _generate"""
+        estimated_tokens = self._estimate_request_tokens(prompt)
+        with telemetry.span("llm.generate", self._span_attributes(priority, estimated_tokens)) as span:
+            await self.rate_limiter.aacquire(estimated_tokens, priority)
+            async with self._aslot():
+                answer, total_tokens = await self.resilience.acall(
+                    lambda timeout: self.backend.acomplete(prompt, timeout),
+                    hedge_permit=lambda: self.rate_limiter.try_acquire(estimated_tokens)
+                )
+            self._record_usage(span, total_tokens)
+        if total_tokens:
+            self.rate_limiter.adjust(estimated_tokens, total_tokens)
+        return answer
+    
+    def close(self):
+        """Release the hedge threads"""
+        self.resilience.close()
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the current model"""
         return {
             "provider": self.provider,
             "model": self.model,
-            "type": "api"
+            "type": self.backend.type,
+            "context_token_budget": self.context_builder.max_tokens,
+            "requests": self.resilience.get_stats(),
+            "rate_limiter": self.rate_limiter.get_stats()
         }
\ No newline at end of file
@@ -0,0 +1,318 @@
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Tuple
+import asyncio
+import hashlib
+import json
+import time
+import httpx
+from groq import Groq, AsyncGroq
+from config import Config
+from src.context_builder import estimate_tokens
+
+# (answer text, total tokens reported by the server or None)
+Completion = Tuple[str, Optional[int]]
+
+
+class LLMBackendError(Exception):
+    """Non-success HTTP response from an LLM server"""
+    
+    def __init__(self, status_code: int, message: str, response=None):
+        super().__init__(f"LLM server returned {status_code}: {message}")
+        self.status_code = status_code
+        self.response = response
+
+
+class LLMBackend:
+    """Interface of the chat completion backends used by LLMProvider.
+    
+    Every method takes the complete prompt and the timeout of one attempt.
+    The open_stream methods connect before returning, so connection errors
+    surface while the caller can still retry, and return a generator whose
+    close() (aclose()) releases the connection.
+    """
+    
+    provider = ""
+    type = "api"
+    # Client-side requests per minute unless LLM_RPM_LIMIT is set; self-hosted servers are not throttled
+    rpm_limit = 0.0
+    
+    def __init__(self, model: str):
+        self.model = model
+    
+    def complete(self, prompt: str, timeout: float) -> Completion:
+        raise NotImplementedError
+    
+    def open_stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        raise NotImplementedError
+    
+    async def acomplete(self, prompt: str, timeout: float) -> Completion:
+        raise NotImplementedError
+    
+    async def aopen_stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        raise NotImplementedError
+    
+    @staticmethod
+    def _messages(prompt: str) -> List[Dict[str, str]]:
+        return [
+            {
+                "role": "user",
+                "content": prompt,
+            }
+        ]
+
+
+class GroqBackend(LLMBackend):
+    """Groq cloud API"""
+    
+    provider = "groq"
+    rpm_limit = 30.0  # Groq's free-tier quota
+    
+    def __init__(self, model: Optional[str] = None):
+        super().__init__(model or Config.GROQ_MODEL)
+        # Retries are handled by LLMProvider.resilience, so the SDK's own retry loop is disabled
+        self.client = Groq(api_key=Config.GROQ_API_KEY, max_retries=0)
+        self.async_client = AsyncGroq(api_key=Config.GROQ_API_KEY, max_retries=0)
+    
+    @staticmethod
+    def _completion(chat_completion) -> Completion:
+        usage = getattr(chat_completion, "usage", None)
+        return chat_completion.choices[0].message.content, getattr(usage, "total_tokens", None)
+    
+    def complete(self, prompt: str, timeout: float) -> Completion:
+        chat_completion = self.client.chat.completions.create(
+            messages=self._messages(prompt),
+            model=self.model,
+            timeout=timeout,
+        )
+        return self._completion(chat_completion)
+    
+    def open_stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        stream = self.client.chat.completions.create(
+            messages=self._messages(prompt),
+            model=self.model,
+            stream=True,
+            timeout=timeout,
+        )
+        
+        def tokens():
+            try:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                # Closing early must end the HTTP response, or Groq keeps generating billed tokens
+                stream.close()
+        
+        return tokens()
+    
+    async def acomplete(self, prompt: str, timeout: float) -> Completion:
+        chat_completion = await self.async_client.chat.completions.create(
+            messages=self._messages(prompt),
+            model=self.model,
+            timeout=timeout,
+        )
+        return self._completion(chat_completion)
+    
+    async def aopen_stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        stream = await self.async_client.chat.completions.create(
+            messages=self._messages(prompt),
+            model=self.model,
+            stream=True,
+            timeout=timeout,
+        )
+        
+        async def tokens():
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+        
+        return tokens()
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Any server implementing the OpenAI /chat/completions API (Ollama, vLLM, llama.cpp server)"""
+    
+    provider = "openai"
+    
+    def __init__(self, model: Optional[str] = None, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        super().__init__(model or Config.OPENAI_COMPAT_MODEL)
+        self.base_url = (base_url or Config.OPENAI_COMPAT_BASE_URL).rstrip("/")
+        api_key = api_key or Config.OPENAI_COMPAT_API_KEY
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.Client(base_url=self.base_url, headers=headers)
+        self.async_client = httpx.AsyncClient(base_url=self.base_url, headers=headers)
+    
+    def _payload(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        return {"model": self.model, "messages": self._messages(prompt), "stream": stream}
+    
+    def _check(self, response):
+        if response.status_code >= 400:
+            raise LLMBackendError(response.status_code, response.text[:200], response)
+    
+    def _translate(self, error: Exception) -> Exception:
+        """Map httpx errors onto the builtin types the retry policy understands"""
+        if isinstance(error, httpx.TimeoutException):
+            return TimeoutError(str(error) or "LLM request timed out")
+        if isinstance(error, httpx.TransportError):
+            return ConnectionError(str(error))
+        return error
+    
+    @staticmethod
+    def _completion(body: Dict[str, Any]) -> Completion:
+        return body["choices"][0]["message"]["content"], (body.get("usage") or {}).get("total_tokens")
+    
+    @staticmethod
+    def _parse_sse(line: str) -> Optional[str]:
+        """Token carried by one server-sent event line, if any"""
+        if not line.startswith("data:"):
+            return None
+        data = line[len("data:"):].strip()
+        if not data or data == "[DONE]":
+            return None
+        choices = json.loads(data).get("choices") or []
+        return (choices[0].get("delta") or {}).get("content") if choices else None
+    
+    def complete(self, prompt: str, timeout: float) -> Completion:
+        try:
+            response = self.client.post("/chat/completions", json=self._payload(prompt, False), timeout=timeout)
+        except httpx.HTTPError as e:
+            raise self._translate(e) from e
+        self._check(response)
+        return self._completion(response.json())
+    
+    def open_stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        request = self.client.build_request(
+            "POST", "/chat/completions", json=self._payload(prompt, True), timeout=timeout
+        )
+        try:
+            response = self.client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            raise self._translate(e) from e
+        if response.status_code >= 400:
+            response.read()
+            response.close()
+            self._check(response)
+        
+        def tokens():
+            try:
+                for line in response.iter_lines():
+                    token = self._parse_sse(line)
+                    if token:
+                        yield token
+            finally:
+                response.close()
+        
+        return tokens()
+    
+    async def acomplete(self, prompt: str, timeout: float) -> Completion:
+        try:
+            response = await self.async_client.post(
+                "/chat/completions", json=self._payload(prompt, False), timeout=timeout
+            )
+        except httpx.HTTPError as e:
+            raise self._translate(e) from e
+        self._check(response)
+        return self._completion(response.json())
+    
+    async def aopen_stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        request = self.async_client.build_request(
+            "POST", "/chat/completions", json=self._payload(prompt, True), timeout=timeout
+        )
+        try:
+            response = await self.async_client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            raise self._translate(e) from e
+        if response.status_code >= 400:
+            await response.aread()
+            await response.aclose()
+            self._check(response)
+        
+        async def tokens():
+            try:
+                async for line in response.aiter_lines():
+                    token = self._parse_sse(line)
+                    if token:
+                        yield token
+            finally:
+                await response.aclose()
+        
+        return tokens()
+
+
+class StubBackend(LLMBackend):
+    """Deterministic offline backend for load tests and benchmarks.
+    
+    The answer is built from the prompt alone, so identical prompts always get
+    identical answers. STUB_LLM_LATENCY seconds pass before the first token
+    and STUB_LLM_TOKEN_DELAY seconds between tokens.
+    """
+    
+    provider = "stub"
+    type = "local"
+    
+    def __init__(self, latency: Optional[float] = None, token_delay: Optional[float] = None, answer_words: Optional[int] = None):
+        super().__init__("stub")
+        self.latency = Config.STUB_LLM_LATENCY if latency is None else latency
+        self.token_delay = Config.STUB_LLM_TOKEN_DELAY if token_delay is None else token_delay
+        self.answer_words = answer_words or Config.STUB_LLM_ANSWER_WORDS
+    
+    def _tokens(self, prompt: str) -> List[str]:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        # Echo the start of the context, like an extractive answer would
+        context = prompt.split("Context:", 1)[-1].split("\n\nQuestion:", 1)[0].split()[:self.answer_words]
+        words = [f"[stub:{digest}]"] + context
+        return [word + " " for word in words[:-1]] + words[-1:]
+    
+    def _completion(self, prompt: str, tokens: List[str]) -> Completion:
+        return "".join(tokens), estimate_tokens([prompt])[0] + len(tokens)
+    
+    def complete(self, prompt: str, timeout: float) -> Completion:
+        tokens = self._tokens(prompt)
+        time.sleep(self.latency + self.token_delay * len(tokens))
+        return self._completion(prompt, tokens)
+    
+    def open_stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        tokens = self._tokens(prompt)
+        
+        def stream():
+            time.sleep(self.latency)
+            for i, token in enumerate(tokens):
+                if i and self.token_delay:
+                    time.sleep(self.token_delay)
+                yield token
+        
+        return stream()
+    
+    async def acomplete(self, prompt: str, timeout: float) -> Completion:
+        tokens = self._tokens(prompt)
+        await asyncio.sleep(self.latency + self.token_delay * len(tokens))
+        return self._completion(prompt, tokens)
+    
+    async def aopen_stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        tokens = self._tokens(prompt)
+        
+        async def stream():
+            await asyncio.sleep(self.latency)
+            for i, token in enumerate(tokens):
+                if i and self.token_delay:
+                    await asyncio.sleep(self.token_delay)
+                yield token
+        
+        return stream()
+
+
+def create_backend(provider: Optional[str] = None) -> LLMBackend:
+    """Build the backend selected by LLM_PROVIDER"""
+    provider = (provider or Config.LLM_PROVIDER).lower()
+    if provider == "groq":
+        return GroqBackend()
+    elif provider == "openai":
+        return OpenAICompatibleBackend()
+    elif provider == "ollama":
+        return OpenAICompatibleBackend(model=Config.OLLAMA_MODEL, base_url=Config.OLLAMA_BASE_URL)
+    elif provider == "stub":
+        return StubBackend()
+    else:
+        raise ValueError(f"Unsupported LLM provider: {provider}. Use 'groq', 'openai', 'ollama' or 'stub'.")
\ No newline at end of file
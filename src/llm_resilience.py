@@ -0,0 +1,297 @@
+from typing import Dict, Any, Optional, Callable, Awaitable, TypeVar
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+import asyncio
+import threading
+import time
+import numpy as np
+from tenacity import (
+    Retrying,
+    AsyncRetrying,
+    RetryCallState,
+    retry_if_exception,
+    stop_after_attempt,
+    stop_after_delay,
+    wait_random_exponential,
+)
+from config import Config
+
+T = TypeVar("T")
+
+# HTTP statuses worth another attempt: timeouts, conflicts, rate limits and server errors
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an LLM client error is transient"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in _RETRYABLE_STATUS or status >= 500
+    # Groq's APIConnectionError and APITimeoutError carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Server-requested delay of a 429 response, if it sent one"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class LatencyTracker:
+    """Rolling window of successful attempt latencies"""
+    
+    def __init__(self, window: int = 500):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def __len__(self) -> int:
+        return len(self._samples)
+    
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = list(self._samples)
+        return float(np.percentile(samples, pct)) if samples else None
+
+
+class ResilientCaller:
+    """Timeout, retry and hedging policy around LLM API calls.
+    
+    Each attempt gets at most LLM_REQUEST_TIMEOUT seconds and the whole call
+    at most LLM_TOTAL_TIMEOUT. Transient errors are retried with jittered
+    exponential backoff; a 429 with a retry-after header waits as long as
+    the server asks. With LLM_HEDGE_ENABLED, an attempt still running after
+    the hedge delay (LLM_HEDGE_AFTER, or the observed p95 latency) gets a
+    duplicate request and the first response wins. A duplicate is a real
+    request against the provider quota, so it is only sent when hedge_permit
+    (if given) grants it capacity.
+    """
+    
+    def __init__(
+        self,
+        request_timeout: Optional[float] = None,
+        total_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        hedge_enabled: Optional[bool] = None,
+        hedge_after: Optional[float] = None,
+    ):
+        self.request_timeout = request_timeout or Config.LLM_REQUEST_TIMEOUT
+        self.total_timeout = total_timeout or Config.LLM_TOTAL_TIMEOUT
+        self.max_retries = Config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.hedge_enabled = Config.LLM_HEDGE_ENABLED if hedge_enabled is None else hedge_enabled
+        self.hedge_after = Config.LLM_HEDGE_AFTER if hedge_after is None else hedge_after
+        self.latency = LatencyTracker()
+        self._backoff = wait_random_exponential(multiplier=Config.LLM_BACKOFF_BASE, max=Config.LLM_BACKOFF_MAX)
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "timeouts": 0,
+            "hedged": 0,
+            "hedges_skipped": 0,
+            "hedge_wins": 0
+        }
+    
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+    
+    def _wait(self, retry_state: RetryCallState) -> float:
+        """Backoff before the next attempt, never past the total deadline"""
+        error = retry_state.outcome.exception()
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = self._backoff(retry_state)
+        remaining = self.total_timeout - retry_state.seconds_since_start
+        return max(0.0, min(delay, remaining))
+    
+    def _before_sleep(self, retry_state: RetryCallState):
+        self._count("retries")
+        error = retry_state.outcome.exception()
+        if getattr(error, "status_code", None) == 429:
+            self._count("rate_limited")
+    
+    def _retry_kwargs(self) -> Dict[str, Any]:
+        return {
+            "stop": stop_after_attempt(self.max_retries + 1) | stop_after_delay(self.total_timeout),
+            "wait": self._wait,
+            "retry": retry_if_exception(is_retryable),
+            "before_sleep": self._before_sleep,
+            "reraise": True
+        }
+    
+    def _attempt_timeout(self, started: float) -> float:
+        remaining = self.total_timeout - (time.monotonic() - started)
+        if remaining <= 0:
+            raise TimeoutError(f"LLM request exceeded its {self.total_timeout:.0f}s deadline")
+        return min(self.request_timeout, remaining)
+    
+    def _hedge_delay(self, timeout: float) -> Optional[float]:
+        """Seconds after which an attempt gets a duplicate, or None to not hedge"""
+        if not self.hedge_enabled:
+            return None
+        delay = self.hedge_after
+        if delay <= 0:
+            # Hedge at the observed p95 once there are enough samples to trust it
+            delay = self.latency.percentile(95) if len(self.latency) >= Config.LLM_HEDGE_MIN_SAMPLES else None
+        if delay is None or delay >= timeout:
+            return None
+        return delay
+    
+    def _timed(self, func: Callable[[float], T], timeout: float, record: bool = True) -> T:
+        self._count("attempts")
+        started = time.perf_counter()
+        try:
+            result = func(timeout)
+        except Exception as e:
+            if isinstance(e, TimeoutError) or type(e).__name__ == "APITimeoutError":
+                self._count("timeouts")
+            raise
+        if record:
+            self.latency.record(time.perf_counter() - started)
+        return result
+    
+    def call(self, func: Callable[[float], T], hedge: bool = True, hedge_permit: Optional[Callable[[], bool]] = None) -> T:
+        """Run func(timeout) under the policy.
+        
+        hedge=False for calls that must not be duplicated; hedge_permit is
+        asked right before a duplicate is sent and returning False skips it.
+        """
+        self._count("calls")
+        started = time.monotonic()
+        for attempt in Retrying(**self._retry_kwargs()):
+            with attempt:
+                timeout = self._attempt_timeout(started)
+                hedge_after = self._hedge_delay(timeout) if hedge else None
+                if hedge_after is None:
+                    # Only latencies of hedgeable calls feed the p95 (a stream opens long before it ends)
+                    return self._timed(func, timeout, record=hedge)
+                return self._hedged_call(func, timeout, hedge_after, hedge_permit)
+    
+    def _permit_hedge(self, hedge_permit: Optional[Callable[[], bool]]) -> bool:
+        if hedge_permit is None or hedge_permit():
+            self._count("hedged")
+            return True
+        self._count("hedges_skipped")
+        return False
+    
+    def _hedged_call(
+        self,
+        func: Callable[[float], T],
+        timeout: float,
+        hedge_after: float,
+        hedge_permit: Optional[Callable[[], bool]] = None,
+    ) -> T:
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+        primary = self._hedge_pool.submit(self._timed, func, timeout)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done or not self._permit_hedge(hedge_permit):
+            return primary.result()
+        
+        hedge = self._hedge_pool.submit(self._timed, func, timeout - hedge_after)
+        error = None
+        for future in as_completed([primary, hedge]):
+            try:
+                result = future.result()
+            except Exception as e:
+                error = e
+                continue
+            if future is hedge:
+                self._count("hedge_wins")
+            # The losing request cannot be cancelled mid-flight; its result is discarded
+            return result
+        raise error
+    
+    async def acall(
+        self,
+        func: Callable[[float], Awaitable[T]],
+        hedge: bool = True,
+        hedge_permit: Optional[Callable[[], bool]] = None,
+    ) -> T:
+        """Async variant of call"""
+        self._count("calls")
+        started = time.monotonic()
+        async for attempt in AsyncRetrying(**self._retry_kwargs()):
+            with attempt:
+                timeout = self._attempt_timeout(started)
+                hedge_after = self._hedge_delay(timeout) if hedge else None
+                if hedge_after is None:
+                    return await self._atimed(func, timeout, record=hedge)
+                return await self._ahedged_call(func, timeout, hedge_after, hedge_permit)
+    
+    async def _atimed(self, func: Callable[[float], Awaitable[T]], timeout: float, record: bool = True) -> T:
+        self._count("attempts")
+        started = time.perf_counter()
+        try:
+            # The client timeout bounds each read; wait_for bounds the whole attempt
+            result = await asyncio.wait_for(func(timeout), timeout)
+        except Exception as e:
+            if isinstance(e, (TimeoutError, asyncio.TimeoutError)) or type(e).__name__ == "APITimeoutError":
+                self._count("timeouts")
+            raise
+        if record:
+            self.latency.record(time.perf_counter() - started)
+        return result
+    
+    async def _ahedged_call(
+        self,
+        func: Callable[[float], Awaitable[T]],
+        timeout: float,
+        hedge_after: float,
+        hedge_permit: Optional[Callable[[], bool]] = None,
+    ) -> T:
+        primary = asyncio.ensure_future(self._atimed(func, timeout))
+        done, _ = await asyncio.wait([primary], timeout=hedge_after)
+        if done or not self._permit_hedge(hedge_permit):
+            return await primary
+        
+        hedge = asyncio.ensure_future(self._atimed(func, timeout - hedge_after))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is hedge:
+                        self._count("hedge_wins")
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def close(self):
+        """Stop the hedge threads; losing requests still in flight are abandoned"""
+        with self._lock:
+            if self._hedge_pool is not None:
+                self._hedge_pool.shutdown(wait=False)
+                self._hedge_pool = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Attempt, retry and hedging counters with attempt latency percentiles"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["latency_p50"] = self.latency.percentile(50)
+        stats["latency_p95"] = self.latency.percentile(95)
+        stats["latency_p99"] = self.latency.percentile(99)
+        return stats
\ No newline at end of file
@@ -0,0 +1,60 @@
+from typing import Dict, Any, Optional, Iterator
+from contextlib import contextmanager
+import threading
+import time
+from src.llm_resilience import LatencyTracker
+from src import telemetry
+
+# Stages of a query and of ingestion, in pipeline order
+QUERY_STAGES = ("embed", "search", "context", "ttft", "llm", "total")
+INGEST_STAGES = ("ingest_parse", "ingest_chunk", "ingest_dedup", "ingest_embed", "ingest_insert")
+
+
+class StageMetrics:
+    """Rolling latency windows per pipeline stage, summarized as p50/p95/p99.
+    
+    Stage times are wall-clock seconds spent in the stage, including any wait
+    for an admission slot or rate-limit capacity. Failed calls are not
+    recorded.
+    """
+    
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, stage: str, seconds: float, timings: Optional[Dict[str, float]] = None):
+        """Add a sample; timings, if given, accumulates the per-request breakdown"""
+        with self._lock:
+            tracker = self._trackers.get(stage)
+            if tracker is None:
+                tracker = self._trackers[stage] = LatencyTracker(self.window)
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+        tracker.record(seconds)
+        telemetry.record_stage(stage, seconds)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+    
+    @contextmanager
+    def time(self, stage: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+        """Record how long the block takes under stage"""
+        started = time.perf_counter()
+        yield
+        self.record(stage, time.perf_counter() - started, timings)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Sample count and latency percentiles (seconds) of every stage seen so far"""
+        with self._lock:
+            trackers = dict(self._trackers)
+            counts = dict(self._counts)
+        order = {stage: i for i, stage in enumerate(QUERY_STAGES + INGEST_STAGES)}
+        return {
+            stage: {
+                "count": counts[stage],
+                "p50": tracker.percentile(50),
+                "p95": tracker.percentile(95),
+                "p99": tracker.percentile(99)
+            }
+            for stage, tracker in sorted(trackers.items(), key=lambda item: order.get(item[0], len(order)))
+        }
\ No newline at end of file
@@ -1,60 +1,308 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
 from src.vector_db import VectorDatabase
 from src.embeddings import EmbeddingModel
-from src.llm import LLMProvider
-from src.document_processor import DocumentProcessor
+from src.llm import LLMProvider, PROMPT_TEMPLATE_VERSION
+from src.document_processor import DocumentProcessor, ProgressCallback, FileData
+from src.dedup import NearDuplicateDetector, Fingerprint
+from src.answer_cache import SharedGeneration, create_answer_cache, create_semantic_answer_cache, make_cache_key, normalize_question
+from src.single_flight import SingleFlight
+from src.stats_service import StatsService
+from src.ingest_jobs import IngestJobQueue
+from src.admission import AdmissionController
+from src.metrics import StageMetrics
+from src import telemetry
+from concurrent.futures import Future, ThreadPoolExecutor
 from config import Config
+import numpy as np
+import threading
 import uuid
+import os
+import time
+
+NO_RESULTS_ANSWER = "I couldn't find any relevant information to answer your question."
 
 
 class RAGPipeline:
-    def __init__(self):
-        self.vector_db = VectorDatabase()
-        self.embedding_model = EmbeddingModel()
-        self.llm = LLMProvider()
-        self.document_processor = DocumentProcessor()
+    def __init__(self, embedding_model=None, vector_db=None, llm: Optional[LLMProvider] = None):
+        """Components not passed in are built from Config (tests pass in-memory ones)"""
+        # Installs exporters only when OTEL_ENABLED; otherwise spans below are no-ops
+        telemetry.setup()
+        self.embedding_model = embedding_model or EmbeddingModel()
+        self.vector_db = vector_db or VectorDatabase(self.embedding_model)
+        self.llm = llm or LLMProvider()
+        # Latency percentiles of every query and ingest stage
+        self.metrics = StageMetrics()
+        self.document_processor = DocumentProcessor(self.embedding_model, metrics=self.metrics)
+        self.deduplicator = NearDuplicateDetector() if Config.DEDUP_ENABLED else None
+        self._dedup_seeded = False
+        self.answer_cache = create_answer_cache()
+        self.semantic_cache = create_semantic_answer_cache()
+        # Cached answers are tied to a generation shared with the other processes using the collection
+        self.cache_generation: Optional[SharedGeneration] = None
+        if self.answer_cache is not None or self.semantic_cache is not None:
+            self.cache_generation = SharedGeneration(self.vector_db.collection_name)
+            self.vector_db.on_change.append(self.cache_generation.bump)
+        self._answer_cache_generation: Optional[int] = None
+        self._in_flight = SingleFlight() if Config.QUERY_COALESCING_ENABLED else None
+        self._generation_executor: Optional[ThreadPoolExecutor] = None
+        # Collection counts and the document list are re-read only after the collection changes
+        self.stats = StatsService(self.vector_db)
+        self._ingest_jobs: Optional[IngestJobQueue] = None
+        # Concurrency caps and bounded wait queues for the embed, search and LLM stages of a query
+        self.admission = AdmissionController()
+        self.llm.stage_limiter = self.admission.stages["llm"]
+        # One pipeline may serve many threads (e.g. every Streamlit session); guards lazy setup
+        self._lock = threading.Lock()
+    
+    def ingest_document(self, file_path: str, progress: Optional[ProgressCallback] = None) -> int:
+        """Ingest a document into the RAG system, streaming its chunks in batches.
+        
+        progress(stage, count) is called with stage "parsed" (pages), "chunked",
+        "embedded" and "inserted" (chunks) as the document moves through, and
+        with "rolled_back" if a failure removed the chunks inserted so far.
+        """
+        with telemetry.span("rag.ingest", {"document.source": os.path.basename(file_path)}) as span:
+            chunks = self.document_processor.iter_document_chunks(file_path, progress)
+            count = self._ingest_chunk_stream(chunks, progress)
+            span.set_attribute("rag.chunks", count)
+        return count
+    
+    def ingest_bytes(self, name: str, data: FileData, progress: Optional[ProgressCallback] = None) -> int:
+        """Ingest a document held in memory (bytes or a binary file object); name selects the format"""
+        with telemetry.span("rag.ingest", {"document.source": name}) as span:
+            chunks = self.document_processor.iter_bytes_chunks(name, data, progress)
+            count = self._ingest_chunk_stream(chunks, progress)
+            span.set_attribute("rag.chunks", count)
+        return count
     
-    def ingest_document(self, file_path: str) -> int:
-        """Ingest a document into the RAG system"""
-        chunks = self.document_processor.process_document(file_path)
-        return self._ingest_chunks(chunks)
+    @property
+    def ingest_jobs(self) -> IngestJobQueue:
+        """Background ingestion queue, started on first use"""
+        with self._lock:
+            if self._ingest_jobs is None:
+                self._ingest_jobs = IngestJobQueue(self)
+            return self._ingest_jobs
     
     def ingest_text(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> int:
         """Ingest raw text into the RAG system"""
-        chunks = self.document_processor.process_text(text, metadata)
-        return self._ingest_chunks(chunks)
+        with telemetry.span("rag.ingest", {"document.source": (metadata or {}).get("source", "Custom Text")}) as span:
+            chunks = self.document_processor.process_text(text, metadata)
+            count = self._ingest_chunks(chunks)
+            span.set_attribute("rag.chunks", count)
+        return count
     
     def ingest_directory(self, directory_path: str) -> int:
         """Ingest all documents from a directory"""
-        chunks = self.document_processor.process_directory(directory_path)
-        return self._ingest_chunks(chunks)
+        total = 0
+        for file_path in self.document_processor.iter_directory_files(directory_path):
+            filename = os.path.basename(file_path)
+            try:
+                count = self.ingest_document(file_path)
+                total += count
+                print(f"Processed {filename}: {count} chunks")
+            except Exception as e:
+                print(f"Error processing {filename}: {e}")
+        return total
     
-    def _ingest_chunks(self, chunks: List[Dict[str, Any]]) -> int:
-        """Helper method to ingest chunks into vector database"""
-        if not chunks:
+    def _ingest_chunk_stream(self, chunks: Iterable[Dict[str, Any]], progress: Optional[ProgressCallback] = None) -> int:
+        """Ingest a lazily produced chunk stream in batches of INGEST_BATCH_SIZE.
+        
+        If the document fails part-way, the batches already inserted are deleted
+        before the error is re-raised, so a retry does not duplicate them.
+        """
+        total = 0
+        batch = []
+        inserted: List[str] = []
+        try:
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= Config.INGEST_BATCH_SIZE:
+                    total += self._ingest_chunks(batch, progress, inserted)
+                    batch = []
+            if batch:
+                total += self._ingest_chunks(batch, progress, inserted)
+        except Exception:
+            self._rollback(inserted, progress)
+            raise
+        return total
+    
+    def _rollback(self, ids: List[str], progress: Optional[ProgressCallback] = None) -> int:
+        """Delete the chunks a failed ingest already inserted; returns the number deleted.
+        
+        Reports progress("rolled_back", count). A failed delete is logged rather than
+        raised, so the caller re-raises the error that stopped the ingest.
+        """
+        if not ids:
+            return 0
+        try:
+            deleted = self.vector_db.delete_documents(ids)
+        except Exception as e:
+            print(f"❌ Could not roll back {len(ids)} inserted chunks: {e}")
+            return 0
+        finally:
+            # The deleted chunks' fingerprints must not mark a retry as duplicate
+            self.invalidate_dedup_index()
+        print(f"↩️  Rolled back {deleted} chunks of a failed ingest")
+        if progress:
+            progress("rolled_back", deleted)
+        return deleted
+    
+    def _ingest_chunks(
+        self,
+        chunks: List[Dict[str, Any]],
+        progress: Optional[ProgressCallback] = None,
+        inserted: Optional[List[str]] = None,
+    ) -> int:
+        """Helper method to ingest chunks into vector database; inserted collects the new ids"""
+        prepared = self._prepare_chunks(chunks)
+        if prepared is None:
             return 0
+        documents, metadatas, ids, embeddings, fingerprints = prepared
+        if progress:
+            progress("embedded", len(documents))
+        
+        with self.metrics.time("ingest_insert"):
+            self.vector_db.add_documents(documents, metadatas, ids, embeddings)
+        if inserted is not None:
+            inserted.extend(ids)
+        self._register_fingerprints(fingerprints)
+        if progress:
+            progress("inserted", len(documents))
+        return len(documents)
+    
+    def _prepare_chunks(
+        self,
+        chunks: List[Dict[str, Any]],
+    ) -> Optional[Tuple[List[str], List[Dict[str, Any]], List[str], np.ndarray, List[Fingerprint]]]:
+        """Deduplicate and embed chunks.
+        
+        Returns (documents, metadatas, ids, embeddings, fingerprints) or None;
+        pass fingerprints to _register_fingerprints once the chunks are stored.
+        """
+        if not chunks:
+            return None
+        
+        fingerprints = []
+        if self.deduplicator is not None:
+            with self.metrics.time("ingest_dedup"):
+                chunks, fingerprints = self._deduplicate(chunks)
+            if not chunks:
+                return None
         
         documents = [chunk["content"] for chunk in chunks]
         metadatas = [chunk["metadata"] for chunk in chunks]
         ids = [str(uuid.uuid4()) for _ in chunks]
+        with self.metrics.time("ingest_embed"):
+            embeddings = self._embed_chunks(chunks)
+        return documents, metadatas, ids, embeddings, fingerprints
+    
+    def _register_fingerprints(self, fingerprints: List[Fingerprint]):
+        """Make stored chunks count as duplicates for later ingests"""
+        if self.deduplicator is not None and fingerprints:
+            self.deduplicator.register(fingerprints)
+    
+    def _embed_chunks(self, chunks: List[Dict[str, Any]]) -> np.ndarray:
+        """Embed chunks with the shared model, reusing vectors produced during chunking"""
+        missing = [i for i, chunk in enumerate(chunks) if chunk.get("embedding") is None]
+        if len(missing) == len(chunks):
+            return self.embedding_model.encode([chunk["content"] for chunk in chunks])
         
-        self.vector_db.add_documents(documents, metadatas, ids)
-        return len(chunks)
+        embeddings = np.zeros((len(chunks), self.embedding_model.get_embedding_dimension()), dtype=np.float32)
+        for i, chunk in enumerate(chunks):
+            if chunk.get("embedding") is not None:
+                embeddings[i] = chunk["embedding"]
+        if missing:
+            embeddings[missing] = self.embedding_model.encode([chunks[i]["content"] for i in missing])
+        return embeddings
     
-    def query(self, question: str, max_results: Optional[int] = None) -> Dict[str, Any]:
-        """Query the RAG system"""
-        if max_results is None:
-            max_results = Config.MAX_RETRIEVED_DOCS
+    def _deduplicate(self, chunks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Fingerprint]]:
+        """Drop exact and near-duplicate chunks before they are embedded; also returns the kept fingerprints"""
+        with self._lock:
+            if not self._dedup_seeded:
+                # Fingerprints of previously ingested chunks are stored in their metadata
+                for batch in self.vector_db.iter_documents(output_fields=["metadata"]):
+                    self.deduplicator.seed(doc.get("metadata") for doc in batch)
+                self._dedup_seeded = True
         
+        kept, stats, fingerprints = self.deduplicator.filter(chunks)
+        skipped = stats["exact_duplicates"] + stats["near_duplicates"]
+        if skipped:
+            print(f"⏭️  Skipped {skipped} duplicate chunks "
+                  f"({stats['exact_duplicates']} exact, {stats['near_duplicates']} near-duplicate)")
+        return kept, fingerprints
+    
+    def invalidate_dedup_index(self):
+        """Forget known fingerprints; they are re-read from the collection on the next ingest"""
+        if self.deduplicator is not None:
+            self.deduplicator.reset()
+        self._dedup_seeded = False
+    
+    def reset(self, mode: str = "truncate") -> Dict[str, Any]:
+        """Empty the collection in-process, reusing the open Milvus connection and the loaded model.
+        
+        "truncate" deletes every chunk and keeps the collection and its index;
+        "drop" drops and recreates the collection.
+        """
+        started = time.perf_counter()
+        if mode == "truncate":
+            deleted = self.vector_db.truncate()
+        elif mode == "drop":
+            deleted = None
+            self.vector_db.reset_database()
+        else:
+            raise ValueError(f"Unsupported reset mode: {mode}. Use 'truncate' or 'drop'.")
+        self.invalidate_dedup_index()
+        return {"mode": mode, "deleted": deleted, "seconds": round(time.perf_counter() - started, 3)}
+    
+    def notify_collection_changed(self):
+        """Invalidate caches after the collection was modified outside this pipeline"""
+        self.vector_db.bump_generation()
+        self.invalidate_dedup_index()
+    
+    def _retrieve(
+        self,
+        question: str,
+        max_results: Optional[int] = None,
+        query_embedding: Optional[np.ndarray] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Search the vector database and return the context texts and their sources"""
         # Retrieve relevant documents
-        search_results = self.vector_db.query(question, max_results)
+        if query_embedding is None:
+            query_embedding = self._encode_question(question, timings)
+        with self.metrics.time("search", timings), self.admission.slot("search"):
+            search_results = self.vector_db.search(query_embedding, max_results)
+        return self._format_sources(search_results)
+    
+    def _encode_question(self, question: str, timings: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Embed a question under the embed stage's admission slot"""
+        with self.metrics.time("embed", timings), self.admission.slot("embed"):
+            return self.embedding_model.encode_single(question)
+    
+    def retrieve(self, question: str, max_results: Optional[int] = None) -> Dict[str, Any]:
+        """Return the ranked sources for a question without generating an answer.
+        
+        Never touches the LLM, its rate limits or the answer caches. Timings are
+        in seconds.
+        """
+        started = time.perf_counter()
+        timings = {}
+        with telemetry.span("rag.retrieve", {"rag.top_k": max_results or Config.MAX_RETRIEVED_DOCS}) as span:
+            _, sources = self._retrieve(question, max_results, timings=timings)
+            span.set_attribute("rag.sources", len(sources))
+        timings["total"] = time.perf_counter() - started
         
+        return {
+            "question": question,
+            "sources": sources,
+            "timings": timings
+        }
+    
+    @staticmethod
+    def _format_sources(search_results: Dict[str, Any]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Turn raw search results into context texts and source dicts"""
         if not search_results["documents"] or not search_results["documents"][0]:
-            return {
-                "question": question,
-                "answer": "I couldn't find any relevant information to answer your question.",
-                "sources": []
-            }
+            return [], []
         
         # Extract context and sources
         context_docs = search_results["documents"][0]
@@ -63,20 +311,348 @@ class RAGPipeline:
         for i, doc in enumerate(context_docs):
             metadata = search_results["metadatas"][0][i] if search_results["metadatas"] else {}
             sources.append({
+                "id": search_results["ids"][0][i] if search_results["ids"] else None,
                 "content": doc,
                 "metadata": metadata,
                 "distance": search_results["distances"][0][i] if search_results["distances"] else None
             })
         
-        # Generate response
-        answer = self.llm.generate_response(question, context_docs)
+        return context_docs, sources
+    
+    def _sync_cache_generation(self) -> int:
+        """Current shared collection generation; answers cached at older ones are dropped once it moves"""
+        if self.cache_generation is None:
+            return self.vector_db.generation
+        generation = self.cache_generation.get()
+        if generation != self._answer_cache_generation:
+            # Some process changed the collection, so answers from before may be stale
+            if self.answer_cache is not None:
+                self.answer_cache.discard_before(generation)
+            if self.semantic_cache is not None:
+                self.semantic_cache.discard_before(generation)
+            self._answer_cache_generation = generation
+        return generation
+    
+    def _answer_cache_key(
+        self,
+        question: str,
+        max_results: Optional[int],
+        sources: List[Dict[str, Any]],
+        generation: int,
+    ) -> Optional[str]:
+        """Answer cache key for sources retrieved at generation, or None when caching is disabled"""
+        if self.answer_cache is None:
+            return None
+        
+        return make_cache_key(
+            question,
+            max_results or Config.MAX_RETRIEVED_DOCS,
+            [source["id"] for source in sources],
+            self.llm.model,
+            f"{PROMPT_TEMPLATE_VERSION}:{self.llm.context_builder.max_tokens}",
+            generation
+        )
+    
+    def _semantic_cache_lookup(self, query_embedding: np.ndarray, max_results: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Cached answer and sources of a similar earlier question, if any"""
+        if self.semantic_cache is None:
+            return None
+        generation = self._sync_cache_generation()
+        hit = self.semantic_cache.get(query_embedding, max_results or Config.MAX_RETRIEVED_DOCS, generation)
+        if hit is None:
+            return None
+        entry, similarity = hit
+        return {"answer": entry["answer"], "sources": entry["sources"], "similarity": similarity}
+    
+    def _store_answer(
+        self,
+        cache_key: Optional[str],
+        query_embedding: np.ndarray,
+        max_results: Optional[int],
+        answer: str,
+        sources: List[Dict[str, Any]],
+        generation: int,
+    ):
+        """Put a freshly generated answer into the exact and semantic caches.
         
+        generation is the collection generation the sources were retrieved
+        at; an answer finishing after an ingest or reset never matches
+        lookups made since.
+        """
+        if cache_key is not None:
+            self.answer_cache.set(cache_key, answer, generation)
+        if self.semantic_cache is not None:
+            self.semantic_cache.set(query_embedding, max_results or Config.MAX_RETRIEVED_DOCS, answer, sources, generation)
+    
+    # Steps shared by the sync and async query paths; retrieval and the LLM call stay with each path
+    
+    @staticmethod
+    def _semantic_result(question: str, semantic_hit: Dict[str, Any]) -> Dict[str, Any]:
+        """Query result for a semantic cache hit"""
+        return {
+            "question": question,
+            "answer": semantic_hit["answer"],
+            "sources": semantic_hit["sources"],
+            "cached": True,
+            "cache_similarity": semantic_hit["similarity"]
+        }
+    
+    def _lookup_answer(
+        self,
+        question: str,
+        max_results: Optional[int],
+        context_docs: List[str],
+        sources: List[Dict[str, Any]],
+        generation: int,
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Answer cache key, and the result when no LLM call is needed (no sources or an exact cache hit)"""
+        if not context_docs:
+            return None, {
+                "question": question,
+                "answer": NO_RESULTS_ANSWER,
+                "sources": [],
+                "cached": False
+            }
+        
+        cache_key = self._answer_cache_key(question, max_results, sources, generation)
+        cached_answer = self.answer_cache.get(cache_key) if cache_key is not None else None
+        if cached_answer is not None:
+            return cache_key, {
+                "question": question,
+                "answer": cached_answer,
+                "sources": sources,
+                "cached": True
+            }
+        return cache_key, None
+    
+    def _build_prompt(self, question: str, context_docs: List[str], timings: Optional[Dict[str, float]] = None):
+        """Prompt from the chunks that fit the context token budget, and its usage report"""
+        with self.metrics.time("context", timings):
+            return self.llm.build_prompt(question, context_docs)
+    
+    def _finish_answer(
+        self,
+        question: str,
+        max_results: Optional[int],
+        query_embedding: np.ndarray,
+        cache_key: Optional[str],
+        answer: str,
+        sources: List[Dict[str, Any]],
+        usage: Optional[Dict[str, Any]],
+        generation: int,
+    ) -> Dict[str, Any]:
+        """Cache a generated answer and build its query result"""
+        self._store_answer(cache_key, query_embedding, max_results, answer, sources, generation)
         return {
             "question": question,
             "answer": answer,
-            "sources": sources
+            "sources": sources,
+            "cached": False,
+            "usage": usage
         }
     
+    def _done_event(
+        self,
+        question: str,
+        answer: str,
+        ready: Optional[Dict[str, Any]],
+        usage: Optional[Dict[str, Any]],
+        time_to_first_token: Optional[float],
+        started: float,
+        timings: Dict[str, float],
+    ) -> Dict[str, Any]:
+        """Final event of a streamed query; ready is the result that made the LLM call unnecessary"""
+        total_time = time.perf_counter() - started
+        self.metrics.record("total", total_time, timings)
+        return {
+            "type": "done",
+            "question": question,
+            "answer": answer,
+            "cached": ready is not None and ready["cached"],
+            "usage": usage,
+            "time_to_first_token": time_to_first_token,
+            "total_time": total_time,
+            "timings": timings
+        }
+    
+    def query(
+        self,
+        question: str,
+        max_results: Optional[int] = None,
+        priority: str = "interactive",
+        mode: str = "answer",
+        include_timings: bool = False,
+    ) -> Dict[str, Any]:
+        """Query the RAG system.
+        
+        mode selects how much work is done:
+        - "answer": retrieve and generate the answer (default)
+        - "retrieve": sources and timings only, like retrieve(); no LLM call
+        - "answer_async": return the sources at once, with "answer_future"
+          resolving to the full answer result once it is generated
+        
+        Identical questions asked concurrently (e.g. from several Streamlit
+        sessions) share one retrieval and LLM call. priority is "interactive"
+        or "batch"; batch requests yield to interactive ones under rate limits.
+        include_timings adds "timings", the seconds spent in each stage.
+        """
+        attributes = {"rag.mode": mode, "rag.priority": priority, "rag.top_k": max_results or Config.MAX_RETRIEVED_DOCS}
+        with telemetry.span("rag.query", attributes) as span:
+            if mode == "retrieve":
+                return {**self.retrieve(question, max_results), "answer": None}
+            elif mode == "answer_async":
+                return self._query_deferred(question, max_results, priority)
+            elif mode != "answer":
+                raise ValueError(f"Unsupported query mode: {mode}. Use 'answer', 'retrieve' or 'answer_async'.")
+        
+            if self._in_flight is None:
+                result = self._query(question, max_results, priority)
+            else:
+                key = (normalize_question(question), max_results or Config.MAX_RETRIEVED_DOCS)
+                result, shared = self._in_flight.do(key, self._query, question, max_results, priority)
+                span.set_attribute("rag.coalesced", shared)
+                if shared:
+                    result = {**result, "question": question}
+            if telemetry.enabled():
+                self._trace_answer(span, result)
+        if not include_timings:
+            result = {key: value for key, value in result.items() if key != "timings"}
+        return result
+    
+    @staticmethod
+    def _trace_answer(span, result: Dict[str, Any]):
+        """Annotate a query span with the answer's cache outcome, source count and prompt size"""
+        outcome = "semantic" if "cache_similarity" in result else "exact" if result.get("cached") else "miss"
+        span.set_attributes({"rag.cache": outcome, "rag.sources": len(result["sources"])})
+        if result.get("usage"):
+            span.set_attribute("llm.prompt_tokens", result["usage"]["prompt_tokens"])
+        telemetry.add("queries", 1, {"rag.cache": outcome})
+    
+    def _query(self, question: str, max_results: Optional[int] = None, priority: str = "interactive") -> Dict[str, Any]:
+        started = time.perf_counter()
+        timings = {}
+        query_embedding = self._encode_question(question, timings)
+        
+        semantic_hit = self._semantic_cache_lookup(query_embedding, max_results)
+        if semantic_hit is not None:
+            result = self._semantic_result(question, semantic_hit)
+        else:
+            generation = self._sync_cache_generation()
+            context_docs, sources = self._retrieve(question, max_results, query_embedding, timings)
+            result = self._answer(question, max_results, priority, query_embedding, context_docs, sources, generation, timings)
+        
+        self.metrics.record("total", time.perf_counter() - started, timings)
+        result["timings"] = timings
+        return result
+        
+    def _answer(
+        self,
+        question: str,
+        max_results: Optional[int],
+        priority: str,
+        query_embedding: np.ndarray,
+        context_docs: List[str],
+        sources: List[Dict[str, Any]],
+        generation: int,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> Dict[str, Any]:
+        """Answer from sources retrieved at collection generation, through the answer cache"""
+        cache_key, result = self._lookup_answer(question, max_results, context_docs, sources, generation)
+        if result is not None:
+            return result
+        
+        prompt, usage = self._build_prompt(question, context_docs, timings)
+        with self.metrics.time("llm", timings):
+            answer = self.llm.generate_response(prompt, priority=priority)
+        return self._finish_answer(question, max_results, query_embedding, cache_key, answer, sources, usage, generation)
+    
+    def _query_deferred(self, question: str, max_results: Optional[int], priority: str) -> Dict[str, Any]:
+        """Retrieve now and generate the answer on a background thread"""
+        started = time.perf_counter()
+        timings = {}
+        query_embedding = self._encode_question(question, timings)
+        generation = self._sync_cache_generation()
+        context_docs, sources = self._retrieve(question, max_results, query_embedding, timings)
+        timings["total"] = time.perf_counter() - started
+        
+        with self._lock:
+            if self._generation_executor is None:
+                self._generation_executor = ThreadPoolExecutor(
+                    max_workers=Config.DEFERRED_GENERATION_WORKERS,
+                    thread_name_prefix="rag-generate"
+                )
+        answer_future: Future = self._generation_executor.submit(
+            self._answer, question, max_results, priority, query_embedding, context_docs, sources, generation
+        )
+        
+        return {
+            "question": question,
+            "answer": None,
+            "sources": sources,
+            "answer_future": answer_future,
+            "timings": timings
+        }
+    
+    def query_stream(
+        self,
+        question: str,
+        max_results: Optional[int] = None,
+        priority: str = "interactive",
+    ) -> Iterator[Dict[str, Any]]:
+        """Query the RAG system, yielding the sources first and then the answer token by token.
+        
+        Events are dicts with a "type" key:
+        - "sources": {"sources": [...]} once retrieval is done
+        - "token": {"content": "..."} for each streamed piece of the answer
+        - "done": {"answer", "usage", "time_to_first_token", "total_time", "timings"} (seconds since
+          the call); usage is the prompt token report, or None when no prompt was sent
+        
+        A consumer that stops early should close the generator (e.g. with
+        contextlib.closing), which ends the LLM stream and frees its slot.
+        """
+        started = time.perf_counter()
+        timings = {}
+        # Traces the retrieval phase only; a span cannot stay current across the yields below
+        attributes = {"rag.priority": priority, "rag.top_k": max_results or Config.MAX_RETRIEVED_DOCS}
+        with telemetry.span("rag.query_stream", attributes) as span:
+            query_embedding = self._encode_question(question, timings)
+            semantic_hit = self._semantic_cache_lookup(query_embedding, max_results)
+            if semantic_hit is not None:
+                sources = semantic_hit["sources"]
+                ready = self._semantic_result(question, semantic_hit)
+            else:
+                generation = self._sync_cache_generation()
+                context_docs, sources = self._retrieve(question, max_results, query_embedding, timings)
+                cache_key, ready = self._lookup_answer(question, max_results, context_docs, sources, generation)
+            if telemetry.enabled():
+                self._trace_answer(span, ready or {"sources": sources})
+        yield {"type": "sources", "sources": sources}
+        
+        answer_parts = []
+        time_to_first_token = None
+        usage = None
+        if ready is None:
+            prompt, usage = self._build_prompt(question, context_docs, timings)
+            generation_started = time.perf_counter()
+            # The LLM slot is freed when this block exits, also when the consumer closes the stream early
+            with self.llm.stream_response(prompt, priority=priority) as tokens:
+                for token in tokens:
+                    if time_to_first_token is None:
+                        time_to_first_token = time.perf_counter() - started
+                        self.metrics.record("ttft", time.perf_counter() - generation_started, timings)
+                    answer_parts.append(token)
+                    yield {"type": "token", "content": token}
+            self.metrics.record("llm", time.perf_counter() - generation_started, timings)
+        else:
+            time_to_first_token = time.perf_counter() - started
+            answer_parts.append(ready["answer"])
+            yield {"type": "token", "content": ready["answer"]}
+        
+        answer = "".join(answer_parts)
+        if ready is None:
+            self._store_answer(cache_key, query_embedding, max_results, answer, sources, generation)
+        yield self._done_event(question, answer, ready, usage, time_to_first_token, started, timings)
+    
     def get_all_documents(self) -> List[Dict[str, Any]]:
         """Get all documents from the RAG system, grouped by original documents"""
         results = self.vector_db.get_all_documents()
@@ -94,7 +670,10 @@ class RAGPipeline:
         return documents
     
     def get_unique_documents(self) -> List[Dict[str, Any]]:
-        """Get unique documents (grouped by source file) from the RAG system"""
+        """Get unique documents (grouped by source file) from the RAG system; the list is cached, do not modify it"""
+        return self.stats.get("unique_documents", self._load_unique_documents)
+    
+    def _load_unique_documents(self) -> List[Dict[str, Any]]:
         results = self.vector_db.get_all_documents()
         documents_by_source = {}
         
@@ -102,18 +681,7 @@ class RAGPipeline:
             for i, doc in enumerate(results['documents']):
                 metadata = results['metadatas'][i] if results['metadatas'] else {}
                 
-                # Determine the source key
-                source_key = None
-                if 'source_file' in metadata:
-                    source_key = metadata['source_file']
-                elif 'source' in metadata:
-                    source_key = metadata['source']
-                else:
-                    source_key = f"Document {i}"
-                
-                # Extract filename from path if it's a path
-                if '/' in source_key or '\\' in source_key:
-                    source_key = source_key.split('/')[-1].split('\\')[-1]
+                source_key = self._source_key(metadata, i)
                 
                 # Group by source
                 if source_key not in documents_by_source:
@@ -140,10 +708,165 @@ class RAGPipeline:
         # Convert to list
         return list(documents_by_source.values())
     
+    @staticmethod
+    def _source_key(metadata: Dict[str, Any], position: int) -> str:
+        """Name of the document a chunk belongs to: its file name, source, or position"""
+        if 'source_file' in metadata:
+            source_key = metadata['source_file']
+        elif 'source' in metadata:
+            source_key = metadata['source']
+        else:
+            source_key = f"Document {position}"
+        
+        # Extract filename from path if it's a path
+        if '/' in source_key or '\\' in source_key:
+            source_key = source_key.split('/')[-1].split('\\')[-1]
+        return source_key
+    
+    def _load_document_catalog(self) -> List[Dict[str, Any]]:
+        """One entry per document, built from chunk metadata only (no text is read)"""
+        catalog = {}
+        position = 0
+        for batch in self.vector_db.iter_documents(output_fields=["metadata"]):
+            for doc in batch:
+                metadata = doc.get("metadata") or {}
+                source_key = self._source_key(metadata, position)
+                position += 1
+                entry = catalog.setdefault(source_key, {"source": source_key, "metadata": {}, "total_chunks": 0})
+                entry["total_chunks"] += 1
+                for key, value in metadata.items():
+                    if key not in ['chunk_id', 'source_file'] and value:
+                        entry["metadata"][key] = value
+        return list(catalog.values())
+    
+    def list_documents(self, offset: int = 0, limit: int = 20, sort: str = "source",
+                       descending: bool = False, search: Optional[str] = None) -> Dict[str, Any]:
+        """One page of the document catalog (source, total_chunks, metadata), without chunk text.
+        
+        sort is "source" or "chunks"; search keeps documents whose name contains
+        it (case-insensitive). next_offset is None on the last page.
+        """
+        if sort not in ("source", "chunks"):
+            raise ValueError(f"Unsupported sort: {sort}. Use 'source' or 'chunks'.")
+        documents = self.stats.get("document_catalog", self._load_document_catalog)
+        if search:
+            needle = search.lower()
+            documents = [doc for doc in documents if needle in doc["source"].lower()]
+        key = (lambda doc: doc["source"].lower()) if sort == "source" else (lambda doc: doc["total_chunks"])
+        documents = sorted(documents, key=key, reverse=descending)
+        
+        offset = max(0, offset)
+        page = documents[offset:offset + limit] if limit > 0 else []
+        next_offset = offset + len(page) if offset + len(page) < len(documents) and limit > 0 else None
+        return {
+            "documents": page,
+            "total": len(documents),
+            "offset": offset,
+            "limit": limit,
+            "next_offset": next_offset
+        }
+    
+    def get_document_preview(self, source: str, max_chars: int = 300) -> Optional[str]:
+        """Start of a document's first chunk, fetched on demand; None if no chunk is stored under source"""
+        def load():
+            chunks = self.vector_db.get_chunks_by_source(source, chunk_id=0)
+            if not chunks:
+                chunks = self.vector_db.get_chunks_by_source(source)
+            return chunks[0]["text"] if chunks else None
+        
+        text = self.stats.get(f"preview:{source}", load)
+        if text is None or len(text) <= max_chars:
+            return text
+        return text[:max_chars] + "..."
+    
+    def get_truncation_report(self, batch_size: int = 1024) -> Dict[str, Any]:
+        """Count stored chunks that exceed the embedding model's max_seq_length"""
+        max_seq_length = self.embedding_model.max_seq_length
+        total_chunks = 0
+        truncated_chunks = 0
+        truncated_tokens = 0
+        truncated_by_source = {}
+        
+        for batch in self.vector_db.iter_documents(output_fields=["text", "metadata"], batch_size=batch_size):
+            token_counts = self.embedding_model.count_tokens([doc["text"] for doc in batch])
+            for doc, token_count in zip(batch, token_counts):
+                total_chunks += 1
+                if token_count > max_seq_length:
+                    truncated_chunks += 1
+                    truncated_tokens += token_count - max_seq_length
+                    source = (doc.get("metadata") or {}).get("source", "Unknown")
+                    truncated_by_source[source] = truncated_by_source.get(source, 0) + 1
+        
+        return {
+            "max_seq_length": max_seq_length,
+            "total_chunks": total_chunks,
+            "truncated_chunks": truncated_chunks,
+            "truncated_percent": (100.0 * truncated_chunks / total_chunks) if total_chunks else 0.0,
+            "truncated_tokens": truncated_tokens,
+            "truncated_by_source": truncated_by_source
+        }
+    
+    def is_idle(self) -> bool:
+        """No query holds or waits for a stage slot and no background ingest is pending"""
+        if any(stats["active"] or stats["waiting"] for stats in self.admission.get_stats().values()):
+            return False
+        jobs = self._ingest_jobs.get_stats() if self._ingest_jobs is not None else None
+        return not (jobs and (jobs["queued"] or jobs["running"]))
+    
+    def close_when_idle(self, quiet_seconds: float = 3.0, max_wait: float = 600.0) -> threading.Thread:
+        """Close the pipeline on a background thread once it has been idle for quiet_seconds.
+        
+        For a pipeline that was replaced while requests may still be using it;
+        a query between two stages holds no slot, hence the quiet period.
+        After max_wait it is closed regardless.
+        """
+        def drain():
+            deadline = time.monotonic() + max_wait
+            idle_since = None
+            while time.monotonic() < deadline:
+                if not self.is_idle():
+                    idle_since = None
+                elif idle_since is None:
+                    idle_since = time.monotonic()
+                elif time.monotonic() - idle_since >= quiet_seconds:
+                    break
+                time.sleep(min(0.5, quiet_seconds / 2))
+            self.close()
+        
+        thread = threading.Thread(target=drain, name="rag-drain", daemon=True)
+        thread.start()
+        return thread
+    
+    def close(self):
+        """Release the pipeline's threads and clients; it must not be used afterwards.
+        
+        Queued and running background ingests and deferred answers finish
+        first, so none of them loses its Milvus client halfway.
+        """
+        with self._lock:
+            ingest_jobs, self._ingest_jobs = self._ingest_jobs, None
+            generation_executor, self._generation_executor = self._generation_executor, None
+        if ingest_jobs is not None:
+            ingest_jobs.shutdown(wait=True)
+        if generation_executor is not None:
+            generation_executor.shutdown(wait=True)
+        self.llm.close()
+        self.vector_db.close()
+        if self.cache_generation is not None:
+            self.cache_generation.close()
+    
     def get_system_info(self) -> Dict[str, Any]:
         """Get information about the RAG system"""
         return {
-            "vector_db": self.vector_db.get_collection_info(),
+            "vector_db": self.stats.get("collection_info", self.vector_db.get_collection_info),
             "embedding_model": self.embedding_model.get_model_info(),
-            "llm": self.llm.get_model_info()
+            "llm": self.llm.get_model_info(),
+            "dedup": self.deduplicator.get_stats() if self.deduplicator is not None else None,
+            "answer_cache": self.answer_cache.get_stats() if self.answer_cache is not None else None,
+            "semantic_cache": self.semantic_cache.get_stats() if self.semantic_cache is not None else None,
+            "coalescing": self._in_flight.get_stats() if self._in_flight is not None else None,
+            "stats_cache": self.stats.get_stats(),
+            "ingest_jobs": self._ingest_jobs.get_stats() if self._ingest_jobs is not None else None,
+            "admission": self.admission.get_stats(),
+            "latency": self.metrics.get_stats()
         }
\ No newline at end of file
@@ -0,0 +1,204 @@
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from config import Config
+
+PRIORITIES = {"interactive": 0, "batch": 10}
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding at most one minute of capacity; a limit of 0 means unlimited"""
+    
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.available = float(per_minute)
+        self._updated = time.monotonic()
+    
+    @property
+    def unlimited(self) -> bool:
+        return self.per_minute <= 0
+    
+    def refill(self, now: float):
+        if not self.unlimited:
+            self.available = min(self.per_minute, self.available + (now - self._updated) * self.per_minute / 60.0)
+        self._updated = now
+    
+    def wait_for(self, amount: float) -> float:
+        """Seconds until amount is available (after refill)"""
+        if self.unlimited or self.available >= amount:
+            return 0.0
+        # A single request larger than the bucket waits for a full bucket instead of forever
+        return (min(amount, self.per_minute) - self.available) * 60.0 / self.per_minute
+    
+    def take(self, amount: float):
+        if not self.unlimited:
+            self.available -= amount
+
+
+class LLMRateLimiter:
+    """Client-side requests-per-minute and tokens-per-minute limiter with a priority queue.
+    
+    Requests wait in a heap ordered by priority and arrival; only the head of
+    the queue may take capacity, so interactive requests overtake queued batch
+    work but nobody jumps ahead within a priority. Token costs are estimates;
+    adjust() settles the difference once the real usage is known.
+    """
+    
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, max_wait: Optional[float] = None):
+        self._requests = TokenBucket((Config.LLM_RPM_LIMIT or 0) if rpm is None else rpm)
+        self._tokens = TokenBucket(Config.LLM_TPM_LIMIT if tpm is None else tpm)
+        self.max_wait = Config.LLM_QUEUE_TIMEOUT if max_wait is None else max_wait
+        self._condition = threading.Condition()
+        self._queue: List[Tuple[int, int, int]] = []
+        self._sequence = itertools.count()
+        self._stats = {"admitted": 0, "queued": 0, "timed_out": 0, "wait_seconds": 0.0}
+    
+    @property
+    def enabled(self) -> bool:
+        return not (self._requests.unlimited and self._tokens.unlimited)
+    
+    def _wait_time(self, tokens: int) -> float:
+        now = time.monotonic()
+        self._requests.refill(now)
+        self._tokens.refill(now)
+        return max(self._requests.wait_for(1), self._tokens.wait_for(tokens))
+    
+    def _try_take(self, entry: Tuple[int, int, int]) -> float:
+        """Take capacity if entry heads the queue: 0 on success, seconds to wait, or -1 when not at the head"""
+        if self._queue[0] is not entry:
+            return -1.0
+        wait = self._wait_time(entry[2])
+        if wait > 0:
+            return wait
+        heapq.heappop(self._queue)
+        self._requests.take(1)
+        self._tokens.take(entry[2])
+        self._stats["admitted"] += 1
+        self._condition.notify_all()
+        return 0.0
+    
+    def _enqueue(self, tokens: int, priority: str) -> Tuple[int, int, int]:
+        entry = (PRIORITIES.get(priority, PRIORITIES["batch"]), next(self._sequence), tokens)
+        heapq.heappush(self._queue, entry)
+        return entry
+    
+    def _remove(self, entry: Tuple[int, int, int]):
+        if entry in self._queue:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._condition.notify_all()
+    
+    def _give_up(self, entry: Tuple[int, int, int]):
+        self._remove(entry)
+        self._stats["timed_out"] += 1
+        raise TimeoutError(f"LLM request waited more than {self.max_wait:g}s for rate-limit capacity")
+    
+    def acquire(self, tokens: int, priority: str = "interactive"):
+        """Block until a request of about `tokens` tokens may be sent"""
+        if not self.enabled:
+            return
+        started = time.monotonic()
+        with self._condition:
+            entry = self._enqueue(tokens, priority)
+            queued = False
+            while True:
+                wait = self._try_take(entry)
+                if wait == 0:
+                    break
+                if not queued:
+                    self._stats["queued"] += 1
+                    queued = True
+                remaining = self.max_wait - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._give_up(entry)
+                # The head sleeps until capacity refills; the others until the queue changes
+                self._condition.wait(min(remaining, wait) if wait > 0 else remaining)
+            self._stats["wait_seconds"] += time.monotonic() - started
+    
+    def try_acquire(self, tokens: int) -> bool:
+        """Take capacity for a request only if it is free now and nobody is queued for it"""
+        if not self.enabled:
+            return True
+        with self._condition:
+            if self._queue or self._wait_time(tokens) > 0:
+                return False
+            self._requests.take(1)
+            self._tokens.take(tokens)
+            self._stats["admitted"] += 1
+            return True
+    
+    async def aacquire(self, tokens: int, priority: str = "interactive"):
+        """Async variant of acquire; polls instead of blocking the event loop"""
+        if not self.enabled:
+            return
+        started = time.monotonic()
+        with self._condition:
+            entry = self._enqueue(tokens, priority)
+        queued = False
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_take(entry)
+                    if wait == 0:
+                        self._stats["wait_seconds"] += time.monotonic() - started
+                        return
+                    if not queued:
+                        self._stats["queued"] += 1
+                        queued = True
+                    remaining = self.max_wait - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._give_up(entry)
+                await asyncio.sleep(min(remaining, wait if wait > 0 else 0.05))
+        except asyncio.CancelledError:
+            # A cancelled waiter at the head would otherwise block everyone behind it
+            with self._condition:
+                self._remove(entry)
+            raise
+    
+    def split(self, parts: int):
+        """Keep 1/parts of the quota, for one of parts processes sharing the same API key"""
+        if parts <= 1:
+            return
+        with self._condition:
+            for bucket in (self._requests, self._tokens):
+                bucket.per_minute /= parts
+                bucket.available = min(bucket.available, bucket.per_minute)
+    
+    def adjust(self, estimated_tokens: int, actual_tokens: int):
+        """Settle the token bucket once a response reports its real usage"""
+        if self._tokens.unlimited:
+            return
+        with self._condition:
+            self._tokens.available += estimated_tokens - actual_tokens
+            self._condition.notify_all()
+    
+    def expected_wait(self, tokens: int = 0, priority: str = "interactive") -> float:
+        """Seconds a new request would wait behind the requests queued at or above its priority"""
+        if not self.enabled:
+            return 0.0
+        level = PRIORITIES.get(priority, PRIORITIES["batch"])
+        with self._condition:
+            ahead = [entry for entry in self._queue if entry[0] <= level]
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            waits = []
+            for bucket, needed in ((self._requests, len(ahead) + 1), (self._tokens, sum(e[2] for e in ahead) + tokens)):
+                if not bucket.unlimited:
+                    waits.append(max(0.0, (needed - bucket.available) * 60.0 / bucket.per_minute))
+            return max(waits, default=0.0)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, expected wait and admission counters"""
+        with self._condition:
+            stats = dict(self._stats)
+            depth = {name: sum(1 for entry in self._queue if entry[0] == level) for name, level in PRIORITIES.items()}
+            stats["requests_available"] = None if self._requests.unlimited else round(self._requests.available, 2)
+            stats["tokens_available"] = None if self._tokens.unlimited else round(self._tokens.available)
+        stats["queue_depth"] = sum(depth.values())
+        stats["queue_depth_by_priority"] = depth
+        stats["expected_wait"] = self.expected_wait()
+        return stats
\ No newline at end of file
@@ -0,0 +1,95 @@
+from typing import List, Tuple, Optional
+import re
+import numpy as np
+from config import Config
+from src.text_splitter import TextSplitter, Span
+
+# A sentence ends after terminal punctuation followed by whitespace, or at a blank line
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+class SemanticChunker:
+    """Groups sentences into chunks, starting a new chunk where topic similarity drops.
+    
+    All sentences of a text are encoded in one batched call. A boundary is
+    placed between adjacent sentences whose cosine distance is above the
+    SEMANTIC_BREAKPOINT_PERCENTILE of the text's distances, or wherever the
+    chunk would grow beyond max_chunk_size characters. Chunks are re-encoded
+    as a whole; with reuse_vectors the mean of their sentence vectors is
+    stored instead, which saves that pass but only approximates the chunk
+    embedding.
+    """
+    
+    def __init__(
+        self,
+        embedding_model,
+        max_chunk_size: Optional[int] = None,
+        breakpoint_percentile: Optional[float] = None,
+        reuse_vectors: Optional[bool] = None,
+    ):
+        self.embedding_model = embedding_model
+        self.max_chunk_size = Config.CHUNK_SIZE if max_chunk_size is None else max_chunk_size
+        self.breakpoint_percentile = (
+            Config.SEMANTIC_BREAKPOINT_PERCENTILE if breakpoint_percentile is None else breakpoint_percentile
+        )
+        self.reuse_vectors = Config.SEMANTIC_REUSE_VECTORS if reuse_vectors is None else reuse_vectors
+        # Sentences longer than a chunk are pre-split like regular character chunks
+        self._sentence_splitter = TextSplitter(chunk_size=self.max_chunk_size, chunk_overlap=0)
+    
+    def split_sentences(self, text: str) -> List[Span]:
+        """Return (start, end) offsets of the sentences in text"""
+        spans = []
+        start = 0
+        for match in _SENTENCE_BOUNDARY.finditer(text):
+            spans.extend(self._sentence_spans(text, start, match.start()))
+            start = match.end()
+        spans.extend(self._sentence_spans(text, start, len(text)))
+        return spans
+    
+    def _sentence_spans(self, text: str, start: int, end: int) -> List[Span]:
+        span = TextSplitter._strip_span(text, start, end)
+        if span is None:
+            return []
+        if span[1] - span[0] <= self.max_chunk_size:
+            return [span]
+        return [
+            (span[0] + piece_start, span[0] + piece_end)
+            for piece_start, piece_end in self._sentence_splitter.split_spans(text[span[0]:span[1]])
+        ]
+    
+    def split(self, text: str) -> List[Tuple[str, Optional[np.ndarray]]]:
+        """Split text into (chunk, vector) pairs; vector is None when it must be encoded separately"""
+        sentences = self.split_sentences(text)
+        if not sentences:
+            return []
+        
+        vectors = self.embedding_model.encode([text[start:end] for start, end in sentences])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        unit_vectors = vectors / np.where(norms == 0, 1, norms)
+        distances = 1.0 - np.sum(unit_vectors[:-1] * unit_vectors[1:], axis=1)
+        threshold = np.percentile(distances, self.breakpoint_percentile) if len(distances) else 0.0
+        
+        chunks = []
+        first = 0
+        for i in range(1, len(sentences) + 1):
+            at_end = i == len(sentences)
+            if not at_end:
+                too_long = sentences[i][1] - sentences[first][0] > self.max_chunk_size
+                topic_shift = distances[i - 1] > threshold
+                if not (too_long or topic_shift):
+                    continue
+            chunks.append(self._build_chunk(text, sentences, vectors, first, i))
+            first = i
+        
+        return chunks
+    
+    def _build_chunk(self, text: str, sentences: List[Span], vectors: np.ndarray, first: int, last: int):
+        """Join sentences[first:last] into a chunk and derive its vector"""
+        chunk = text[sentences[first][0]:sentences[last - 1][1]]
+        if last - first == 1:
+            # The chunk is exactly one encoded sentence
+            return chunk, vectors[first]
+        if self.reuse_vectors:
+            # Mean-pooled sentence vectors approximate the chunk embedding
+            return chunk, vectors[first:last].mean(axis=0)
+        return chunk, None
\ No newline at end of file
@@ -0,0 +1,92 @@
+from typing import Dict, Any, Hashable, Callable, Awaitable, Tuple
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its result.
+    
+    Only calls that overlap are coalesced. Nothing is remembered once the
+    leading call returns, so this is not a cache.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._executed = 0
+        self._coalesced = 0
+    
+    def do(self, key: Hashable, func: Callable, *args) -> Tuple[Any, bool]:
+        """Return (result, shared); shared is True when another caller's result was reused"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+                leader = True
+            else:
+                self._coalesced += 1
+                leader = False
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        
+        try:
+            call.result = func(*args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Executed and coalesced call counters"""
+        with self._lock:
+            return {
+                "executed": self._executed,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._calls)
+            }
+
+
+class AsyncSingleFlight:
+    """asyncio variant of SingleFlight; use from a single event loop"""
+    
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._executed = 0
+        self._coalesced = 0
+    
+    async def do(self, key: Hashable, func: Callable[..., Awaitable], *args) -> Tuple[Any, bool]:
+        """Return (result, shared); shared is True when another caller's result was reused"""
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self._coalesced += 1
+        else:
+            self._executed += 1
+            task = self._tasks[key] = asyncio.ensure_future(func(*args))
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # A cancelled caller must not cancel the call the other callers are waiting on
+        return await asyncio.shield(task), shared
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Executed and coalesced call counters"""
+        return {
+            "executed": self._executed,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._tasks)
+        }
\ No newline at end of file
@@ -0,0 +1,67 @@
+from typing import Dict, Any, Optional, Callable, TypeVar
+import threading
+from cachetools import TTLCache
+from config import Config
+from src.single_flight import SingleFlight
+
+T = TypeVar("T")
+
+
+class StatsService:
+    """Collection statistics cached for STATS_CACHE_TTL seconds.
+    
+    Entries are dropped as soon as the vector database's generation counter
+    moves (ingest, delete, reset), so the TTL only bounds staleness from
+    writes made by other processes. Concurrent misses for the same entry
+    share one database round trip. Cached values are shared between
+    callers and must not be mutated.
+    """
+    
+    def __init__(self, vector_db, ttl: Optional[float] = None, max_entries: int = 256):
+        self.vector_db = vector_db
+        self.ttl = Config.STATS_CACHE_TTL if ttl is None else ttl
+        self._cache = TTLCache(maxsize=max_entries, ttl=self.ttl) if self.ttl > 0 else None
+        self._generation = vector_db.generation
+        self._lock = threading.Lock()
+        self._in_flight = SingleFlight()
+        self._stats = {"hits": 0, "misses": 0}
+    
+    def _current_generation(self) -> int:
+        """Generation of the collection, clearing the cache if it moved (call with the lock held)"""
+        generation = self.vector_db.generation
+        if generation != self._generation:
+            self._cache.clear()
+            self._generation = generation
+        return generation
+    
+    def get(self, name: str, compute: Callable[[], T]) -> T:
+        """Cached value of name, computed (once across concurrent callers) on a miss"""
+        if self._cache is None:
+            return compute()
+        with self._lock:
+            generation = self._current_generation()
+            if name in self._cache:
+                self._stats["hits"] += 1
+                return self._cache[name]
+            self._stats["misses"] += 1
+        
+        value, _ = self._in_flight.do((name, generation), compute)
+        with self._lock:
+            # A value computed while the collection changed may already be stale
+            if self._current_generation() == generation:
+                self._cache[name] = value
+        return value
+    
+    def invalidate(self):
+        """Drop every cached entry"""
+        if self._cache is not None:
+            with self._lock:
+                self._cache.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit and miss counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._cache) if self._cache is not None else 0
+        stats["ttl"] = self.ttl
+        return stats
\ No newline at end of file
@@ -0,0 +1,121 @@
+from typing import Dict, Any, Optional
+import threading
+from config import Config
+
+# Set by setup() when OTEL_ENABLED; while None every helper below is a no-op
+_tracer = None
+_meter = None
+_instruments: Dict[str, Any] = {}
+_lock = threading.Lock()
+_configured = False
+
+
+class _NoopSpan:
+    """Stands in for a span (and its context manager) while tracing is off"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def set_attribute(self, key: str, value: Any):
+        pass
+    
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def setup() -> bool:
+    """Install OpenTelemetry trace and metric exporters if OTEL_ENABLED; idempotent.
+    
+    OTEL_EXPORTER is "console" (stdout) or "otlp" (gRPC to
+    OTEL_EXPORTER_OTLP_ENDPOINT, e.g. a local collector). opentelemetry is
+    only imported here, so a disabled setup costs nothing.
+    """
+    global _tracer, _meter, _configured
+    with _lock:
+        if _configured:
+            return _tracer is not None
+        _configured = True
+        if not Config.OTEL_ENABLED:
+            return False
+        
+        from opentelemetry import metrics, trace
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        
+        if Config.OTEL_EXPORTER == "console":
+            span_exporter, metric_exporter = ConsoleSpanExporter(), ConsoleMetricExporter()
+        elif Config.OTEL_EXPORTER == "otlp":
+            from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            
+            endpoint = Config.OTEL_EXPORTER_OTLP_ENDPOINT
+            insecure = endpoint.startswith("http://")
+            span_exporter = OTLPSpanExporter(endpoint=endpoint, insecure=insecure)
+            metric_exporter = OTLPMetricExporter(endpoint=endpoint, insecure=insecure)
+        else:
+            raise ValueError(f"Unsupported OTEL_EXPORTER: {Config.OTEL_EXPORTER}. Use 'console' or 'otlp'.")
+        
+        resource = Resource.create({"service.name": Config.OTEL_SERVICE_NAME})
+        tracer_provider = TracerProvider(resource=resource)
+        tracer_provider.add_span_processor(BatchSpanProcessor(span_exporter))
+        trace.set_tracer_provider(tracer_provider)
+        metrics.set_meter_provider(MeterProvider(
+            resource=resource,
+            metric_readers=[PeriodicExportingMetricReader(metric_exporter)]
+        ))
+        
+        _tracer = trace.get_tracer("rag-system")
+        _meter = metrics.get_meter("rag-system")
+        _instruments["stage_duration"] = _meter.create_histogram(
+            "rag.stage.duration", unit="s", description="Time spent in a query or ingest stage"
+        )
+        _instruments["queries"] = _meter.create_counter(
+            "rag.queries", description="Answered queries, by cache outcome"
+        )
+        _instruments["llm_tokens"] = _meter.create_counter(
+            "rag.llm.tokens", unit="{token}", description="Tokens reported by the LLM backend"
+        )
+        _instruments["embedded_texts"] = _meter.create_counter(
+            "rag.embedding.texts", description="Texts encoded by the embedding model"
+        )
+        _instruments["inserted_chunks"] = _meter.create_counter(
+            "rag.vector_db.inserted", description="Chunks inserted into the vector database"
+        )
+        print(f"✅ OpenTelemetry export enabled ({Config.OTEL_EXPORTER})")
+        return True
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """Context manager for a child span of the current one; the span is yielded for more attributes.
+    
+    Must not be held across a yield of a generator, which would leak the
+    span into the consumer's context.
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def record_stage(stage: str, seconds: float):
+    """Add a sample to the rag.stage.duration histogram"""
+    if _tracer is not None:
+        _instruments["stage_duration"].record(seconds, {"rag.stage": stage})
+
+
+def add(counter: str, value: int, attributes: Optional[Dict[str, Any]] = None):
+    """Increment one of the counters created in setup (queries, llm_tokens, embedded_texts, inserted_chunks)"""
+    if _tracer is not None and value:
+        _instruments[counter].add(value, attributes)
\ No newline at end of file
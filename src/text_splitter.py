@@ -0,0 +1,229 @@
+from bisect import bisect_left
+from typing import List, Tuple, Optional, Callable, Union
+from config import Config
+
+Span = Tuple[int, int]
+TextInput = Union[str, bytes, bytearray, memoryview]
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+class TextSplitter:
+    """Recursive character splitter that works on (start, end) offsets.
+    
+    Uses the same separators, overlap and whitespace-stripping rules as
+    LangChain's RecursiveCharacterTextSplitter (keep_separator=True), so
+    split_text returns the exact same strings. split_spans never copies the
+    input: every piece is an offset pair into the original string.
+    """
+    
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        separators: Optional[List[str]] = None,
+        span_length: Optional[Callable[[int, int], int]] = None,
+    ):
+        self.chunk_size = Config.CHUNK_SIZE if chunk_size is None else chunk_size
+        self.chunk_overlap = Config.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        if self.chunk_overlap > self.chunk_size:
+            raise ValueError(
+                f"Chunk overlap ({self.chunk_overlap}) is larger than chunk size ({self.chunk_size})"
+            )
+        self.separators = list(separators) if separators is not None else list(DEFAULT_SEPARATORS)
+        # Length of text[start:end]; None measures characters without a call per piece
+        self.span_length = span_length
+    
+    @staticmethod
+    def as_text(text: TextInput) -> str:
+        """Return text as str, decoding UTF-8 bytes or memoryview buffers in one pass"""
+        if isinstance(text, str):
+            return text
+        return str(text, "utf-8")
+    
+    def split_text(self, text: TextInput) -> List[str]:
+        """Split text into chunk strings (identical to RecursiveCharacterTextSplitter)"""
+        text = self.as_text(text)
+        return [text[start:end] for start, end in self.split_spans(text)]
+    
+    def split_spans(self, text: TextInput) -> List[Span]:
+        """Split text into chunks, returned as (start, end) offsets"""
+        text = self.as_text(text)
+        return self._split(text, 0, len(text), self.separators)
+    
+    def _split(self, text: str, start: int, end: int, separators: List[str]) -> List[Span]:
+        """Recursively split text[start:end] with the first separator present in it"""
+        separator = separators[-1]
+        new_separators = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                new_separators = separators[i + 1:]
+                break
+        
+        final_spans = []
+        good_spans = []
+        good_lengths = []
+        span_length = self.span_length
+        for span in self._split_on_separator(text, start, end, separator):
+            length = span[1] - span[0] if span_length is None else span_length(*span)
+            if length < self.chunk_size:
+                good_spans.append(span)
+                good_lengths.append(length)
+            else:
+                if good_spans:
+                    final_spans.extend(self._merge_spans(text, good_spans, good_lengths))
+                    good_spans = []
+                    good_lengths = []
+                if not new_separators:
+                    final_spans.append(span)
+                else:
+                    final_spans.extend(self._split(text, span[0], span[1], new_separators))
+        
+        if good_spans:
+            final_spans.extend(self._merge_spans(text, good_spans, good_lengths))
+        
+        return final_spans
+    
+    @staticmethod
+    def _split_on_separator(text: str, start: int, end: int, separator: str) -> List[Span]:
+        """Split text[start:end] before every separator occurrence, keeping the separator"""
+        if not separator:
+            return [(i, i + 1) for i in range(start, end)]
+        
+        spans = []
+        piece_start = start
+        position = text.find(separator, start, end)
+        while position != -1:
+            if position > piece_start:
+                spans.append((piece_start, position))
+            piece_start = position
+            position = text.find(separator, position + len(separator), end)
+        if end > piece_start:
+            spans.append((piece_start, end))
+        return spans
+    
+    def _merge_spans(self, text: str, spans: List[Span], lengths: List[int]) -> List[Span]:
+        """Merge adjacent small spans into chunks of at most chunk_size with overlap.
+        
+        The spans are contiguous, so the current chunk is just the window
+        spans[first:i] and no intermediate strings are built.
+        """
+        chunk_size = self.chunk_size
+        chunk_overlap = self.chunk_overlap
+        chunks = []
+        first = 0
+        total = 0
+        
+        for i, length in enumerate(lengths):
+            if total + length > chunk_size and first < i:
+                chunk = self._strip_span(text, spans[first][0], spans[i - 1][1])
+                if chunk is not None:
+                    chunks.append(chunk)
+                while total > chunk_overlap or (total + length > chunk_size and total > 0):
+                    total -= lengths[first]
+                    first += 1
+            total += length
+        
+        if first < len(spans):
+            chunk = self._strip_span(text, spans[first][0], spans[-1][1])
+            if chunk is not None:
+                chunks.append(chunk)
+        
+        return chunks
+    
+    @staticmethod
+    def _strip_span(text: str, start: int, end: int) -> Optional[Span]:
+        """Trim surrounding whitespace from a span; None if nothing is left"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start == end:
+            return None
+        return (start, end)
+
+
+class TokenBudgetSplitter:
+    """Splits text so that every chunk fits a tokenizer's token budget.
+    
+    Each text is tokenized once with offset mapping; span lengths are then
+    answered by bisecting token start offsets, so the recursive splitter
+    never re-tokenizes a piece. A single batched call verifies the chunks
+    at the end and re-cuts the rare chunk that tokenizes longer standalone.
+    """
+    
+    def __init__(
+        self,
+        tokenizer,
+        max_tokens: int,
+        chunk_overlap: int = 0,
+        separators: Optional[List[str]] = None,
+    ):
+        if max_tokens <= 0:
+            raise ValueError(f"Token budget must be positive, got {max_tokens}")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.chunk_overlap = min(chunk_overlap, max_tokens)
+        self.separators = separators
+    
+    def _token_starts(self, text: str) -> List[int]:
+        """Return the character offset at which each token of text starts"""
+        encoding = self.tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False,
+        )
+        return [start for start, _ in encoding["offset_mapping"]]
+    
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Count tokens (without special tokens) for many texts in one batched call"""
+        if not texts:
+            return []
+        encoding = self.tokenizer(texts, add_special_tokens=False, verbose=False)
+        return [len(ids) for ids in encoding["input_ids"]]
+    
+    def split_spans(self, text: TextInput) -> List[Span]:
+        """Split text into (start, end) offsets measured in tokens"""
+        text = TextSplitter.as_text(text)
+        starts = self._token_starts(text)
+        
+        def span_length(start: int, end: int) -> int:
+            return bisect_left(starts, end) - bisect_left(starts, start)
+        
+        splitter = TextSplitter(
+            chunk_size=self.max_tokens,
+            chunk_overlap=self.chunk_overlap,
+            separators=self.separators,
+            span_length=span_length,
+        )
+        return splitter.split_spans(text)
+    
+    def split_text(self, text: TextInput) -> List[str]:
+        """Split text into chunks that each fit within max_tokens"""
+        text = TextSplitter.as_text(text)
+        chunks = [text[start:end] for start, end in self.split_spans(text)]
+        
+        fitted = []
+        for chunk, count in zip(chunks, self.count_tokens(chunks)):
+            if count <= self.max_tokens:
+                fitted.append(chunk)
+            else:
+                fitted.extend(self._cut_to_budget(chunk))
+        return fitted
+    
+    def _cut_to_budget(self, text: str) -> List[str]:
+        """Hard-cut text at token boundaries into pieces of at most max_tokens"""
+        starts = self._token_starts(text)
+        pieces = []
+        for first in range(0, len(starts), self.max_tokens):
+            start = starts[first]
+            end = starts[first + self.max_tokens] if first + self.max_tokens < len(starts) else len(text)
+            piece = text[start:end].strip()
+            if piece:
+                pieces.append(piece)
+        return pieces
\ No newline at end of file
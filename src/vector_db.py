@@ -1,12 +1,16 @@
 from pymilvus import MilvusClient, CollectionSchema, FieldSchema, DataType
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterator
+import asyncio
+import json
 import os
+import threading
 import numpy as np
 from config import Config
+from src import telemetry
 
 
 class VectorDatabase:
-    def __init__(self):
+    def __init__(self, embedding_model=None):
         # Dynamic Milvus connection based on environment
         if Config.IS_DEVELOPMENT:
             # Local Milvus using milvus-lite
@@ -28,16 +32,32 @@ class VectorDatabase:
             print(f"☁️ Connecting to cloud Milvus: {Config.MILVUS_URI}")
         
         self.collection_name = Config.COLLECTION_NAME
+        self._async_client = None
+        
+        # Bumped whenever the collection's contents change, so caches can invalidate
+        self.generation = 0
+        self._generation_lock = threading.Lock()
+        # Called after every bump, e.g. to tell other processes through a shared counter
+        self.on_change: List[Callable[[], None]] = []
         
         # Get embedding dimension from the embedding model
-        from src.embeddings import EmbeddingModel
-        embedding_model = EmbeddingModel()
+        if embedding_model is None:
+            from src.embeddings import EmbeddingModel
+            embedding_model = EmbeddingModel()
+        self.embedding_model = embedding_model
         self.embedding_dim = embedding_model.get_embedding_dimension()
         
         # Create collection if it doesn't exist
         if not self.client.has_collection(self.collection_name):
             self._create_collection()
     
+    def bump_generation(self):
+        """Mark the collection as changed"""
+        with self._generation_lock:
+            self.generation += 1
+        for callback in self.on_change:
+            callback()
+    
     def _create_collection(self):
         """Create a Milvus collection with appropriate schema"""
         # Define the schema with proper field types
@@ -73,8 +93,9 @@ class VectorDatabase:
         
         print(f"✅ Created Milvus collection '{self.collection_name}' with index")
     
-    def add_documents(self, documents: List[str], metadatas: List[Dict[str, Any]] | None = None, ids: List[str] | None = None):
-        """Add documents to the vector database"""
+    def add_documents(self, documents: List[str], metadatas: List[Dict[str, Any]] | None = None, ids: List[str] | None = None,
+                      embeddings: np.ndarray | None = None):
+        """Add documents to the vector database, embedding them unless embeddings are given"""
         if ids is None:
             ids = [f"doc_{i}" for i in range(len(documents))]
         
@@ -82,11 +103,21 @@ class VectorDatabase:
             metadatas = [{"source": f"document_{i}"} for i in range(len(documents))]
         
         # Generate embeddings
-        from src.embeddings import EmbeddingModel
-        embedding_model = EmbeddingModel()
-        embeddings = embedding_model.encode(documents)
+        if embeddings is None:
+            embeddings = self.embedding_model.encode(documents)
         
-        # Prepare data for insertion
+        data = self._build_rows(documents, metadatas, ids, embeddings)
+        
+        # Insert data
+        with telemetry.span("vector_db.insert", self._span_attributes({"rag.batch_size": len(data)})):
+            self.client.insert(collection_name=self.collection_name, data=data)
+        telemetry.add("inserted_chunks", len(data))
+        self.bump_generation()
+        print(f"✅ Inserted {len(data)} chunks")
+    
+    @staticmethod
+    def _build_rows(documents: List[str], metadatas: List[Dict[str, Any]], ids: List[str], embeddings) -> List[Dict[str, Any]]:
+        """Prepare data for insertion"""
         data = []
         for i, (doc, meta, emb) in enumerate(zip(documents, metadatas, embeddings)):
             data.append({
@@ -95,45 +126,121 @@ class VectorDatabase:
                 "metadata": meta,
                 "vector": emb.tolist()
             })
-        
-        # Insert data
-        self.client.insert(collection_name=self.collection_name, data=data)
-        print(f"✅ Inserted {len(data)} chunks")
+        return data
     
     def query(self, query_text: str, n_results: int | None = None) -> Dict[str, Any]:
         """Query the vector database"""
+        # Generate embedding for query
+        query_embedding = self.embedding_model.encode_single(query_text)
+        
+        return self.search(query_embedding, n_results)
+    
+    def search(self, query_embedding: np.ndarray, n_results: int | None = None) -> Dict[str, Any]:
+        """Search the vector database with an already computed query embedding"""
         if n_results is None:
             n_results = Config.MAX_RETRIEVED_DOCS
         
-        # Generate embedding for query
-        from src.embeddings import EmbeddingModel
-        embedding_model = EmbeddingModel()
-        query_embedding = embedding_model.encode_single(query_text)
-        
         # Perform search - let Milvus handle search params
-        search_results = self.client.search(
-            collection_name=self.collection_name,
-            data=[query_embedding.tolist()],
-            limit=n_results,
-            output_fields=["text", "metadata"]
-        )[0]
+        with telemetry.span("vector_db.search", self._span_attributes({"rag.top_k": n_results})) as span:
+            search_results = self.client.search(
+                collection_name=self.collection_name,
+                data=[query_embedding.tolist()],
+                limit=n_results,
+                output_fields=["text", "metadata"]
+            )[0]
+            span.set_attribute("rag.results", len(search_results))
         
-        # Format results to match ChromaDB format
-        formatted_results = {
+        return self._format_search_results(search_results)
+    
+    def _span_attributes(self, attributes: Dict[str, Any]) -> Dict[str, Any]:
+        return {"db.system": "milvus", "db.collection.name": self.collection_name, **attributes}
+    
+    @staticmethod
+    def _format_search_results(search_results) -> Dict[str, Any]:
+        """Format results to match ChromaDB format"""
+        return {
             "ids": [[result["id"] for result in search_results]],
             "documents": [[result["entity"]["text"] for result in search_results]],
             "metadatas": [[result["entity"]["metadata"] for result in search_results]],
             "distances": [[result["distance"] for result in search_results]]
         }
         
-        return formatted_results
+    def _get_async_client(self):
+        """Lazily create the AsyncMilvusClient inside the running event loop.
+        
+        milvus-lite has no async server, so local databases return None and the
+        async methods fall back to the sync client in a worker thread.
+        """
+        if self.connection_type == "local":
+            return None
+        if self._async_client is None:
+            from pymilvus import AsyncMilvusClient
+            self._async_client = AsyncMilvusClient(uri=Config.MILVUS_URI, token=Config.MILVUS_TOKEN)
+        return self._async_client
+    
+    async def asearch(self, query_embedding: np.ndarray, n_results: int | None = None) -> Dict[str, Any]:
+        """Async variant of search"""
+        client = self._get_async_client()
+        if client is None:
+            # to_thread carries the current trace context into the worker
+            return await asyncio.to_thread(self.search, query_embedding, n_results)
+        
+        if n_results is None:
+            n_results = Config.MAX_RETRIEVED_DOCS
+        
+        with telemetry.span("vector_db.search", self._span_attributes({"rag.top_k": n_results})) as span:
+            search_results = await client.search(
+                collection_name=self.collection_name,
+                data=[query_embedding.tolist()],
+                limit=n_results,
+                output_fields=["text", "metadata"]
+            )
+            span.set_attribute("rag.results", len(search_results[0]))
+        return self._format_search_results(search_results[0])
+    
+    async def aadd_documents(self, documents: List[str], metadatas: List[Dict[str, Any]], ids: List[str], embeddings: np.ndarray):
+        """Async variant of add_documents; embeddings must already be computed"""
+        client = self._get_async_client()
+        if client is None:
+            await asyncio.to_thread(self.add_documents, documents, metadatas, ids, embeddings)
+            return
+        
+        data = self._build_rows(documents, metadatas, ids, embeddings)
+        with telemetry.span("vector_db.insert", self._span_attributes({"rag.batch_size": len(data)})):
+            await client.insert(collection_name=self.collection_name, data=data)
+        telemetry.add("inserted_chunks", len(data))
+        self.bump_generation()
+        print(f"✅ Inserted {len(data)} chunks")
+    
+    def close(self):
+        """Close the Milvus client; the async client is closed by aclose"""
+        self.client.close()
+    
+    async def aclose(self):
+        """Close the async client, if one was opened"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+    
+    def count(self) -> int:
+        """Number of chunks in the collection.
+        
+        Counted with a count(*) query: get_collection_stats' row_count keeps
+        including deleted chunks until Milvus compacts the segments.
+        """
+        result = self.client.query(
+            collection_name=self.collection_name,
+            filter="",
+            output_fields=["count(*)"],
+            consistency_level="Strong"
+        )
+        return result[0]["count(*)"] if result else 0
     
     def get_collection_info(self) -> Dict[str, Any]:
         """Get information about the collection"""
-        stats = self.client.get_collection_stats(collection_name=self.collection_name)
         return {
             "name": Config.COLLECTION_NAME,
-            "document_count": stats.get("row_count", 0),
+            "document_count": self.count(),
             "connection_type": self.connection_type,
             "uri": Config.MILVUS_URI,
             "environment": Config.ENVIRONMENT
@@ -143,6 +250,7 @@ class VectorDatabase:
         """Delete the entire collection"""
         if self.client.has_collection(self.collection_name):
             self.client.drop_collection(collection_name=self.collection_name)
+        self.bump_generation()
     
     def get_all_documents(self) -> Dict[str, Any]:
         """Get all documents from the collection"""
@@ -163,6 +271,56 @@ class VectorDatabase:
         
         return formatted_results
     
+    def get_chunks_by_source(self, source: str, chunk_id: int | None = None, limit: int = 1) -> List[Dict[str, Any]]:
+        """Chunks whose metadata source is `source`, optionally only the one with the given chunk_id"""
+        expression = f'metadata["source"] == {json.dumps(source)}'
+        if chunk_id is not None:
+            expression += f' and metadata["chunk_id"] == {int(chunk_id)}'
+        return self.client.query(
+            collection_name=self.collection_name,
+            filter=expression,
+            output_fields=["id", "text", "metadata"],
+            limit=limit
+        )
+    
+    def iter_documents(self, output_fields: List[str] | None = None, batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """Iterate over every stored chunk in batches, without the 16384-row query limit"""
+        if output_fields is None:
+            output_fields = ["id", "text", "metadata"]
+        
+        iterator = self.client.query_iterator(
+            collection_name=self.collection_name,
+            batch_size=batch_size,
+            filter="id != ''",
+            output_fields=output_fields
+        )
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                yield batch
+        finally:
+            iterator.close()
+    
+    def truncate(self) -> int:
+        """Delete every chunk but keep the collection, its schema and its index; returns the number deleted"""
+        if not self.client.has_collection(self.collection_name):
+            self._create_collection()
+            deleted = 0
+        else:
+            result = self.client.delete(collection_name=self.collection_name, filter="id != ''")
+            deleted = result.get("delete_count", 0) if isinstance(result, dict) else 0
+        self.bump_generation()
+        print(f"✅ Deleted {deleted} chunks from '{self.collection_name}'")
+        return deleted
+    
+    def delete_documents(self, ids: List[str]) -> int:
+        """Delete chunks by id; returns the number deleted"""
+        result = self.client.delete(collection_name=self.collection_name, ids=ids)
+        self.bump_generation()
+        return result.get("delete_count", len(ids)) if isinstance(result, dict) else len(ids)
+    
     def reset_database(self):
         """Reset the entire database"""
         try:
@@ -174,4 +332,5 @@ class VectorDatabase:
             print(f"⚠️  Error dropping collection: {e}")
         
         # Recreate collection
-        self._create_collection()
\ No newline at end of file
+        self._create_collection()
+        self.bump_generation()
\ No newline at end of file
@@ -208,12 +208,30 @@ if "uploaded_files" not in st.session_state:
 if "added_texts" not in st.session_state:
     st.session_state.added_texts = []
 
+if "ingest_jobs" not in st.session_state:
+    st.session_state.ingest_jobs = []
+
+# One pipeline (embedding model, Milvus client, caches) per server process, shared by every session
+@st.cache_resource(show_spinner=False)
+def get_shared_pipeline():
+    logger.info("Building shared RAG pipeline...")
+    return RAGPipeline()
+
+# Sessions re-fetch the shared pipeline on every run, so a reinitialized pipeline reaches all of them
+if st.session_state.rag_initialized:
+    try:
+        st.session_state.rag_pipeline = get_shared_pipeline()
+    except Exception as e:
+        logger.error(f"Failed to load shared RAG pipeline: {e}")
+        st.session_state.rag_initialized = False
+        st.session_state.rag_pipeline = None
+
 # Function to initialize RAG system
 def initialize_rag_system():
     try:
         with st.spinner("Initializing..."):
             logger.info("Starting RAG System initialization...")
-            st.session_state.rag_pipeline = RAGPipeline()
+            st.session_state.rag_pipeline = get_shared_pipeline()
             st.session_state.rag_initialized = True
             logger.info("RAG System initialized successfully!")
             st.success("✅ System ready!")
@@ -227,47 +245,18 @@ def initialize_rag_system():
 # Function to rebuild database
 def rebuild_database():
     try:
-        # Show warning and confirmation
-        st.warning("⚠️ **WARNING**: This will permanently delete ALL documents from the database!")
-        st.info("📋 What will happen:")
-        st.markdown("- 🗑️ All uploaded documents will be deleted")
-        st.markdown("- 📄 Document count will reset to 0") 
-        st.markdown("- 🔄 Fresh empty database will be created")
-        st.markdown("- 📝 Upload history will be cleared")
+        with st.spinner("🗑️ Deleting all documents..."):
+            logger.info("Starting database reset...")
+            # Truncates in-process on the shared connection; no subprocess, no model reload
+            result = st.session_state.rag_pipeline.reset(mode="truncate")
         
-        # Add a small delay for user to see the warning
-        import time
-        time.sleep(2)
+        logger.info(f"Database reset successfully! ({result['deleted']} chunks in {result['seconds']:.2f}s)")
+        st.toast(f"✅ Database reset: {result['deleted']} chunks deleted")
         
-        with st.spinner("🗑️ Resetting database to fresh state..."):
-            logger.info("Starting database reset...")
-            import subprocess
-            result = subprocess.run(
-                ['python', 'manage_db.py', 'rebuild'],
-                capture_output=True,
-                text=True,
-                cwd=os.path.dirname(os.path.abspath(__file__))
-            )
-            if result.returncode == 0:
-                logger.info("Database reset successfully!")
-                st.success("✅ Database has been reset to empty state!")
-                st.info("📊 Database is now ready for fresh document uploads.")
-                
-                # Clear upload tracking after reset
-                st.session_state.uploaded_files = []
-                st.session_state.added_texts = []
-                
-                # Show success details
-                if result.stdout:
-                    st.markdown("**Reset Details:**")
-                    st.code(result.stdout)
-                
-                time.sleep(2)  # Brief pause to show success
-                st.rerun()
-            else:
-                error_msg = f"Database reset error: {result.stderr}"
-                logger.error(error_msg)
-                st.error(f"❌ {error_msg}")
+        # Clear upload tracking after reset
+        st.session_state.uploaded_files = []
+        st.session_state.added_texts = []
+        st.rerun()
     except Exception as e:
         error_msg = f"Error resetting database: {e}"
         logger.error(error_msg)
@@ -291,6 +280,44 @@ def log_document_upload(filename, chunk_count, file_type="file"):
             "time": datetime.now().strftime("%H:%M:%S")
         })
 
+# Progress of this session's background ingestion jobs, polled every second until they finish
+@st.fragment(run_every=1.0)
+def show_ingest_jobs():
+    jobs = st.session_state.rag_pipeline.ingest_jobs
+    finished = False
+    for job_id in list(st.session_state.ingest_jobs):
+        job = jobs.get(job_id)
+        if job is None:
+            st.session_state.ingest_jobs.remove(job_id)
+            continue
+        
+        for file in job["files"]:
+            if file["status"] == "done":
+                value, label = 1.0, f"✅ {file['name']}: {file['inserted']} chunks"
+            elif file["status"] == "failed":
+                value, label = 1.0, f"❌ {file['name']}: {file['error']}"
+            elif file["status"] == "queued":
+                value, label = 0.0, f"⏳ {file['name']}: queued"
+            else:
+                value = file["inserted"] / file["chunks"] if file["chunks"] else 0.0
+                label = (f"⚙️ {file['name']}: {file['stage'] or 'starting'} "
+                         f"({file['pages']} pages, {file['chunks']} chunks, {file['inserted']} inserted)")
+            st.progress(min(value, 1.0), text=label)
+        
+        if job["status"] in ("done", "failed"):
+            for file in job["files"]:
+                if file["status"] == "done":
+                    log_document_upload(file["name"], file["inserted"], "file")
+                else:
+                    logger.error(f"Failed to upload {file['name']}: {file['error']}")
+                    st.toast(f"❌ {file['name']}: {file['error']}")
+            st.session_state.ingest_jobs.remove(job_id)
+            finished = True
+    
+    if finished:
+        # Refresh the document list and counters outside this fragment
+        st.rerun()
+
 # Simple header with environment indicator
 env_icon = "🔧" if Config.IS_DEVELOPMENT else "☁️"
 env_text = "Local" if Config.IS_DEVELOPMENT else "Cloud"
@@ -316,8 +343,7 @@ with st.sidebar:
         try:
             info = st.session_state.rag_pipeline.get_system_info()
             chunk_count = info['vector_db']['document_count']
-            unique_docs = st.session_state.rag_pipeline.get_unique_documents()
-            unique_doc_count = len(unique_docs)
+            unique_doc_count = st.session_state.rag_pipeline.list_documents(limit=0)["total"]
             logger.info(f"System status checked - {unique_doc_count} unique documents ({chunk_count} chunks) in database")
             
             # Environment indicator
@@ -357,8 +383,15 @@ with st.sidebar:
                     help="⚠️ This will delete ALL documents and create a fresh empty database"):
             rebuild_database()
         
-        if st.button("🔄 Reinitialize", use_container_width=True):
+        # Rebuilding affects every session on this server, so only admins get the button
+        if Config.ADMIN_MODE and st.button("🔄 Reinitialize", use_container_width=True,
+                                           help="Rebuild the pipeline shared by all sessions"):
             logger.info("System reinitialization requested")
+            old_pipeline = st.session_state.rag_pipeline
+            get_shared_pipeline.clear()
+            if old_pipeline is not None:
+                # Other sessions may still be streaming or ingesting on it, so it is closed once they are done
+                old_pipeline.close_when_idle()
             st.session_state.rag_initialized = False
             st.session_state.rag_pipeline = None
             st.session_state.uploaded_files = []
@@ -394,122 +427,143 @@ if st.session_state.rag_initialized:
             
             # Display assistant response below (ChatGPT style)
             with st.chat_message("assistant"):
-                with st.spinner("Searching..."):
+                try:
+                    queue_status = st.session_state.rag_pipeline.llm.get_queue_status()
+                    if queue_status["queue_depth"] or queue_status["expected_wait"] >= 1:
+                        st.caption(f"⏳ {queue_status['queue_depth']} requests queued for the LLM, "
+                                   f"expected wait ~{queue_status['expected_wait']:.0f}s")
+                    
+                    with st.spinner("Searching..."):
+                        events = st.session_state.rag_pipeline.query_stream(user_query, max_results=5)
+                        result = next(events)  # Sources arrive before the first answer token
+                    
+                    stream_stats = {}
+                    
+                    def answer_tokens():
+                        for event in events:
+                            if event["type"] == "token":
+                                yield event["content"]
+                            elif event["type"] == "done":
+                                stream_stats.update(event)
+                    
                     try:
-                        result = st.session_state.rag_pipeline.query(user_query, max_results=5)
-                        response_text = result.get("answer", "No response found")
-                        logger.info(f"Generated response: {len(response_text)} chars")
-                        st.markdown(response_text)
-                        
-                        # Show sources with single collapsible containing all sources
-                        if result.get("sources"):
-                            with st.expander(f"📚 Sources ({len(result['sources'])} chunks)", expanded=False):
-                                for i, source in enumerate(result["sources"], 1):
-                                    metadata = source.get('metadata', {})
-                                    
-                                    # Extract document name
-                                    doc_name = metadata.get('source', 'Unknown Document')
-                                    if '/' in doc_name:
-                                        doc_name = doc_name.split('/')[-1]
-                                    
-                                    # Extract chunk info
-                                    chunk_id = metadata.get('chunk_id', i-1)
-                                    
-                                    # Calculate match percentage
-                                    distance = source.get('distance')
-                                    if distance is not None:
-                                        match_percent = f"{(1 - distance) * 100:.0f}%"
-                                        match_color = "🟢" if (1 - distance) > 0.8 else "🟡" if (1 - distance) > 0.6 else "🔴"
-                                    else:
-                                        match_percent = "N/A"
-                                        match_color = "⚪"
+                        response_text = st.write_stream(answer_tokens()) or "No response found"
+                    finally:
+                        # A rerun interrupts write_stream; closing the stream frees the LLM slot at once
+                        events.close()
+                    ttft = stream_stats.get("time_to_first_token") or 0.0
+                    prompt_tokens = (stream_stats.get("usage") or {}).get("prompt_tokens")
+                    logger.info(f"Generated response: {len(response_text)} chars (first token after {ttft:.2f}s, prompt tokens: {prompt_tokens})")
+                    
+                    # Show sources with single collapsible containing all sources
+                    if result.get("sources"):
+                        with st.expander(f"📚 Sources ({len(result['sources'])} chunks)", expanded=False):
+                            for i, source in enumerate(result["sources"], 1):
+                                metadata = source.get('metadata', {})
+                                
+                                # Extract document name
+                                doc_name = metadata.get('source', 'Unknown Document')
+                                if '/' in doc_name:
+                                    doc_name = doc_name.split('/')[-1]
+                                
+                                # Extract chunk info
+                                chunk_id = metadata.get('chunk_id', i-1)
+                                
+                                # Calculate match percentage
+                                distance = source.get('distance')
+                                if distance is not None:
+                                    match_percent = f"{(1 - distance) * 100:.0f}%"
+                                    match_color = "🟢" if (1 - distance) > 0.8 else "🟡" if (1 - distance) > 0.6 else "🔴"
+                                else:
+                                    match_percent = "N/A"
+                                    match_color = "⚪"
                                     
 # Get preview with interactive design
-                                    content = source.get('content', '')
-                                    if content:
-                                        words = content.split()[:30]
-                                        preview = ' '.join(words)
-                                        if len(content) > len(preview):
-                                            preview += "..."
-                                    else:
-                                        preview = "No content available"
+                                content = source.get('content', '')
+                                if content:
+                                    words = content.split()[:30]
+                                    preview = ' '.join(words)
+                                    if len(content) > len(preview):
+                                        preview += "..."
+                                else:
+                                    preview = "No content available"
                                     
-                                    # Modern card design with interactive elements
-                                    match_value = (1 - distance) * 100 if distance is not None else 0
+                                # Modern card design with interactive elements
+                                match_value = (1 - distance) * 100 if distance is not None else 0
                                     
-                                    # Color scheme based on match
-                                    if match_value > 80:
-                                        bg_color = "#d4edda"
-                                        border_color = "#28a745"
-                                        match_color = "#155724"
-                                        match_bg = "#28a745"
-                                    elif match_value > 60:
-                                        bg_color = "#fff3cd"
-                                        border_color = "#ffc107"
-                                        match_color = "#856404"
-                                        match_bg = "#ffc107"
-                                    else:
-                                        bg_color = "#f8d7da"
-                                        border_color = "#dc3545"
-                                        match_color = "#721c24"
-                                        match_bg = "#dc3545"
+                                # Color scheme based on match
+                                if match_value > 80:
+                                    bg_color = "#d4edda"
+                                    border_color = "#28a745"
+                                    match_color = "#155724"
+                                    match_bg = "#28a745"
+                                elif match_value > 60:
+                                    bg_color = "#fff3cd"
+                                    border_color = "#ffc107"
+                                    match_color = "#856404"
+                                    match_bg = "#ffc107"
+                                else:
+                                    bg_color = "#f8d7da"
+                                    border_color = "#dc3545"
+                                    match_color = "#721c24"
+                                    match_bg = "#dc3545"
                                     
-                                    # Interactive card
-                                    st.markdown(f"""
-                                    <div style='background: linear-gradient(135deg, {bg_color} 0%, rgba(255,255,255,0.95) 100%); 
-                                               border-left: 4px solid {border_color}; 
-                                               border-radius: 8px; 
-                                               padding: 12px 16px; 
-                                               margin: 8px 0; 
-                                               box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-                                               transition: all 0.3s ease;
-                                               cursor: pointer;
-                                               position: relative;
-                                               overflow: hidden;'>
-                                        <div style='display: flex; justify-content: space-between; align-items: center; margin-bottom: 8px;'>
-                                            <div style='display: flex; align-items: center; gap: 8px;'>
-                                                <div style='font-size: 16px;'>📄</div>
-                                                <div>
-                                                    <div style='font-weight: 600; font-size: 14px; color: #333; margin-bottom: 2px;'>{doc_name}</div>
-                                                    <div style='font-size: 12px; color: #666;'>Chunk {chunk_id + 1}</div>
-                                                </div>
-                                            </div>
-                                            <div style='text-align: right;'>
-                                                <div style='background: {match_bg}; color: white; 
-                                                           padding: 4px 8px; 
-                                                           border-radius: 12px; 
-                                                           font-size: 12px; 
-                                                           font-weight: 600;
-                                                           display: inline-block;'>
-                                                    {match_percent} Match
-                                                </div>
+                                # Interactive card
+                                st.markdown(f"""
+                                <div style='background: linear-gradient(135deg, {bg_color} 0%, rgba(255,255,255,0.95) 100%);
+                                           border-left: 4px solid {border_color};
+                                           border-radius: 8px;
+                                           padding: 12px 16px;
+                                           margin: 8px 0;
+                                           box-shadow: 0 2px 8px rgba(0,0,0,0.08);
+                                           transition: all 0.3s ease;
+                                           cursor: pointer;
+                                           position: relative;
+                                           overflow: hidden;'>
+                                    <div style='display: flex; justify-content: space-between; align-items: center; margin-bottom: 8px;'>
+                                        <div style='display: flex; align-items: center; gap: 8px;'>
+                                            <div style='font-size: 16px;'>📄</div>
+                                            <div>
+                                                <div style='font-weight: 600; font-size: 14px; color: #333; margin-bottom: 2px;'>{doc_name}</div>
+                                                <div style='font-size: 12px; color: #666;'>Chunk {chunk_id + 1}</div>
                                             </div>
                                         </div>
-                                        <div style='font-size: 13px; color: #444; line-height: 1.5; 
-                                                   border-top: 1px solid rgba(0,0,0,0.06); 
-                                                   padding-top: 8px; 
-                                                   margin-top: 8px;'>
-                                            {preview}
+                                        <div style='text-align: right;'>
+                                            <div style='background: {match_bg}; color: white;
+                                                       padding: 4px 8px;
+                                                       border-radius: 12px;
+                                                       font-size: 12px;
+                                                       font-weight: 600;
+                                                       display: inline-block;'>
+                                                {match_percent} Match
+                                            </div>
                                         </div>
-                                        <div style='position: absolute; top: 8px; right: 16px; 
-                                                   font-size: 10px; color: {border_color}; 
-                                                   font-weight: 600;'>#{i}</div>
                                     </div>
-                                    <style>
-                                        .source-card:hover {{
-                                            transform: translateY(-2px);
-                                            box-shadow: 0 4px 16px rgba(0,0,0,0.12);
-                                            border-left-width: 6px;
-                                        }}
-                                    </style>
-                                    """, unsafe_allow_html=True)
+                                    <div style='font-size: 13px; color: #444; line-height: 1.5;
+                                               border-top: 1px solid rgba(0,0,0,0.06);
+                                               padding-top: 8px;
+                                               margin-top: 8px;'>
+                                        {preview}
+                                    </div>
+                                    <div style='position: absolute; top: 8px; right: 16px;
+                                               font-size: 10px; color: {border_color};
+                                               font-weight: 600;'>#{i}</div>
+                                </div>
+                                <style>
+                                    .source-card:hover {{
+                                        transform: translateY(-2px);
+                                        box-shadow: 0 4px 16px rgba(0,0,0,0.12);
+                                        border-left-width: 6px;
+                                    }}
+                                </style>
+                                """, unsafe_allow_html=True)
                         
-                        st.session_state.messages.append({"role": "assistant", "content": response_text})
+                    st.session_state.messages.append({"role": "assistant", "content": response_text})
                         
-                    except Exception as e:
-                        error_msg = f"Query error: {e}"
-                        logger.error(error_msg)
-                        st.error(f"Error: {e}")
+                except Exception as e:
+                    error_msg = f"Query error: {e}"
+                    logger.error(error_msg)
+                    st.error(f"Error: {e}")
         
         # Chat history below input (display in chronological order - newest Q&A pairs at bottom)
         if st.session_state.messages:
@@ -539,34 +593,40 @@ if st.session_state.rag_initialized:
         # Document List at the top
         st.markdown("## 📚 All Documents in System")
         try:
-            unique_docs = st.session_state.rag_pipeline.get_unique_documents()
-            if unique_docs:
-                st.markdown(f"**Total Documents:** {len(unique_docs)}")
+            rag = st.session_state.rag_pipeline
+            if rag.list_documents(limit=0)["total"]:
+                # Only one page of catalog entries is rendered; previews are fetched when asked for
+                col1, col2, col3 = st.columns([3, 2, 1])
+                with col1:
+                    search = st.text_input("Search by name", key="doc_search")
+                with col2:
+                    sort_label = st.selectbox("Sort by", ["Name", "Most chunks"], key="doc_sort")
+                with col3:
+                    page_size = st.selectbox("Per page", [10, 25, 50], key="doc_page_size")
                 
-                # Show documents in expandable sections
-                with st.expander("📄 View All Documents", expanded=False):
-                    for i, doc in enumerate(unique_docs, 1):
-                        st.markdown(f"### {i}. {doc['source']}")
+                listing = rag.list_documents(limit=0, search=search)
+                page_count = max(1, -(-listing["total"] // page_size))
+                page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1, key="doc_page") if page_count > 1 else 1
+                listing = rag.list_documents(
+                    offset=(page_number - 1) * page_size,
+                    limit=page_size,
+                    sort="source" if sort_label == "Name" else "chunks",
+                    descending=sort_label == "Most chunks",
+                    search=search
+                )
+                st.markdown(f"**Total Documents:** {listing['total']} (page {page_number} of {page_count})")
                         
+                for i, doc in enumerate(listing["documents"], listing["offset"] + 1):
+                    with st.expander(f"{i}. {doc['source']} ({doc['total_chunks']} chunks)"):
                         # Show metadata if available
                         if doc['metadata']:
                             metadata_str = ", ".join([f"{k}: {v}" for k, v in doc['metadata'].items()])
                             if metadata_str:
                                 st.markdown(f"*Metadata: {metadata_str}*")
                         
-                        # Show chunk count
-                        st.markdown(f"**Chunks:** {doc['total_chunks']}")
-                        
-                        # Show preview of first chunk content
-                        if doc['chunks']:
-                            first_chunk = doc['chunks'][0]['content']
-                            content_preview = first_chunk[:300].replace('\n', ' ')
-                            if len(first_chunk) > 300:
-                                content_preview += "..."
-                            st.markdown(f"**Preview:** {content_preview}")
-                        
-                        if i < len(unique_docs):
-                            st.divider()
+                        if st.toggle("Show preview", key=f"preview_{doc['source']}"):
+                            preview = rag.get_document_preview(doc['source'])
+                            st.markdown(f"**Preview:** {preview}" if preview else "*No preview available*")
             else:
                 st.info("📄 **Database is empty** - No documents in the system yet.")
                 st.markdown("### 🚀 Get Started:")
@@ -602,61 +662,20 @@ if st.session_state.rag_initialized:
                     st.markdown(f"📄 {uploaded_file.name}")
                 
                 if st.button("📤 Upload Documents", use_container_width=True):
-                    total_chunks = 0
-                    successful_uploads = []
-                    failed_uploads = []
-                    
                     try:
-                        progress_bar = st.progress(0, text=f"Processing {len(uploaded_files)} files...")
-                        
-                        for i, uploaded_file in enumerate(uploaded_files):
-                            progress_bar.progress((i + 1) / len(uploaded_files), text=f"Processing {uploaded_file.name}...")
-                            
-                            try:
-                                temp_path = f"/tmp/{uploaded_file.name}"
-                                with open(temp_path, "wb") as f:
-                                    f.write(uploaded_file.getbuffer())
-                                
-                                chunk_count = st.session_state.rag_pipeline.ingest_document(temp_path)
-                                log_document_upload(uploaded_file.name, chunk_count, "file")
-                                
-                                successful_uploads.append({
-                                    "name": uploaded_file.name,
-                                    "chunks": chunk_count
-                                })
-                                total_chunks += chunk_count
-                                
-                                # Clean up temp file
-                                os.remove(temp_path)
-                                
-                            except Exception as file_error:
-                                failed_uploads.append({
-                                    "name": uploaded_file.name,
-                                    "error": str(file_error)
-                                })
-                                logger.error(f"Failed to upload {uploaded_file.name}: {file_error}")
-                        
-                        progress_bar.empty()
-                        
-                        # Show results
-                        if successful_uploads:
-                            st.success(f"✅ Successfully uploaded {len(successful_uploads)} files ({total_chunks} total chunks)")
-                            for upload in successful_uploads:
-                                st.markdown(f"✅ {upload['name']} ({upload['chunks']} chunks)")
-                        
-                        if failed_uploads:
-                            st.error(f"❌ Failed to upload {len(failed_uploads)} files:")
-                            for upload in failed_uploads:
-                                st.markdown(f"❌ {upload['name']}: {upload['error']}")
-                        
-                        if successful_uploads:
-                            st.rerun()
-                            
+                        # Uploads are parsed straight from memory, never written to a shared temp path
+                        uploads = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+                        job_id = st.session_state.rag_pipeline.ingest_jobs.submit_uploads(uploads)
+                        st.session_state.ingest_jobs.append(job_id)
+                        logger.info(f"Ingestion job {job_id} queued ({len(uploads)} files)")
                     except Exception as e:
                         error_msg = f"Upload error: {e}"
                         logger.error(error_msg)
                         st.error(f"❌ {error_msg}")
             
+            if st.session_state.ingest_jobs:
+                show_ingest_jobs()
+            
             st.markdown("---")
             st.markdown("### 📝 Add Custom Text")
             
@@ -705,8 +724,7 @@ if st.session_state.rag_initialized:
             st.markdown("### 📊 Statistics")
             try:
                 info = st.session_state.rag_pipeline.get_system_info()
-                unique_docs = st.session_state.rag_pipeline.get_unique_documents()
-                unique_doc_count = len(unique_docs)
+                unique_doc_count = st.session_state.rag_pipeline.list_documents(limit=0)["total"]
                 chunk_count = info['vector_db']['document_count']
                 
                 st.metric("Total Docs", str(unique_doc_count))
@@ -0,0 +1,134 @@
+import os
+import sys
+import zlib
+from typing import List, Dict, Any, Callable, Optional, Iterator
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from src.llm import LLMProvider
+from src.llm_backends import StubBackend
+from src.rag_pipeline import RAGPipeline
+
+
+class HashEmbeddingModel:
+    """Deterministic bag-of-words embeddings, so tests need no model download"""
+    
+    model_name = "hash-embedding"
+    max_seq_length = 256
+    
+    def __init__(self, dimension: int = 64):
+        self.dimension = dimension
+    
+    def encode_single(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode("utf-8")) % self.dimension] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.stack([self.encode_single(text) for text in texts]) if texts else np.zeros((0, self.dimension), dtype=np.float32)
+    
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        return [len(text.split()) for text in texts]
+    
+    def get_embedding_dimension(self) -> int:
+        return self.dimension
+    
+    def get_model_info(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "embedding_dimension": self.dimension, "max_sequence_length": self.max_seq_length}
+
+
+class MemoryVectorDatabase:
+    """Dict-backed stand-in for VectorDatabase; the next fail_inserts inserts raise"""
+    
+    collection_name = "test"
+    connection_type = "memory"
+    
+    def __init__(self):
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.generation = 0
+        self.fail_inserts = 0
+        self.searches = 0
+        self.closed = False
+        self.on_change: List[Callable[[], None]] = []
+    
+    def bump_generation(self):
+        self.generation += 1
+        for callback in self.on_change:
+            callback()
+    
+    def add_documents(self, documents: List[str], metadatas: List[Dict[str, Any]], ids: List[str], embeddings: np.ndarray):
+        if self.fail_inserts:
+            self.fail_inserts -= 1
+            raise ConnectionError("Milvus insert failed")
+        for doc_id, text, metadata, vector in zip(ids, documents, metadatas, embeddings):
+            self.rows[doc_id] = {"id": doc_id, "text": text, "metadata": metadata, "vector": np.asarray(vector)}
+        self.bump_generation()
+    
+    async def aadd_documents(self, documents, metadatas, ids, embeddings):
+        self.add_documents(documents, metadatas, ids, embeddings)
+    
+    def search(self, query_embedding: np.ndarray, n_results: Optional[int] = None) -> Dict[str, Any]:
+        self.searches += 1
+        n_results = n_results or Config.MAX_RETRIEVED_DOCS
+        rows = sorted(self.rows.values(), key=lambda row: -float(np.dot(row["vector"], query_embedding)))[:n_results]
+        return {
+            "ids": [[row["id"] for row in rows]],
+            "documents": [[row["text"] for row in rows]],
+            "metadatas": [[row["metadata"] for row in rows]],
+            "distances": [[float(np.dot(row["vector"], query_embedding)) for row in rows]]
+        }
+    
+    async def asearch(self, query_embedding: np.ndarray, n_results: Optional[int] = None) -> Dict[str, Any]:
+        return self.search(query_embedding, n_results)
+    
+    def close(self):
+        self.closed = True
+    
+    async def aclose(self):
+        pass
+    
+    def iter_documents(self, output_fields: Optional[List[str]] = None, batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        rows = list(self.rows.values())
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+    
+    def get_collection_info(self) -> Dict[str, Any]:
+        return {"name": self.collection_name, "document_count": len(self.rows), "connection_type": self.connection_type}
+    
+    def truncate(self) -> int:
+        deleted = len(self.rows)
+        self.rows.clear()
+        self.bump_generation()
+        return deleted
+
+    def delete_documents(self, ids: List[str]) -> int:
+        deleted = sum(self.rows.pop(doc_id, None) is not None for doc_id in ids)
+        self.bump_generation()
+        return deleted
+
+
+@pytest.fixture
+def make_pipeline(monkeypatch, tmp_path):
+    """Build a RAGPipeline on in-memory components and the stub LLM; keyword arguments override Config.
+    
+    Pipelines built by one test share the SQLite generation counter, like processes on one host.
+    """
+    
+    def make(**config) -> RAGPipeline:
+        config.setdefault("ANSWER_CACHE_BACKEND", "memory")
+        config.setdefault("ANSWER_CACHE_PATH", str(tmp_path / "answer_cache.db"))
+        config.setdefault("CHUNKING_MODE", "characters")
+        config.setdefault("OTEL_ENABLED", False)
+        for name, value in config.items():
+            monkeypatch.setattr(Config, name, value)
+        embedding_model = HashEmbeddingModel()
+        llm = LLMProvider(backend=StubBackend(latency=0, token_delay=0))
+        return RAGPipeline(embedding_model, MemoryVectorDatabase(), llm)
+    
+    return make
\ No newline at end of file
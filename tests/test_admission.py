@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from src.admission import OverloadedError, StageLimiter
+from src.async_rag_pipeline import AsyncRAGPipeline
+
+TEXT = "Milvus stores the chunk vectors and answers nearest neighbour searches for every question"
+
+
+def llm_active(rag):
+    return rag.admission.get_stats()["llm"]["active"]
+
+
+def test_full_queue_is_rejected_at_once():
+    limiter = StageLimiter("llm", max_concurrent=1, max_queue=0, max_wait=5)
+    with limiter.slot():
+        with pytest.raises(OverloadedError) as error:
+            with limiter.slot():
+                pass
+    assert error.value.stage == "llm"
+    assert limiter.get_stats()["rejected"] == 1
+
+
+def test_waiter_gives_up_after_max_wait():
+    limiter = StageLimiter("llm", max_concurrent=1, max_queue=1, max_wait=0.05)
+    with limiter.slot():
+        with pytest.raises(OverloadedError):
+            with limiter.slot():
+                pass
+    stats = limiter.get_stats()
+    assert stats["timed_out"] == 1 and stats["waiting"] == 0 and stats["active"] == 0
+
+
+def test_closing_a_stream_early_frees_its_slot(make_pipeline):
+    rag = make_pipeline(LLM_MAX_CONCURRENCY=1, ADMISSION_MAX_QUEUE=0)
+    rag.ingest_text(TEXT, {"source": "notes.txt"})
+    
+    events = rag.query_stream("What does Milvus store?")
+    assert next(events)["type"] == "sources"
+    assert next(events)["type"] == "token"
+    assert llm_active(rag) == 1
+    with pytest.raises(OverloadedError):
+        rag.query("What does Milvus answer?")
+    
+    events.close()
+    assert llm_active(rag) == 0
+    assert rag.query("What does Milvus answer?")["answer"]
+
+
+def test_closing_an_async_stream_early_frees_its_slot(make_pipeline):
+    rag = make_pipeline(LLM_MAX_CONCURRENCY=1)
+    rag.ingest_text(TEXT, {"source": "notes.txt"})
+    
+    async def read_first_token():
+        events = AsyncRAGPipeline(rag).aquery_stream("What does Milvus store?")
+        assert (await events.__anext__())["type"] == "sources"
+        assert (await events.__anext__())["type"] == "token"
+        active = llm_active(rag)
+        await events.aclose()
+        return active
+    
+    assert asyncio.run(read_first_token()) == 1
+    assert llm_active(rag) == 0
+
+
+def test_rate_limit_wait_holds_no_slot(make_pipeline):
+    rag = make_pipeline(LLM_MAX_CONCURRENCY=1)
+    rag.ingest_text(TEXT, {"source": "notes.txt"})
+    acquire = rag.llm.rate_limiter.acquire
+    active_while_waiting = []
+    
+    def recording_acquire(tokens, priority="interactive"):
+        active_while_waiting.append(llm_active(rag))
+        acquire(tokens, priority)
+    
+    rag.llm.rate_limiter.acquire = recording_acquire
+    rag.query("What does Milvus store?")
+    list(rag.query_stream("What does Milvus answer?"))
+    assert active_while_waiting == [0, 0]
+
+
+def test_replaced_pipeline_is_closed_once_idle(make_pipeline):
+    rag = make_pipeline()
+    rag.ingest_text(TEXT, {"source": "notes.txt"})
+    events = rag.query_stream("What does Milvus store?")
+    next(events), next(events)
+    
+    drain = rag.close_when_idle(quiet_seconds=0.05)
+    drain.join(0.3)
+    assert drain.is_alive() and not rag.vector_db.closed
+    
+    assert list(events)[-1]["type"] == "done"
+    drain.join(2)
+    assert rag.vector_db.closed
\ No newline at end of file
@@ -0,0 +1,124 @@
+import asyncio
+
+import numpy as np
+
+from src.answer_cache import SQLiteAnswerCache, SemanticAnswerCache
+from src.async_rag_pipeline import AsyncRAGPipeline
+
+SOURCES = [{"id": "a", "content": "x", "metadata": {}, "distance": 0.9}]
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_semantic_cache_threshold():
+    cache = SemanticAnswerCache(threshold=0.95, max_entries=4)
+    cache.set(unit(1, 0, 0), 5, "answer", SOURCES, generation=0)
+    
+    entry, similarity = cache.get(unit(1, 0.1, 0), 5, generation=0)
+    assert entry["answer"] == "answer" and similarity >= 0.95
+    assert cache.get(unit(1, 0.5, 0), 5, generation=0) is None
+    assert cache.get(unit(1, 0, 0), 3, generation=0) is None
+
+
+def test_semantic_cache_rejects_other_generations():
+    cache = SemanticAnswerCache(threshold=0.95, max_entries=4)
+    cache.set(unit(1, 0, 0), 5, "stale", SOURCES, generation=1)
+    
+    assert cache.get(unit(1, 0, 0), 5, generation=2) is None
+    assert cache.get(unit(1, 0, 0), 5, generation=1) is not None
+
+
+def test_sqlite_cache_keeps_answers_of_the_current_generation(tmp_path):
+    cache = SQLiteAnswerCache(path=str(tmp_path / "answers.db"))
+    cache.set("old", "stale", generation=1)
+    cache.set("new", "fresh", generation=2)
+    
+    cache.discard_before(2)
+    assert cache.get("old") is None and cache.get("new") == "fresh"
+
+
+def test_ingest_in_another_process_invalidates_cached_answers(make_pipeline):
+    # Two pipelines on one collection, as in two API workers (or the API and the web UI)
+    writer = make_pipeline(SEMANTIC_CACHE_ENABLED=True)
+    reader = make_pipeline(SEMANTIC_CACHE_ENABLED=True)
+    reader.vector_db.rows = writer.vector_db.rows
+    writer.ingest_text("Revenue in 2022 was 10 million dollars", {"source": "report"})
+    
+    assert reader.query("What was revenue in 2022?")["cached"] is False
+    assert reader.query("What was revenue in 2022?")["cached"] is True
+    
+    writer.ingest_text("Revenue in 2022 was restated to 12 million dollars", {"source": "restatement"})
+    result = reader.query("What was revenue in 2022?")
+    assert result["cached"] is False
+    assert "restated" in " ".join(source["content"] for source in result["sources"])
+
+
+def test_semantic_cache_is_off_by_default(make_pipeline):
+    assert make_pipeline().semantic_cache is None
+
+
+def test_answer_stored_after_an_ingest_is_not_served(make_pipeline):
+    rag = make_pipeline(SEMANTIC_CACHE_ENABLED=True)
+    rag.ingest_text("Revenue in 2022 was 10 million dollars", {"source": "report"})
+    generate = rag.llm.generate_response
+    calls = []
+    
+    def generate_during_ingest(prompt, context=None, priority="interactive"):
+        calls.append(prompt)
+        if len(calls) == 1:
+            # The collection changes while this answer is generated, and another
+            # request notices the change before the answer is stored
+            rag.ingest_text("Revenue in 2022 was restated to 12 million dollars", {"source": "restatement"})
+            rag.query("an unrelated question about revenue")
+        return generate(prompt, context, priority)
+    
+    rag.llm.generate_response = generate_during_ingest
+    first = rag.query("What was revenue in 2022?")
+    assert first["cached"] is False
+    
+    second = rag.query("What was revenue in 2022?")
+    assert second["cached"] is False
+    assert "restated" in " ".join(source["content"] for source in second["sources"])
+    
+    third = rag.query("What was revenue in 2022?")
+    assert third["cached"] is True
+
+
+def test_async_stream_uses_and_fills_the_answer_cache(make_pipeline):
+    rag = make_pipeline()
+    rag.ingest_text("Revenue in 2022 was 10 million dollars", {"source": "report"})
+    async_rag = AsyncRAGPipeline(rag)
+    
+    async def stream(question):
+        return [event async for event in async_rag.aquery_stream(question)]
+    
+    first = asyncio.run(stream("What was revenue in 2022?"))[-1]
+    assert first["cached"] is False
+    assert rag.query("What was revenue in 2022?")["cached"] is True
+    
+    second = asyncio.run(stream("What was revenue in 2022?"))
+    assert second[-1]["cached"] is True and second[-1]["answer"] == first["answer"]
+    assert [event["content"] for event in second if event["type"] == "token"] == [first["answer"]]
+
+def test_sync_and_async_paths_give_the_same_results(make_pipeline):
+    rag = make_pipeline()
+    async_rag = AsyncRAGPipeline(rag)
+    question = "What was revenue in 2022?"
+    
+    async def stream():
+        return [event async for event in async_rag.aquery_stream(question)]
+    
+    def comparable(result):
+        return {key: value for key, value in result.items() if key not in ("total_time", "time_to_first_token", "timings")}
+    
+    assert asyncio.run(async_rag.aquery(question)) == rag.query(question)
+    assert [comparable(event) for event in asyncio.run(stream())] == [comparable(event) for event in rag.query_stream(question)]
+    
+    rag.ingest_text("Revenue in 2022 was 10 million dollars", {"source": "report"})
+    generated = asyncio.run(async_rag.aquery(question))
+    assert generated["cached"] is False and generated["usage"]
+    assert rag.query(question) == {**{key: value for key, value in generated.items() if key != "usage"}, "cached": True}
+    assert [comparable(event) for event in asyncio.run(stream())] == [comparable(event) for event in rag.query_stream(question)]
\ No newline at end of file
@@ -0,0 +1,101 @@
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config import Config
+from src import api
+from src.admission import OverloadedError
+from src.async_rag_pipeline import AsyncRAGPipeline
+from src.rate_limiter import LLMRateLimiter
+
+
+@pytest.fixture
+def client(make_pipeline):
+    # Without the context manager the lifespan (which loads the real model) never runs
+    rag = AsyncRAGPipeline(make_pipeline())
+    api.app.state.rag = rag
+    yield TestClient(api.app)
+    api.app.state.rag = None
+
+
+def test_query_answers_with_the_stub(client):
+    client.post("/ingest/text", json={"text": "Milvus answers nearest neighbour searches"})
+    response = client.post("/query", json={"question": "What does Milvus answer?"})
+    assert response.status_code == 200
+    assert response.json()["sources"]
+
+
+@pytest.mark.parametrize("error, status", [
+    (OverloadedError("llm", "LLM stage is overloaded", retry_after=3), 429),
+    (ValueError("bad question"), 400),
+    (TimeoutError("LLM call timed out"), 504),
+])
+def test_errors_map_to_status_codes(client, monkeypatch, error, status):
+    async def fail(*args, **kwargs):
+        raise error
+    
+    monkeypatch.setattr(api.app.state.rag, "aquery", fail)
+    response = client.post("/query", json={"question": "What is Milvus?"})
+    assert response.status_code == status
+    if status == 429:
+        assert response.json()["stage"] == "llm" and response.headers["Retry-After"] == "3"
+
+
+def test_stream_overload_is_refused_before_the_response_starts(client, monkeypatch):
+    client.post("/ingest/text", json={"text": "Milvus answers nearest neighbour searches"})
+    llm = api.app.state.rag.pipeline.llm
+    monkeypatch.setattr(llm.stage_limiter, "max_concurrent", 1)
+    monkeypatch.setattr(llm.stage_limiter, "max_queue", 0)
+    with llm.stage_limiter.slot():
+        response = client.post("/query/stream", json={"question": "What does Milvus answer?"})
+    assert response.status_code == 429 and response.json()["stage"] == "llm"
+    
+    llm.rate_limiter = LLMRateLimiter(rpm=1, tpm=0, max_wait=5)
+    llm.rate_limiter.try_acquire(0)
+    response = client.post("/query/stream", json={"question": "What does Milvus answer?"})
+    assert response.status_code == 429 and int(response.headers["Retry-After"]) > 5
+
+
+def test_stream_sends_sources_then_tokens(client):
+    client.post("/ingest/text", json={"text": "Milvus answers nearest neighbour searches"})
+    response = client.post("/query/stream", json={"question": "What does Milvus answer?"})
+    events = [line.split(": ", 1)[1] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert response.status_code == 200
+    assert events[0] == "sources" and events[-1] == "done"
+
+
+def test_oversized_batch_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(Config, "API_MAX_BATCH", 2)
+    response = client.post("/query/batch", json={"questions": ["a", "b", "c"]})
+    assert response.status_code == 413
+
+
+def test_ready_checks_the_database_every_time(client, monkeypatch):
+    assert client.get("/ready").status_code == 200
+    
+    def unreachable():
+        raise ConnectionError("Milvus is down")
+    
+    monkeypatch.setattr(api.app.state.rag.pipeline.vector_db, "get_collection_info", unreachable)
+    response = client.get("/ready")
+    assert response.status_code == 503 and "Milvus is down" in response.json()["detail"]
+
+
+def test_ready_before_the_pipeline_loads():
+    api.app.state.rag = None
+    assert TestClient(api.app).get("/ready").status_code == 503
+
+
+def test_several_workers_are_refused_with_local_milvus(monkeypatch):
+    monkeypatch.setattr(Config, "MILVUS_TYPE", "local")
+    monkeypatch.setattr(sys, "argv", ["src.api", "--workers", "2"])
+    with pytest.raises(SystemExit):
+        api.main()
+
+
+def test_rate_limits_are_split_across_workers():
+    limiter = LLMRateLimiter(rpm=30, tpm=0)
+    limiter.split(3)
+    assert limiter.get_stats()["requests_available"] == 10
+    assert limiter.get_stats()["tokens_available"] is None
\ No newline at end of file
@@ -0,0 +1,58 @@
+import pytest
+
+from src.dedup import NearDuplicateDetector
+
+TEXT = "Milvus stores the chunk vectors and answers nearest neighbour searches for every question"
+
+
+def chunk(content, **metadata):
+    return {"content": content, "metadata": dict(metadata)}
+
+
+def test_filter_does_not_register_kept_chunks():
+    detector = NearDuplicateDetector(max_distance=3, shingle_size=2)
+    kept, _, pending = detector.filter([chunk(TEXT)])
+    assert len(kept) == 1 and len(pending) == 1
+    
+    # Nothing was stored, so the same chunk is still new
+    kept, stats, _ = detector.filter([chunk(TEXT)])
+    assert len(kept) == 1 and stats["exact_duplicates"] == 0
+    
+    detector.register(pending)
+    kept, stats, _ = detector.filter([chunk(TEXT)])
+    assert kept == [] and stats["exact_duplicates"] == 1
+
+
+def test_filter_drops_duplicates_within_a_batch():
+    detector = NearDuplicateDetector(max_distance=3, shingle_size=2)
+    kept, stats, pending = detector.filter([chunk(TEXT), chunk(TEXT.upper()), chunk(TEXT + "!")])
+    assert len(kept) == 1 and len(pending) == 1
+    assert stats["exact_duplicates"] == 1 and stats["near_duplicates"] == 1
+
+
+def test_chunks_without_words_are_kept_unfingerprinted():
+    detector = NearDuplicateDetector(max_distance=3, shingle_size=2)
+    chunks = [chunk(""), chunk("---"), chunk("***"), chunk("...")]
+    kept, stats, pending = detector.filter(chunks)
+    assert len(kept) == 4 and pending == []
+    assert stats["exact_duplicates"] == stats["near_duplicates"] == 0
+    assert all("simhash" not in c["metadata"] for c in kept)
+
+
+def test_failed_insert_can_be_retried(make_pipeline):
+    rag = make_pipeline(DEDUP_ENABLED=True)
+    rag.vector_db.fail_inserts = 1
+    
+    with pytest.raises(ConnectionError):
+        rag.ingest_text(TEXT, {"source": "notes.txt"})
+    assert rag.vector_db.rows == {}
+    
+    assert rag.ingest_text(TEXT, {"source": "notes.txt"}) == 1
+    assert len(rag.vector_db.rows) == 1
+    # Once stored, the chunk is a duplicate
+    assert rag.ingest_text(TEXT, {"source": "notes.txt"}) == 0
+
+
+def test_dedup_is_off_by_default(make_pipeline):
+    rag = make_pipeline()
+    assert rag.deduplicator is None
\ No newline at end of file
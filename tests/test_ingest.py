@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from src.async_rag_pipeline import AsyncRAGPipeline
+
+
+def report_chunks(pages: int, fail: bool = False):
+    """Chunk stream of a document; with fail, parsing the page after the last one raises"""
+    for page in range(pages):
+        yield {"content": f"Page {page} of the quarterly report covers region {page}", "metadata": {"source": "report.pdf", "page": page}}
+    if fail:
+        raise ValueError("Could not parse page")
+
+
+def test_failed_document_leaves_no_chunks(make_pipeline, monkeypatch):
+    rag = make_pipeline(INGEST_BATCH_SIZE=1, DEDUP_ENABLED=True)
+    monkeypatch.setattr(rag.document_processor, "iter_bytes_chunks", lambda name, data, progress=None: report_chunks(3, fail=True))
+    with pytest.raises(ValueError):
+        rag.ingest_bytes("report.pdf", b"%PDF")
+    assert rag.vector_db.rows == {}
+    
+    # The rolled back chunks are not remembered as duplicates of the retry
+    monkeypatch.setattr(rag.document_processor, "iter_bytes_chunks", lambda name, data, progress=None: report_chunks(3))
+    assert rag.ingest_bytes("report.pdf", b"%PDF") == 3
+
+
+def test_failed_document_is_rolled_back_async(make_pipeline, monkeypatch):
+    rag = AsyncRAGPipeline(make_pipeline(INGEST_BATCH_SIZE=1))
+    monkeypatch.setattr(rag.pipeline.document_processor, "iter_document_chunks", lambda path, progress=None: report_chunks(2, fail=True))
+    with pytest.raises(ValueError):
+        asyncio.run(rag.aingest_document("report.pdf"))
+    assert rag.pipeline.vector_db.rows == {}
+
+def test_failed_job_reports_the_rollback(make_pipeline, monkeypatch):
+    rag = make_pipeline(INGEST_BATCH_SIZE=1)
+    monkeypatch.setattr(rag.document_processor, "iter_bytes_chunks", lambda name, data, progress=None: report_chunks(3, fail=True))
+    job_id = rag.ingest_jobs.submit_uploads([("report.pdf", b"%PDF")])
+    rag.ingest_jobs.shutdown()
+    
+    job = rag.ingest_jobs.get(job_id)
+    file = job["files"][0]
+    assert job["status"] == "failed"
+    assert file["inserted"] == 0 and file["rolled_back"] == 3
+    assert file["error"] == "Could not parse page (rolled back 3 inserted chunks)"
+
+
+def test_failed_rollback_is_reported(make_pipeline, monkeypatch):
+    rag = make_pipeline(INGEST_BATCH_SIZE=1)
+    monkeypatch.setattr(rag.document_processor, "iter_bytes_chunks", lambda name, data, progress=None: report_chunks(2, fail=True))
+    
+    def unreachable(ids):
+        raise ConnectionError("Milvus is down")
+    
+    monkeypatch.setattr(rag.vector_db, "delete_documents", unreachable)
+    job_id = rag.ingest_jobs.submit_uploads([("report.pdf", b"%PDF")])
+    rag.ingest_jobs.shutdown()
+    
+    file = rag.ingest_jobs.get(job_id)["files"][0]
+    assert file["inserted"] == 2
+    assert file["error"] == "Could not parse page (2 inserted chunks could not be rolled back)"
\ No newline at end of file
@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from config import Config
+from src.llm import LLMProvider
+from src.llm_backends import GroqBackend, OpenAICompatibleBackend
+
+
+def chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class FakeStream:
+    """Stands in for the Groq SDK's Stream and AsyncStream"""
+    
+    def __init__(self, contents):
+        self.chunks = [chunk(content) for content in contents]
+        self.closed = False
+    
+    def __iter__(self):
+        return iter(self.chunks)
+    
+    async def __aiter__(self):
+        for item in self.chunks:
+            yield item
+    
+    def close(self):
+        self.closed = True
+
+
+class AsyncFakeStream(FakeStream):
+    async def close(self):
+        self.closed = True
+
+
+def groq_backend(stream):
+    backend = GroqBackend.__new__(GroqBackend)
+    backend.model = "test-model"
+    
+    def create(**kwargs):
+        return stream
+    
+    async def acreate(**kwargs):
+        return stream
+    
+    backend.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    backend.async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=acreate)))
+    return backend
+
+
+def test_closing_a_groq_stream_early_closes_the_response():
+    stream = FakeStream(["Hello", None, " world"])
+    tokens = groq_backend(stream).open_stream("question", timeout=5)
+    assert next(tokens) == "Hello"
+    
+    tokens.close()
+    assert stream.closed
+
+
+def test_closing_an_async_groq_stream_early_closes_the_response():
+    stream = AsyncFakeStream(["Hello", " world"])
+    
+    async def read_first_token():
+        tokens = await groq_backend(stream).aopen_stream("question", timeout=5)
+        first = await tokens.__anext__()
+        await tokens.aclose()
+        return first
+    
+    assert asyncio.run(read_first_token()) == "Hello"
+    assert stream.closed
+
+
+@pytest.mark.parametrize("limit, groq_rpm, self_hosted_rpm", [(None, 30, None), (5.0, 5, 5)])
+def test_rate_limit_defaults_per_backend(monkeypatch, limit, groq_rpm, self_hosted_rpm):
+    monkeypatch.setattr(Config, "LLM_RPM_LIMIT", limit)
+    groq = LLMProvider(backend=groq_backend(FakeStream([])))
+    ollama = LLMProvider(backend=OpenAICompatibleBackend(model="llama2", base_url="http://localhost:11434/v1"))
+    
+    assert groq.rate_limiter.get_stats()["requests_available"] == groq_rpm
+    assert ollama.rate_limiter.get_stats()["requests_available"] == self_hosted_rpm
\ No newline at end of file
@@ -0,0 +1,31 @@
+import time
+
+from src.llm_resilience import ResilientCaller
+from src.rate_limiter import LLMRateLimiter
+
+
+def slow_call(calls):
+    def call(timeout):
+        calls.append(timeout)
+        time.sleep(0.05)
+        return "answer"
+    return call
+
+
+def test_hedge_is_sent_when_permitted():
+    caller = ResilientCaller(hedge_enabled=True, hedge_after=0.01)
+    calls = []
+    assert caller.call(slow_call(calls), hedge_permit=lambda: True) == "answer"
+    assert caller.get_stats()["hedged"] == 1 and len(calls) == 2
+
+
+def test_hedge_is_skipped_without_rate_limit_capacity():
+    limiter = LLMRateLimiter(rpm=1, tpm=0)
+    limiter.acquire(100)  # The primary request took the only slot this minute
+    caller = ResilientCaller(hedge_enabled=True, hedge_after=0.01)
+    calls = []
+    
+    assert caller.call(slow_call(calls), hedge_permit=lambda: limiter.try_acquire(100)) == "answer"
+    stats = caller.get_stats()
+    assert stats["hedged"] == 0 and stats["hedges_skipped"] == 1 and len(calls) == 1
+    assert limiter.get_stats()["admitted"] == 1
\ No newline at end of file
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+from src.rate_limiter import LLMRateLimiter
+
+
+def drained_limiter() -> LLMRateLimiter:
+    """10 requests per second, with the initial minute of capacity used up"""
+    limiter = LLMRateLimiter(rpm=600, tpm=0, max_wait=5)
+    while limiter.try_acquire(0):
+        pass
+    # Returns the moment a request refilled, so the next one is a full 0.1s away
+    limiter.acquire(0)
+    return limiter
+
+
+def wait_for_queue(limiter: LLMRateLimiter, depth: int):
+    deadline = time.monotonic() + 5
+    while limiter.get_stats()["queue_depth"] < depth and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_interactive_overtakes_queued_batch_requests_in_arrival_order():
+    limiter = drained_limiter()
+    order = []
+    
+    def request(name, priority):
+        limiter.acquire(0, priority)
+        order.append(name)
+    
+    threads = []
+    for depth, (name, priority) in enumerate([("batch 1", "batch"), ("batch 2", "batch"), ("interactive", "interactive")], 1):
+        thread = threading.Thread(target=request, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        wait_for_queue(limiter, depth)
+    for thread in threads:
+        thread.join(5)
+    
+    assert order == ["interactive", "batch 1", "batch 2"]
+
+
+def test_async_interactive_overtakes_queued_batch_requests():
+    limiter = drained_limiter()
+    order = []
+    
+    async def request(name, priority):
+        await limiter.aacquire(0, priority)
+        order.append(name)
+    
+    async def main():
+        batch = asyncio.create_task(request("batch", "batch"))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(request("interactive", "interactive"), batch)
+    
+    asyncio.run(main())
+    assert order == ["interactive", "batch"]
+
+
+def test_expected_wait_counts_only_requests_at_or_above_the_priority():
+    limiter = drained_limiter()
+    threading.Thread(target=limiter.acquire, args=(0, "batch")).start()
+    wait_for_queue(limiter, 1)
+    assert limiter.expected_wait(0, "batch") > limiter.expected_wait(0, "interactive")
\ No newline at end of file
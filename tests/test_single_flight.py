@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def run_callers(flight: SingleFlight, func, callers: int):
+    """Call flight.do from several threads while the first call is in flight; returns results or errors"""
+    outcomes = [None] * callers
+    
+    def call(index):
+        try:
+            outcomes[index] = flight.do("key", func)
+        except Exception as e:
+            outcomes[index] = e
+    
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def blocking_call(flight: SingleFlight, callers: int, result=None, error=None):
+    """A call that returns (or raises) only once every other caller has joined it"""
+    calls = []
+    
+    def func():
+        calls.append(1)
+        deadline = time.monotonic() + 5
+        while flight.get_stats()["coalesced"] < callers - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        if error is not None:
+            raise error
+        return result
+    
+    return func, calls
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    func, calls = blocking_call(flight, 5, result="answer")
+    outcomes = run_callers(flight, func, 5)
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True, True]
+    assert all(result == "answer" for result, _ in outcomes)
+    assert flight.get_stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+    error = ConnectionError("Milvus is down")
+    func, calls = blocking_call(flight, 4, error=error)
+    assert run_callers(flight, func, 4) == [error] * 4
+    assert len(calls) == 1
+    
+    # Nothing is remembered, so the next call runs again
+    assert flight.do("key", lambda: "retried") == ("retried", False)
+
+
+def test_async_callers_share_one_call():
+    flight = AsyncSingleFlight()
+    calls = []
+    
+    async def func():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+    
+    async def main():
+        return await asyncio.gather(*(flight.do("key", func) for _ in range(5)))
+    
+    outcomes = asyncio.run(main())
+    assert len(calls) == 1
+    assert [shared for _, shared in outcomes] == [False, True, True, True, True]
+    assert flight.get_stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_async_error_reaches_every_waiter():
+    flight = AsyncSingleFlight()
+    
+    async def func():
+        await asyncio.sleep(0.01)
+        raise TimeoutError("LLM call timed out")
+    
+    async def main():
+        return await asyncio.gather(*(flight.do("key", func) for _ in range(3)), return_exceptions=True)
+    
+    outcomes = asyncio.run(main())
+    assert all(isinstance(outcome, TimeoutError) for outcome in outcomes)
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    flight = AsyncSingleFlight()
+    
+    async def func():
+        await asyncio.sleep(0.05)
+        return "answer"
+    
+    async def main():
+        leader = asyncio.create_task(flight.do("key", func))
+        follower = asyncio.create_task(flight.do("key", func))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+    
+    assert asyncio.run(main()) == ("answer", True)
\ No newline at end of file
@@ -0,0 +1,98 @@
+import re
+
+import pytest
+
+from src.text_splitter import TextSplitter, TokenBudgetSplitter
+
+PARITY_TEXT = (
+    "Milvus stores vectors.\n\nIt builds an index over them, answers nearest neighbour searches "
+    "and filters on scalar fields.\n   \n\n  \n"
+    "Collections hold entities;\neach entity has a primary key, a vector and a JSON metadata field.\n\n"
+    "Averyveryveryverylongwordthatdoesnotfitinanychunkatall and some words after it.   \n\n\n"
+    "  Trailing paragraph with  double  spaces\tand a tab.  "
+)
+
+
+class WordTokenizer:
+    """Whitespace tokenizer with an offset mapping, called like a Hugging Face fast tokenizer.
+    
+    Like BPE without a leading space, a long word at the very start of a text
+    is two tokens, so a chunk can count longer standalone than inside its document.
+    """
+    
+    def __init__(self):
+        self.calls = []
+    
+    @staticmethod
+    def offsets(text: str):
+        offsets = []
+        for match in re.finditer(r"\S+", text):
+            start, end = match.span()
+            if start == 0 and end - start > 4:
+                middle = (start + end) // 2
+                offsets += [(start, middle), (middle, end)]
+            else:
+                offsets.append((start, end))
+        return offsets
+    
+    def __call__(self, texts, add_special_tokens=True, return_offsets_mapping=False, verbose=True):
+        self.calls.append(texts)
+        if isinstance(texts, str):
+            offsets = self.offsets(texts)
+            encoding = {"input_ids": list(range(len(offsets)))}
+            if return_offsets_mapping:
+                encoding["offset_mapping"] = offsets
+            return encoding
+        return {"input_ids": [list(range(len(self.offsets(text)))) for text in texts]}
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap, separators", [
+    (40, 0, None),
+    (40, 10, None),
+    (25, 24, None),
+    (60, 15, ["\n", ";", " ", ""]),
+    (30, 5, ["\n\n", "."]),
+    (1000, 0, None),
+])
+def test_native_splitter_matches_langchain(chunk_size, chunk_overlap, separators):
+    langchain = pytest.importorskip("langchain_text_splitters")
+    expected = langchain.RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=separators, length_function=len
+    ).split_text(PARITY_TEXT)
+    splitter = TextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=separators)
+    assert splitter.split_text(PARITY_TEXT) == expected
+    assert TextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=separators).split_text("  \n\n \t ") == []
+
+
+def test_spans_are_measured_from_one_tokenization():
+    tokenizer = WordTokenizer()
+    splitter = TokenBudgetSplitter(tokenizer, max_tokens=4)
+    text = "one two three four five six\n\nseven eight nine ten eleven twelve thirteen"
+    
+    spans = splitter.split_spans(text)
+    assert tokenizer.calls == [text]
+    assert [text[start:end] for start, end in spans] == [
+        "one two three four", "five six", "seven eight nine ten", "eleven twelve thirteen"
+    ]
+
+
+def test_chunks_are_verified_in_one_batch_and_fit_the_budget():
+    tokenizer = WordTokenizer()
+    splitter = TokenBudgetSplitter(tokenizer, max_tokens=3, chunk_overlap=1)
+    text = " ".join(f"w{i}" for i in range(20))
+    
+    chunks = splitter.split_text(text)
+    assert [call for call in tokenizer.calls if isinstance(call, list)] == [chunks]
+    assert all(count <= 3 for count in splitter.count_tokens(chunks))
+    assert chunks[1].split()[0] == chunks[0].split()[-1]
+
+
+def test_chunk_over_budget_standalone_is_cut_again():
+    splitter = TokenBudgetSplitter(WordTokenizer(), max_tokens=3)
+    text = "a bb cc ddddd ee ff gg"
+    
+    # "ddddd ee ff" is 3 tokens inside the text but 4 on its own
+    assert [text[start:end] for start, end in splitter.split_spans(text)] == ["a bb cc", "ddddd ee ff", "gg"]
+    chunks = splitter.split_text(text)
+    assert chunks == ["a bb cc", "ddddd ee", "ff", "gg"]
+    assert all(count <= 3 for count in splitter.count_tokens(chunks))
\ No newline at end of file